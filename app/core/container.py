@@ -0,0 +1,133 @@
+# app/core/container.py
+"""
+Process-wide clients and their lifecycle.
+
+Importing the app is kept cheap: the LLM client, the Tavily HTTP client, the
+session store, Redis and the LangGraph workflow are all created on first
+use. AppContainer ties them to the FastAPI lifespan:
+ - on startup it warms the components listed in STARTUP_WARM (comma
+   separated; default "suggest"), so the first request does not pay for them
+ - on shutdown it closes only the clients that were actually created
+
+Components that can be warmed:
+ - suggest   — autocomplete index (app/services/topic_store.py)
+ - workflow  — imports LangGraph and compiles the graphs
+ - llm       — imports langchain and creates the chat model client
+ - tavily    — creates the pooled HTTP client for Tavily
+ - sessions  — opens the session store (and connects to Redis, if used)
+ - tokenizer — loads the tiktoken encoding used to budget prompt context
+               (downloaded on first use; token counts are estimated if
+               that fails)
+
+Autoscaled workers that take traffic immediately can warm everything
+(STARTUP_WARM=suggest,workflow,llm,tavily,sessions,tokenizer); serverless-style
+deployments keep the default and let the first request load what it needs.
+Warm-up failures are logged, never fatal: the component is retried on use.
+"""
+import asyncio
+import contextlib
+import functools
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, List
+
+logger = logging.getLogger("healthbot.container")
+
+STARTUP_WARM = [c.strip() for c in os.getenv("STARTUP_WARM", "suggest").split(",") if c.strip()]
+
+
+async def _warm_suggest():
+    from app.services.topic_store import get_suggest_index
+    get_suggest_index()
+
+
+async def _warm_workflow():
+    from app.core import workflow  # noqa: F401  (compiles the graphs)
+
+
+async def _warm_llm():
+    from app.services.llm import get_llm
+    if get_llm() is None:
+        raise RuntimeError("LLM provider not available")
+
+
+async def _warm_tavily():
+    from app.services.search_service import get_tavily_client
+    get_tavily_client()._http()
+
+
+async def _warm_sessions():
+    from app.utils.redis_client import get_redis, redis_enabled
+    from app.utils.state import SESSION_BACKEND, get_session_store
+    get_session_store()
+    if SESSION_BACKEND == "redis" and redis_enabled():
+        await get_redis()
+
+
+async def _warm_tokenizer():
+    from app.core.context import _encoding
+    # may download the BPE file
+    await asyncio.to_thread(_encoding)
+
+
+WARMERS = {
+    "suggest": _warm_suggest,
+    "workflow": _warm_workflow,
+    "llm": _warm_llm,
+    "tavily": _warm_tavily,
+    "sessions": _warm_sessions,
+    "tokenizer": _warm_tokenizer,
+}
+
+
+class AppContainer:
+    def __init__(self, warm: List[str] = STARTUP_WARM):
+        self.warm_list = warm
+        self._created_at = time.perf_counter()
+        self._ready_ms = None
+        self._warm_ms: Dict[str, float] = {}
+        self._warm_errors: Dict[str, str] = {}
+
+    async def warm(self, names: List[str]):
+        for name in names:
+            warmer = WARMERS.get(name)
+            if warmer is None:
+                logger.warning("Unknown STARTUP_WARM component %r (use %s)", name, ", ".join(WARMERS))
+                continue
+            start = time.perf_counter()
+            try:
+                await warmer()
+            except Exception as e:
+                self._warm_errors[name] = str(e)
+                logger.warning("Warming %s failed: %s", name, e)
+            self._warm_ms[name] = round((time.perf_counter() - start) * 1000, 2)
+
+    async def aclose(self):
+        # only close what exists; the getters would create the clients otherwise
+        from app.services.search_service import get_tavily_client
+        from app.utils.redis_client import close_redis
+        from app.utils.state import close_session_store
+
+        if get_tavily_client.cache_info().currsize:
+            await get_tavily_client().aclose()
+        await close_session_store()
+        await close_redis()
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self, app) -> AsyncIterator[None]:
+        await self.warm(self.warm_list)
+        self._ready_ms = round((time.perf_counter() - self._created_at) * 1000, 2)
+        logger.info("Ready in %.0f ms (warmed: %s)", self._ready_ms, self._warm_ms)
+        try:
+            yield
+        finally:
+            await self.aclose()
+
+    def stats(self) -> dict:
+        return {"ready_ms": self._ready_ms, "warm_ms": dict(self._warm_ms), "warm_errors": dict(self._warm_errors)}
+
+
+@functools.lru_cache(maxsize=1)
+def get_container() -> AppContainer:
+    return AppContainer()
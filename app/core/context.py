@@ -0,0 +1,225 @@
+# app/core/context.py
+"""
+Context packing for prompts: fits source text into a token budget.
+
+Instead of cutting the text at a character count, the text is split into
+sentences, which are:
+ - deduplicated: a sentence whose word 3-shingles overlap a better one's by
+   at least CONTEXT_DEDUPE_THRESHOLD (Jaccard) is dropped
+ - scored: overlap with the query words (the topic, or the answers being
+   graded), plus a bonus for earlier results/sentences; boilerplate
+   (cookie banners, newsletters, copyright lines) is dropped
+ - packed greedily, best first, until the budget is spent, then put back in
+   their original order (search results keep their "title — url" header)
+
+Tokens are counted with tiktoken when it is installed (it comes with
+langchain-openai) and its encoding loads, otherwise estimated from word and
+character counts.
+Budgets per call type are set with CONTEXT_TOKENS_<KIND>.
+"""
+import functools
+import logging
+import os
+import re
+from typing import List, Optional, Set
+
+DEFAULT_BUDGETS = {
+    "summary": 900,
+    "quiz": 600,
+    "quiz_bank": 600,
+    "grade": 600,
+}
+DEDUPE_THRESHOLD = float(os.getenv("CONTEXT_DEDUPE_THRESHOLD", "0.6"))
+# a sentence longer than the whole budget is cut down to the room left, if at least this much
+MIN_TRUNCATED_TOKENS = 32
+
+logger = logging.getLogger("healthbot.context")
+
+# separator written by search_service._format_pieces_from_results
+PIECE_SEPARATOR = "\n\n---\n\n"
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_BOILERPLATE_RE = re.compile(
+    r"cookie|subscribe|newsletter|sign up|log in|all rights reserved|copyright|©|click here"
+    r"|advertis|privacy policy|terms of (use|service)|share this|follow us",
+    re.IGNORECASE,
+)
+_STOPWORDS = frozenset(
+    "the and for with from that this what are was were has have how why who when which about into "
+    "your you its our can may not but all any more most other some such than then them they their "
+    "there these those also".split()
+)
+
+
+def context_budget(kind: str) -> int:
+    default = DEFAULT_BUDGETS.get(kind, DEFAULT_BUDGETS["summary"])
+    return int(os.getenv(f"CONTEXT_TOKENS_{kind.upper()}", str(default)))
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    """
+    The tiktoken encoding, or None to estimate. tiktoken downloads its BPE
+    files on first use, which fails offline; a failure is not retried.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(os.getenv("LC_MODEL", "gpt-4o-mini"))
+        except KeyError:  # a model tiktoken does not know
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning("tiktoken encoding unavailable, estimating token counts: %s", e)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count of `text` (tiktoken if available, otherwise an estimate)."""
+    if not text:
+        return 0
+    enc = _encoding()
+    if enc is not None:
+        return len(enc.encode(text))
+    return max(len(text) // 4, len(text.split()) * 4 // 3)
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """The longest run of leading words of `text` within `max_tokens` (at least one word)."""
+    words = text.split()
+    lo, hi = 1, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid])) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo])
+
+
+def _terms(text: str) -> Set[str]:
+    words = _WORD_RE.findall(text.lower())
+    return {w[:-1] if w.endswith("s") and len(w) > 4 else w
+            for w in words if len(w) > 2 and w not in _STOPWORDS}
+
+
+def _shingles(text: str) -> Set[str]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < 3:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+class _Unit:
+    __slots__ = ("piece", "line", "pos", "text", "tokens", "score", "shingles")
+
+    def __init__(self, piece: int, line: int, pos: int, text: str):
+        self.piece, self.line, self.pos, self.text = piece, line, pos, text
+        self.tokens = count_tokens(text) + 1
+        self.shingles = _shingles(text)
+        self.score = 0.0
+
+    def truncate(self, max_tokens: int):
+        self.text = _truncate(self.text, max_tokens - 1)
+        self.tokens = count_tokens(self.text) + 1
+
+
+def _is_duplicate(unit: _Unit, kept: List[_Unit]) -> bool:
+    a = unit.shingles
+    for other in kept:
+        b = other.shingles
+        if a and b and len(a & b) / len(a | b) >= DEDUPE_THRESHOLD:
+            return True
+    return False
+
+
+def pack_context(text: str, budget: int, query: str = "") -> str:
+    """
+    The most relevant, non-duplicate sentences of `text` that fit in `budget`
+    tokens, in their original order. A sentence longer than the budget is
+    cut to fit, and non-empty text never packs to an empty string.
+    """
+    text = (text or "").strip()
+    if not text:
+        return ""
+    search_results = PIECE_SEPARATOR in text
+    pieces = text.split(PIECE_SEPARATOR)
+    query_terms = _terms(query)
+
+    headers = {}
+    blanks = set()  # (piece, line) of empty lines, to keep paragraph breaks
+    units: List[_Unit] = []
+    for p, piece in enumerate(pieces):
+        lines = piece.split("\n")
+        if search_results and len(lines) > 1:
+            headers[p] = lines[0]
+        for i, line in enumerate(lines[1:] if p in headers else lines, start=1):
+            if not line.strip():
+                blanks.add((p, i))
+            for s, sentence in enumerate(_SENTENCE_RE.split(line.strip())):
+                if sentence:
+                    units.append(_Unit(p, i, s, sentence))
+
+    for u in units:
+        if _BOILERPLATE_RE.search(u.text):
+            u.score = -1.0
+            continue
+        relevance = len(query_terms & _terms(u.text)) / len(query_terms) if query_terms else 0.0
+        u.score = relevance + 0.3 * (1 - u.piece / len(pieces)) + 0.1 / (1 + u.pos)
+
+    kept: List[_Unit] = []
+    used = 0
+    used_headers = set()
+    ranked = sorted(units, key=lambda u: (-u.score, u.piece, u.line, u.pos))
+    for u in ranked:
+        if u.score < 0 or _is_duplicate(u, kept):
+            continue
+        header = count_tokens(headers[u.piece]) + 2 if u.piece in headers and u.piece not in used_headers else 0
+        room = budget - used - header
+        if u.tokens > room:
+            # only a sentence that could never fit is cut; others wait for a smaller one
+            if u.tokens <= budget or room < MIN_TRUNCATED_TOKENS:
+                continue
+            u.truncate(room)
+        kept.append(u)
+        used += u.tokens + header
+        if u.piece in headers:
+            used_headers.add(u.piece)
+
+    if not units:
+        # nothing but headers
+        return _truncate(text, budget)
+    if not kept:
+        # everything was boilerplate or larger than a tiny budget: the best sentence, cut to fit
+        best = next((u for u in ranked if u.score >= 0), ranked[0])
+        best.truncate(max(1, budget - (count_tokens(headers[best.piece]) + 2 if best.piece in headers else 0)))
+        kept.append(best)
+
+    return _reassemble(kept, headers, blanks)
+
+
+def _reassemble(kept: List[_Unit], headers: dict, blanks: set) -> str:
+    out = []
+    kept.sort(key=lambda u: (u.piece, u.line, u.pos))
+    piece: Optional[int] = None
+    line: Optional[int] = None
+    lines: List[str] = []
+    for u in kept:
+        if u.piece != piece:
+            if lines:
+                out.append("\n".join(lines))
+            piece, line = u.piece, None
+            lines = [headers[piece]] if piece in headers else []
+        if u.line != line:
+            if line is not None and any((piece, i) in blanks for i in range(line + 1, u.line)):
+                lines.append("")
+            line = u.line
+            lines.append(u.text)
+        else:
+            lines[-1] += " " + u.text
+    if lines:
+        out.append("\n".join(lines))
+    return PIECE_SEPARATOR.join(out)
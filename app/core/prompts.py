@@ -8,110 +8,142 @@ This module:
  - Makes prompts easy to update and A/B test
 """
 
+import functools
+import hashlib
 import textwrap
-from langchain_core.messages import SystemMessage, HumanMessage
 
+from app.core.context import context_budget, pack_context
 
-# ---------- Helpers ----------
-def _shorten(text: str, max_chars: int = 4000) -> str:
-    """Truncate very long text to avoid token overflow."""
-    if len(text) <= max_chars:
-        return text
-    return text[: max_chars - 50] + "\n\n[...truncated...]"
+
+def _messages(system: str, user: str):
+    # langchain is imported with the first prompt, not when the app starts
+    from langchain_core.messages import SystemMessage, HumanMessage
+    return [SystemMessage(content=system), HumanMessage(content=user)]
 
 
 # ---------- Summarization ----------
-def build_summary_messages(text_to_summarize: str):
-    text = _shorten(text_to_summarize)
-    system = SystemMessage(
-        content=(
-            "You are an empathetic, patient-facing medical educator. "
-            "Keep explanations simple, friendly, and non-technical."
-        )
+def build_summary_messages(text_to_summarize: str, topic: str = ""):
+    # most topic-relevant, deduplicated snippets within the token budget
+    text = pack_context(text_to_summarize, context_budget("summary"), query=topic)
+    system = (
+        "You are an empathetic, patient-facing medical educator. "
+        "Keep explanations simple, friendly, and non-technical."
     )
 
-    user = HumanMessage(
-        content=textwrap.dedent(
-            f"""
-            Summarize the information below into simple, patient-friendly language.
-
-            Requirements:
-            - Short sentences (one idea per sentence)
-            - Use simple words; define any medical term briefly
-            - Add a 'Key takeaways' list with exactly 3 bullet points
-            - Add one sentence reminding the patient to consult their clinician if unsure
-            - No medical advice, no dosages
-
-            TEXT:
-            {text}
-            """
-        ).strip()
-    )
+    user = textwrap.dedent(
+        f"""
+        Summarize the information below into simple, patient-friendly language.
+
+        Requirements:
+        - Short sentences (one idea per sentence)
+        - Use simple words; define any medical term briefly
+        - Add a 'Key takeaways' list with exactly 3 bullet points
+        - Add one sentence reminding the patient to consult their clinician if unsure
+        - No medical advice, no dosages
 
-    return [system, user]
+        TEXT:
+        {text}
+        """
+    ).strip()
+
+    return _messages(system, user)
 
 
 # ---------- Quiz Generation ----------
 def build_quiz_messages(summary_text: str, prefer_short_answer: bool = True):
-    text = _shorten(summary_text, max_chars=2500)
+    text = pack_context(summary_text, context_budget("quiz"))
     mode = "short-answer" if prefer_short_answer else "multiple-choice (4 options)"
 
-    system = SystemMessage(
-        content="You create clear, simple patient comprehension questions."
-    )
+    system = "You create clear, simple patient comprehension questions."
+
+    user = textwrap.dedent(
+        f"""
+        Based only on the summary below, create exactly ONE comprehension question.
+
+        Requirements:
+        - Prefer {mode}
+        - Keep the question very simple
+        - Provide a canonical correct answer (1–2 sentences)
+        - Provide one short hint
+        - Output ONLY a JSON object with keys: question, options, answer, hint
+
+        SUMMARY:
+        {text}
+        """
+    ).strip()
+
+    return _messages(system, user)
 
-    user = HumanMessage(
-        content=textwrap.dedent(
-            f"""
-            Based only on the summary below, create exactly ONE comprehension question.
-
-            Requirements:
-            - Prefer {mode}
-            - Keep the question very simple
-            - Provide a canonical correct answer (1–2 sentences)
-            - Provide one short hint
-            - Output ONLY a JSON object with keys: question, options, answer, hint
-
-            SUMMARY:
-            {text}
-            """
-        ).strip()
-    )
 
-    return [system, user]
+def build_quiz_bank_messages(summary_text: str, n: int = 8):
+    text = pack_context(summary_text, context_budget("quiz_bank"))
+
+    system = "You create clear, simple patient comprehension questions."
+
+    user = textwrap.dedent(
+        f"""
+        Based only on the summary below, create {n} different comprehension questions.
+
+        Requirements:
+        - Mix short-answer and multiple-choice (4 options) questions
+        - Each question tests a different fact from the summary
+        - Keep every question very simple
+        - Provide a canonical correct answer (1–2 sentences; for multiple-choice, the exact text of the correct option)
+        - Provide one short hint per question
+        - Output ONLY a JSON array of objects with keys: question, options (list or null), answer, hint
+
+        SUMMARY:
+        {text}
+        """
+    ).strip()
+
+    return _messages(system, user)
 
 
 # ---------- Answer Grading ----------
 def build_grader_messages(summary_text: str, canonical_answer: str, user_answer: str):
-    summary = _shorten(summary_text)
     canonical_answer = canonical_answer.strip()
     user_answer = user_answer.strip()
+    # keep the parts of the summary the answers are about
+    summary = pack_context(summary_text, context_budget("grade"), query=f"{canonical_answer} {user_answer}")
 
-    system = SystemMessage(
-        content="You are a fair grader. Be concise and explain clearly."
-    )
+    system = "You are a fair grader. Be concise and explain clearly."
+
+    user = textwrap.dedent(
+        f"""
+        Grade the USER_ANSWER against the CANONICAL_ANSWER using only the SUMMARY.
+
+        Return JSON with:
+          - score: float from 0.0 to 1.0
+          - verdict: "correct", "partial", or "incorrect"
+          - explanation: short plain-language explanation
+          - citations: 1–2 short snippets from the SUMMARY (10–40 words each)
+
+        SUMMARY:
+        {summary}
 
-    user = HumanMessage(
-        content=textwrap.dedent(
-            f"""
-            Grade the USER_ANSWER against the CANONICAL_ANSWER using only the SUMMARY.
+        CANONICAL_ANSWER:
+        {canonical_answer}
 
-            Return JSON with:
-              - score: float from 0.0 to 1.0
-              - verdict: "correct", "partial", or "incorrect"
-              - explanation: short plain-language explanation
-              - citations: 1–2 short snippets from the SUMMARY (10–40 words each)
+        USER_ANSWER:
+        {user_answer}
+        """
+    ).strip()
 
-            SUMMARY:
-            {summary}
+    return _messages(system, user)
 
-            CANONICAL_ANSWER:
-            {canonical_answer}
 
-            USER_ANSWER:
-            {user_answer}
-            """
-        ).strip()
+# ---------- Versioning ----------
+@functools.lru_cache(maxsize=1)
+def prompt_version() -> str:
+    """Hash of every template, so caches keyed on it invalidate when prompts change."""
+    probes = (
+        build_summary_messages(""),
+        build_quiz_messages("", prefer_short_answer=True),
+        build_quiz_messages("", prefer_short_answer=False),
+        build_quiz_bank_messages(""),
+        build_grader_messages("", "", ""),
     )
+    text = "\n".join(m.content for msgs in probes for m in msgs)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:10]
 
-    return [system, user]
@@ -1,133 +1,482 @@
 # app/core/workflow.py
+import asyncio
+import functools
+import logging
+import os
+import time
 import uuid
-from typing import Dict, Any
-from dotenv import load_dotenv
+from collections import OrderedDict
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional, TypedDict
 
-load_dotenv()
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.config import get_stream_writer
+from langgraph.graph import END, START, StateGraph
 
-from langgraph.graph import StateGraph
+from app.services.search_service import is_search_placeholder, search_medical_info
+from app.services.summary_service import summarize_text_for_patient, stream_summary_for_patient
+from app.services.quiz_service import generate_quiz_question
+from app.services.grader import grade_answer
+from app.services.quiz_bank import next_question
+from app.services.topic_cache import SEARCH, SUMMARY, get_cached, get_or_compute, set_cached
+from app.services.topic_validation_service import validate_topic
+from app.utils.state import create_session, get_session_fields, update_session, clear_session
+from app.utils.resilience import (
+    BACKGROUND_DEADLINE_SECONDS, REQUEST_DEADLINE_SECONDS, DeadlineExceeded, deadline, time_left,
+)
 
-from app.services.search_service import search_medical_info
-from app.services.summary_service import summarize_text_for_patient
-from app.services.quiz_service import generate_quiz_question, evaluate_answer
-from app.utils.state import create_session, get_session, update_session, clear_session
+logger = logging.getLogger("healthbot.workflow")
 
-# State schema keys used in session dict:
-# {
-#   "session_id": str,
-#   "topic": str,
-#   "search_results": str,
-#   "summary": str,
-#   "quiz": { question, options, answer, hint },
-#   "last_eval": { score, verdict, explanation, citations }
-# }
+# Start generating the quiz in the background as soon as the summary exists,
+# so /quiz usually finds it ready.
+QUIZ_PREGENERATE = os.getenv("QUIZ_PREGENERATE", "true").lower() in ("1", "true", "yes")
+# Validate the topic (in parallel with the search) and stop before the summary
+# if it is not a health topic.
+VALIDATE_TOPICS = os.getenv("VALIDATE_TOPICS", "true").lower() in ("1", "true", "yes")
+# A /start run that fails part-way keeps its checkpoint so that a retry can
+# resume it, for up to START_RESUME_SECONDS and at most START_RESUME_MAX runs.
+START_RESUME_SECONDS = float(os.getenv("START_RESUME_SECONDS", "300"))
+START_RESUME_MAX = int(os.getenv("START_RESUME_MAX", "1000"))
+# A streamed summary starts after the request deadline's steps and is not
+# bound by it; streaming it may take at most SUMMARY_STREAM_TIMEOUT_SECONDS.
+SUMMARY_STREAM_TIMEOUT_SECONDS = float(os.getenv("SUMMARY_STREAM_TIMEOUT_SECONDS", "120"))
 
-# Node implementations
-async def node_ask_topic(session_id: str, topic: str):
-    await create_session(session_id, {"session_id": session_id, "topic": topic})
-    return {"topic": topic}
+# session_id -> in-flight quiz pre-generation (this process only)
+_quiz_tasks: Dict[str, asyncio.Task] = {}
 
+class SessionState(TypedDict, total=False):
+    """Fields of a session (one Redis hash field each)."""
+    session_id: str
+    topic: str
+    search_results: str
+    summary: str
+    quiz: Dict[str, Any]        # { public: {question, options, hint}, _canonical, prefetched, id }
+    quiz_seen: List[str]        # quiz bank question ids already served
+    last_eval: Dict[str, Any]   # { score, verdict, explanation, citations, graded_by }
 
-async def node_search(session_id: str):
-    state = await get_session(session_id)
-    if not state or "topic" not in state:
+
+SESSION_FIELDS = tuple(SessionState.__annotations__)
+
+
+class FlowGraphState(SessionState, total=False):
+    """State passed between graph nodes: session fields plus per-request inputs and results."""
+    stream: bool                # /start/stream: summarize emits tokens through the stream writer
+    validation: Dict[str, Any]  # validate_topic result
+    user_answer: str
+    evaluation: Dict[str, Any]
+
+
+class InvalidTopic(ValueError):
+    pass
+
+
+# per-node timings (this process), exported on /metrics
+_node_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _timed(name: str, fn: Callable[[FlowGraphState], Awaitable[Dict[str, Any]]]):
+    @functools.wraps(fn)
+    async def run(state: FlowGraphState) -> Dict[str, Any]:
+        start = time.perf_counter()
+        ok = False
+        try:
+            out = await fn(state)
+            ok = True
+            return out
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            st = _node_stats.setdefault(name, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+            st["calls"] += 1
+            st["errors"] += not ok
+            st["total_ms"] += ms
+            st["max_ms"] = max(st["max_ms"], ms)
+    return run
+
+
+def workflow_stats() -> Dict[str, Dict[str, float]]:
+    return {
+        name: {**st, "avg_ms": round(st["total_ms"] / st["calls"], 2) if st["calls"] else 0.0,
+               "total_ms": round(st["total_ms"], 2), "max_ms": round(st["max_ms"], 2)}
+        for name, st in _node_stats.items()
+    }
+
+
+# Node implementations: each takes the graph state and returns the fields it
+# changed; the session is only read by the load_* nodes and only written by
+# the save_* nodes.
+async def node_ask_topic(state: FlowGraphState) -> Dict[str, Any]:
+    # a new session (replacing any previous one with this id) is written by save_session
+    return {"session_id": state["session_id"], "topic": state["topic"]}
+
+
+async def node_validate(state: FlowGraphState) -> Dict[str, Any]:
+    if not VALIDATE_TOPICS:
+        return {"validation": {"valid": True, "validated_by": "disabled"}}
+    try:
+        return {"validation": await validate_topic(state["topic"])}
+    except Exception as e:
+        # an unavailable validator must not fail the search running beside it
+        logger.info("Topic validation failed for %r: %s", state["topic"], e)
+        return {"validation": {"valid": False, "reason": "Validator failed", "validated_by": "failed"}}
+
+
+async def node_search(state: FlowGraphState) -> Dict[str, Any]:
+    if "topic" not in state:
         raise RuntimeError("Session or topic missing")
-    results = await search_medical_info(state["topic"])
-    await update_session(session_id, {"search_results": results})
+    topic = state["topic"]
+    results = await get_or_compute(SEARCH, topic, lambda: search_medical_info(topic),
+                                   cache_if=lambda text: not is_search_placeholder(text))
     return {"search_results": results}
 
 
-async def node_summarize(session_id: str):
-    state = await get_session(session_id)
-    if not state or "search_results" not in state:
+def route_topic(state: FlowGraphState) -> str:
+    """After validation and search: stop for rejected topics (but not when the validator itself failed)."""
+    v = state.get("validation") or {}
+    return "summarize" if v.get("valid", True) or v.get("validated_by") == "failed" else "rejected"
+
+
+async def node_check_topic(state: FlowGraphState) -> Dict[str, Any]:
+    # join point of the validate and search branches
+    return {}
+
+
+async def node_summarize(state: FlowGraphState) -> Dict[str, Any]:
+    if "search_results" not in state:
         raise RuntimeError("search_results missing")
-    summary = await summarize_text_for_patient(state["search_results"])
-    await update_session(session_id, {"summary": summary})
+    topic = state["topic"]
+    # a summary of "no results" must not be served to the next session
+    cacheable = not is_search_placeholder(state["search_results"])
+    if not state.get("stream"):
+        # summaries are shared per topic (keyed by prompt version); concurrent
+        # starts for the same topic share one LLM call
+        summary = await get_or_compute(SUMMARY, topic,
+                                       lambda: summarize_text_for_patient(state["search_results"], topic=topic),
+                                       cache_if=lambda _: cacheable)
+        return {"summary": summary}
+
+    # streamed tokens go out through the graph's "custom" stream; the request
+    # deadline stops here and SUMMARY_STREAM_TIMEOUT_SECONDS takes over
+    write = get_stream_writer()
+
+    async def stream() -> str:
+        parts = []
+        async for text in stream_summary_for_patient(state["search_results"], topic=topic):
+            parts.append(text)
+            write({"token": text})
+        return "".join(parts).strip()
+
+    with deadline(SUMMARY_STREAM_TIMEOUT_SECONDS, detach=True):
+        summary = await get_cached(SUMMARY, topic)
+        if summary is not None:
+            write({"token": summary})
+        else:
+            try:
+                # also ends a stream that stalls between chunks
+                summary = await asyncio.wait_for(stream(), SUMMARY_STREAM_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"summary stream took longer than {SUMMARY_STREAM_TIMEOUT_SECONDS:g}s")
+            if cacheable:
+                await set_cached(SUMMARY, topic, summary)
     return {"summary": summary}
 
 
-async def node_generate_quiz(session_id: str):
-    state = await get_session(session_id)
-    if not state or "summary" not in state:
+async def node_save_session(state: FlowGraphState) -> Dict[str, Any]:
+    await create_session(state["session_id"], {k: state[k] for k in SESSION_FIELDS if k in state})
+    return {}
+
+
+async def node_prefetch_quiz(state: FlowGraphState) -> Dict[str, Any]:
+    # starts the quiz in the background; the response does not wait for it
+    schedule_quiz_pregeneration(state)
+    return {}
+
+
+async def node_load_quiz_state(state: FlowGraphState) -> Dict[str, Any]:
+    session_id = state["session_id"]
+    task = _quiz_tasks.get(session_id)
+    if task is not None:
+        # asyncio.wait never raises, even if the task gets cancelled by /reset
+        await asyncio.wait({task}, timeout=time_left())
+    return await _load(session_id, ["topic", "summary", "quiz", "quiz_seen"])
+
+
+async def node_generate_quiz(state: FlowGraphState) -> Dict[str, Any]:
+    if "summary" not in state:
         raise RuntimeError("summary missing")
-    quiz = await generate_quiz_question(state["summary"])
+    quiz = state.get("quiz")
+    if quiz and quiz.get("prefetched"):
+        # serve it once; the next /quiz generates a fresh question
+        return {"quiz": {**quiz, "prefetched": False}}
+    return await _pick_quiz(state)
+
+
+async def node_save_quiz(state: FlowGraphState) -> Dict[str, Any]:
+    await update_session(state["session_id"], {k: state[k] for k in ("quiz", "quiz_seen") if k in state})
+    return {}
+
+
+async def node_load_answer_state(state: FlowGraphState) -> Dict[str, Any]:
+    return await _load(state["session_id"], ["quiz", "summary"])
+
+
+async def node_evaluate(state: FlowGraphState) -> Dict[str, Any]:
+    quiz = state.get("quiz")
+    if not quiz or "_canonical" not in quiz:
+        raise RuntimeError("quiz canonical answer missing")
+    canonical = quiz["_canonical"]
+    options = (quiz.get("public") or {}).get("options")
+    # deterministic tiers first; the LLM only sees ambiguous answers
+    eval_result = await grade_answer(state.get("summary", ""), canonical, state["user_answer"], options=options)
+    return {"last_eval": eval_result, "evaluation": eval_result}
+
+
+async def node_save_eval(state: FlowGraphState) -> Dict[str, Any]:
+    await update_session(state["session_id"], {"last_eval": state["last_eval"]})
+    return {}
+
+
+async def _load(session_id: str, fields: List[str]) -> Dict[str, Any]:
+    data = await get_session_fields(session_id, fields)
+    if data is None:
+        raise RuntimeError("Session missing")
+    return data
+
+
+async def _pick_quiz(state: Dict[str, Any], prefetched: bool = False) -> Dict[str, Any]:
+    """Session patch with the next unseen question from the topic's quiz bank."""
+    seen = state.get("quiz_seen") or []
+    quiz = await next_question(state["topic"], state["summary"], seen)
+    if quiz is None:
+        # bank unavailable: fall back to a single on-demand question
+        quiz = await generate_quiz_question(state["summary"])
+    else:
+        seen = seen + [quiz["id"]]
+    return {"quiz": _quiz_slot(quiz, prefetched=prefetched), "quiz_seen": seen}
+
+
+def _quiz_slot(quiz: Dict[str, Any], prefetched: bool = False) -> Dict[str, Any]:
     # Remove canonical answer from what will be returned to client,
     # but keep it in session for grading (store under _canonical)
     canonical = quiz.get("answer", "")
     public_quiz = {k: quiz.get(k) for k in ("question", "options", "hint")}
-    await update_session(session_id, {"quiz": {"public": public_quiz, "_canonical": canonical}})
-    return {"quiz": public_quiz}
+    return {"public": public_quiz, "_canonical": canonical, "prefetched": prefetched, "id": quiz.get("id")}
 
 
-async def node_evaluate(session_id: str, user_answer: str):
-    state = await get_session(session_id)
-    if not state or "quiz" not in state or "_canonical" not in state["quiz"]:
-        raise RuntimeError("quiz canonical answer missing")
-    canonical = state["quiz"]["_canonical"]
-    eval_result = await evaluate_answer(state["summary"], canonical, user_answer)
-    await update_session(session_id, {"last_eval": eval_result})
-    return {"evaluation": eval_result}
+async def _pregenerate_quiz(session_id: str, state: Dict[str, Any]):
+    try:
+        # warms the topic's quiz bank on first use; not bound by /start's deadline
+        with deadline(BACKGROUND_DEADLINE_SECONDS, detach=True):
+            patch = await _pick_quiz(state, prefetched=True)
+    except Exception as e:
+        # /quiz will generate on demand instead
+        logger.info("Quiz pre-generation failed for %s: %s", session_id, e)
+        return
+    # never replace a quiz the user may already be answering (or revive a cleared session)
+    await update_session(session_id, patch, only_if_exists=True, unless_field="quiz")
+
+
+def schedule_quiz_pregeneration(state: FlowGraphState):
+    """Generate the session's quiz in the background (replacing any earlier attempt)."""
+    if not QUIZ_PREGENERATE:
+        return
+    session_id = state["session_id"]
+    cancel_quiz_pregeneration(session_id)
+    snapshot = {k: state.get(k) for k in ("topic", "summary", "quiz_seen")}
+    task = asyncio.create_task(_pregenerate_quiz(session_id, snapshot))
+    _quiz_tasks[session_id] = task
+
+    def _forget(t: asyncio.Task):
+        if _quiz_tasks.get(session_id) is t:
+            del _quiz_tasks[session_id]
+
+    task.add_done_callback(_forget)
+
+
+def cancel_quiz_pregeneration(session_id: str):
+    task: Optional[asyncio.Task] = _quiz_tasks.pop(session_id, None)
+    if task is not None:
+        task.cancel()
 
 
 async def node_clear(session_id: str):
+    cancel_quiz_pregeneration(session_id)
     await clear_session(session_id)
+    _resumable.pop(session_id, None)
+    await _checkpointer.adelete_thread(session_id)
     return {"cleared": True}
 
 
-# If LangGraph is available, create an explicit StateGraph
-Graph = StateGraph  # alias
+def _node(g: StateGraph, name: str, fn):
+    g.add_node(name, _timed(name, fn))
+
+
+# /start: validation runs alongside the search; the summary is only written
+# once both are done, and the quiz is then generated in the background.
+#
+#   ask_topic -> validate --\
+#            \-> search ----> check_topic -> summarize -> save_session -> prefetch_quiz
+#                                      \-> (rejected) END
+#
+# Checkpointed per session id: if a run fails part-way (e.g. the LLM times out
+# after the search finished), retrying /start with the same session id and
+# topic resumes after the last completed step. Any other run starts from an
+# empty thread, and a thread is deleted as soon as its run ends, unless the
+# run failed (then it is kept for resuming, within the START_RESUME_* limits).
+_checkpointer = MemorySaver()
+# session ids whose failed run can be resumed -> when it failed (oldest first)
+_resumable: "OrderedDict[str, float]" = OrderedDict()
+
+_start = StateGraph(FlowGraphState)
+_node(_start, "ask_topic", node_ask_topic)
+_node(_start, "validate", node_validate)
+_node(_start, "search", node_search)
+_node(_start, "check_topic", node_check_topic)
+_node(_start, "summarize", node_summarize)
+_node(_start, "save_session", node_save_session)
+_node(_start, "prefetch_quiz", node_prefetch_quiz)
+_start.add_edge(START, "ask_topic")
+_start.add_edge("ask_topic", "validate")
+_start.add_edge("ask_topic", "search")
+_start.add_edge(["validate", "search"], "check_topic")
+_start.add_conditional_edges("check_topic", route_topic, {"summarize": "summarize", "rejected": END})
+_start.add_edge("summarize", "save_session")
+_start.add_edge("save_session", "prefetch_quiz")
+_start.add_edge("prefetch_quiz", END)
+START_GRAPH = _start.compile(checkpointer=_checkpointer)
+
+# /quiz: load_quiz_state -> generate_quiz -> save_quiz
+_quiz = StateGraph(FlowGraphState)
+_node(_quiz, "load_quiz_state", node_load_quiz_state)
+_node(_quiz, "generate_quiz", node_generate_quiz)
+_node(_quiz, "save_quiz", node_save_quiz)
+_quiz.add_edge(START, "load_quiz_state")
+_quiz.add_edge("load_quiz_state", "generate_quiz")
+_quiz.add_edge("generate_quiz", "save_quiz")
+_quiz.add_edge("save_quiz", END)
+QUIZ_GRAPH = _quiz.compile()
+
+# /answer: load_answer_state -> evaluate -> save_eval
+_answer = StateGraph(FlowGraphState)
+_node(_answer, "load_answer_state", node_load_answer_state)
+_node(_answer, "evaluate", node_evaluate)
+_node(_answer, "save_eval", node_save_eval)
+_answer.add_edge(START, "load_answer_state")
+_answer.add_edge("load_answer_state", "evaluate")
+_answer.add_edge("evaluate", "save_eval")
+_answer.add_edge("save_eval", END)
+ANSWER_GRAPH = _answer.compile()
+
 
-# A compact graph definition; LangGraph usage may differ slightly by version
-g = Graph(dict)  # using dict as schema
-g.add_node("ask_topic", node_ask_topic)
-g.add_node("search", node_search)
-g.add_node("summarize", node_summarize)
-g.add_node("generate_quiz", node_generate_quiz)
-g.add_node("evaluate", node_evaluate)
-g.add_node("clear", node_clear)
+# High-level helpers for FastAPI routes to call. Each one runs a graph, which
+# reads the session at most once and writes it at most once, under a request
+# deadline (REQUEST_DEADLINE_SECONDS) that the search and LLM calls respect.
+async def _start_input(topic: str, session_id: str, config: Dict[str, Any], stream: bool) -> Optional[Dict[str, Any]]:
+    """Graph input for /start, or None to resume this session's failed run."""
+    if _resumable.pop(session_id, None) is not None:
+        snapshot = await START_GRAPH.aget_state(config)
+        if snapshot.next and snapshot.values.get("topic") == topic:
+            logger.info("Resuming /start for %s at %s", session_id, list(snapshot.next))
+            return None
+    # never start on top of another run's state (its summary, its verdict)
+    await _checkpointer.adelete_thread(session_id)
+    return {"session_id": session_id, "topic": topic, "stream": stream}
 
-g.set_entry_point("ask_topic")
-g.add_edge("ask_topic", "search")
-g.add_edge("search", "summarize")
-g.add_edge("summarize", "generate_quiz")
-g.add_edge("generate_quiz", "evaluate")
 
-# NOTE: removed the invalid edge g.add_edge("any", "clear")
-# If you want a common utility path to clear, wire a real node (e.g. "evaluate" -> "clear")
-# g.add_edge("evaluate", "clear")
+async def _end_start_run(session_id: str, failed: bool):
+    """Delete the run's checkpoint, or keep it for resuming if the run failed; expire old ones."""
+    if failed:
+        _resumable[session_id] = time.monotonic()
+    else:
+        await _checkpointer.adelete_thread(session_id)
+    now = time.monotonic()
+    while _resumable:
+        oldest, failed_at = next(iter(_resumable.items()))
+        if len(_resumable) <= START_RESUME_MAX and now - failed_at < START_RESUME_SECONDS:
+            break
+        del _resumable[oldest]
+        await _checkpointer.adelete_thread(oldest)
 
-COMPILED_GRAPH = g.compile()
+
+def _start_result(state: Dict[str, Any]) -> Dict[str, Any]:
+    if "summary" not in state or route_topic(state) == "rejected":
+        raise InvalidTopic((state.get("validation") or {}).get("reason") or "Not a health topic.")
+    return {"session_id": state["session_id"], "topic": state.get("topic"), "summary": state.get("summary")}
 
 
-# High-level helpers for FastAPI routes to call
 async def start_topic_flow(topic: str, session_id: str = None) -> Dict[str, Any]:
     """
-    Creates a session and runs: ask_topic -> search -> summarize.
-    Returns summary (public) and session_id.
+    Creates a session and runs the /start graph (validate + search, then
+    summarize). Returns summary (public) and session_id; raises InvalidTopic
+    when the validator rejects the topic.
     """
     if not session_id:
         session_id = str(uuid.uuid4())
-    # ask_topic
-    await node_ask_topic(session_id, topic)
-    # search
-    await node_search(session_id)
-    # summarize
-    await node_summarize(session_id)
-    state = await get_session(session_id)
-    public = {
-        "session_id": session_id,
-        "topic": state.get("topic"),
-        "summary": state.get("summary"),
-    }
-    return public
+    config = {"configurable": {"thread_id": session_id}}
+    failed = False
+    try:
+        with deadline():
+            state = await START_GRAPH.ainvoke(await _start_input(topic, session_id, config, False), config)
+    except Exception:
+        failed = True
+        raise
+    finally:
+        await _end_start_run(session_id, failed)
+    return _start_result(state)
+
+
+async def start_topic_flow_stream(topic: str, session_id: str = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of start_topic_flow. Yields events:
+      {"event": "session", ...}, {"event": "search_done"},
+      {"event": "token", "text": ...} (repeated), then {"event": "done", ...}
+    with the same payload start_topic_flow returns. The session (with the
+    full summary) is written, and the summary cached, before "done" is sent.
+    The request deadline only bounds the steps before the summary starts
+    streaming; the streamed summary is bounded by SUMMARY_STREAM_TIMEOUT_SECONDS.
+    """
+    if not session_id:
+        session_id = str(uuid.uuid4())
+    config = {"configurable": {"thread_id": session_id}}
+    stop_at = time.monotonic() + REQUEST_DEADLINE_SECONDS
+    # a client that disconnects aborts the run: its checkpoint is dropped, not kept for resuming
+    failed = False
+    try:
+        graph_input = await _start_input(topic, session_id, config, True)
+        events = START_GRAPH.astream(graph_input, config, stream_mode=["updates", "custom"])
+        try:
+            while True:
+                # a deadline cannot be held across a yield, so each step of the
+                # graph is started with the time left
+                with deadline(max(0.0, stop_at - time.monotonic()), detach=True):
+                    try:
+                        mode, chunk = await events.__anext__()
+                    except StopAsyncIteration:
+                        break
+                if mode == "custom":
+                    yield {"event": "token", "text": chunk["token"]}
+                elif "ask_topic" in chunk:
+                    yield {"event": "session", "session_id": session_id, "topic": topic}
+                elif "search" in chunk:
+                    yield {"event": "search_done"}
+        except Exception:
+            failed = True
+            raise
+        finally:
+            await events.aclose()
+        state = (await START_GRAPH.aget_state(config)).values
+    finally:
+        await _end_start_run(session_id, failed)
+    result = _start_result(state)
+    yield {"event": "done", **result}
 
 
 async def request_quiz(session_id: str) -> Dict[str, Any]:
     """
-    Generates a quiz question from stored summary.
+    Returns the pre-generated quiz when it is ready (awaiting it if it is
+    still being generated in this process); otherwise generates a quiz
+    question from stored summary.
     """
-    await node_generate_quiz(session_id)
-    state = await get_session(session_id)
+    with deadline():
+        state = await QUIZ_GRAPH.ainvoke({"session_id": session_id})
     return {"session_id": session_id, "quiz": state["quiz"]["public"]}
 
 
@@ -135,9 +484,9 @@ async def submit_answer(session_id: str, user_answer: str) -> Dict[str, Any]:
     """
     Evaluates the user's answer and returns evaluation + updated grade.
     """
-    res = await node_evaluate(session_id, user_answer)
-    state = await get_session(session_id)
-    return {"session_id": session_id, "evaluation": res["evaluation"], "last_eval": state.get("last_eval")}
+    with deadline():
+        state = await ANSWER_GRAPH.ainvoke({"session_id": session_id, "user_answer": user_answer})
+    return {"session_id": session_id, "evaluation": state["evaluation"], "last_eval": state.get("last_eval")}
 
 
 async def reset_session(session_id: str):
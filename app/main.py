@@ -1,9 +1,15 @@
-from fastapi import FastAPI
 from dotenv import load_dotenv
-from app.routes.healthbot import router as healthbot_router
+
+# the only load_dotenv: before any app module reads its settings
 load_dotenv()
 
-app = FastAPI(title="HealthBot API", version="0.1")
+from fastapi import FastAPI
+
+from app.core.container import get_container
+from app.routes.healthbot import router as healthbot_router
+
+# clients are created on first use or warmed by the container (STARTUP_WARM)
+app = FastAPI(title="HealthBot API", version="0.1", lifespan=get_container().lifespan)
 
 app.include_router(healthbot_router, prefix="/healthbot")
 
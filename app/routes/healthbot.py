@@ -1,13 +1,30 @@
 # app/routes/healthbot.py
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Optional
+import hashlib
+import json
 import os
-import functools
-import heapq
+import sys
+
+from app.core.container import get_container
+from app.services.grader import grader_stats
+from app.services.llm import llm_stats
+from app.services.llm_cache import llm_cache_stats
+from app.services.popularity import get_popularity
+from app.services.search_service import search_stats
+from app.services.suggest_cache import get_suggest_cache
+from app.services.topic_cache import topic_cache_stats
+from app.services.topic_store import get_suggest_index
+from app.services.topic_validation_service import topic_validation_stats
+from app.utils.resilience import BREAKER_RESET_SECONDS, CircuitOpenError, DeadlineExceeded, resilience_stats
+from app.utils.state import session_ops
 
 router = APIRouter()
 
+SUGGEST_MAX_AGE = int(os.getenv("SUGGEST_MAX_AGE", "60"))
+
 # ---------------------------
 # Request models
 # ---------------------------
@@ -22,80 +39,74 @@ class QuizAnswerRequest(BaseModel):
 # ---------------------------
 # Suggestion engine (safe)
 # ---------------------------
-DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "medical_topics.txt")
-
-@functools.lru_cache(maxsize=1)
-def _load_medical_topics() -> List[str]:
-    if not os.path.exists(DATA_PATH):
-        return []
-    try:
-        with open(DATA_PATH, "r", encoding="utf-8") as fh:
-            return [line.strip() for line in fh if line.strip()]
-    except Exception:
-        # On any read error, return empty list — don't crash import
-        return []
-
-def _score_topic(term: str, q: str) -> int:
-    term_l = term.lower()
-    q_l = q.lower()
-    if term_l == q_l:
-        return 100
-    if term_l.startswith(q_l):
-        return 80
-    # word prefix match
-    for w in term_l.split():
-        if w.startswith(q_l):
-            return 60
-    if q_l in term_l:
-        return 40
-    return 0
-
 @router.get("/suggest", summary="Suggest medical topics for autocomplete")
-async def suggest_topics(q: str = Query(..., min_length=1), limit: int = 10):
+async def suggest_topics(request: Request, response: Response,
+                         q: str = Query(..., min_length=1), limit: int = 10):
     q = q.strip()
     if not q:
         return {"suggestions": []}
-    topics = _load_medical_topics()
-    if not topics:
-        return {"suggestions": []}
-    heap = []
-    for term in topics:
-        s = _score_topic(term, q)
-        if s > 0:
-            heapq.heappush(heap, (-s, term))
-    suggestions = []
-    seen = set()
-    while heap and len(suggestions) < limit:
-        _, t = heapq.heappop(heap)
-        if t not in seen:
-            suggestions.append(t)
-            seen.add(t)
-    if len(suggestions) < limit:
-        ql = q.lower()
-        for term in topics:
-            if term in suggestions:
-                continue
-            if ql in term.lower():
-                suggestions.append(term)
-            if len(suggestions) >= limit:
-                break
-    return {"suggestions": suggestions[:limit]}
+    popularity = get_popularity()
+    popularity.maybe_flush()
+    suggestions = get_suggest_cache().search(get_suggest_index(), q, limit, boost=popularity.score)
+
+    # let the UI and any proxy reuse identical answers
+    body = {"suggestions": suggestions}
+    etag = 'W/"%s"' % hashlib.sha1(json.dumps(body).encode("utf-8")).hexdigest()[:16]
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={SUGGEST_MAX_AGE}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return body
+
+def _unavailable(e: Exception) -> HTTPException:
+    """503 while an upstream's circuit is open, 504 when the request ran out of time."""
+    if isinstance(e, DeadlineExceeded):
+        return HTTPException(status_code=504, detail=str(e))
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(BREAKER_RESET_SECONDS))})
 
 # ---------------------------
 # Primary endpoints (lazy import workflow to avoid cycles)
 # ---------------------------
 @router.post("/start", summary="Start topic flow: search + summarize")
 async def start_topic(req: StartTopicRequest):
+    from app.core import workflow
     try:
-        from app.core import workflow
         result = await workflow.start_topic_flow(req.topic, req.session_id)
+        # only dictionary topics feed suggestion ranking
+        if get_suggest_index().is_topic(req.topic):
+            get_popularity().record(req.topic.strip().lower())
         return result
     except HTTPException:
         raise
+    except workflow.InvalidTopic as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except (CircuitOpenError, DeadlineExceeded) as e:
+        raise _unavailable(e)
     except Exception as e:
         # return a 500 with the error string
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/start/stream", summary="Start topic flow, streaming the summary as Server-Sent Events")
+async def start_topic_stream(req: StartTopicRequest):
+    from app.core import workflow
+
+    async def events():
+        try:
+            async for ev in workflow.start_topic_flow_stream(req.topic, req.session_id):
+                name = ev.pop("event")
+                if name == "done" and get_suggest_index().is_topic(req.topic):
+                    get_popularity().record(req.topic.strip().lower())
+                yield f"event: {name}\ndata: {json.dumps(ev)}\n\n"
+        except Exception as e:
+            # headers are already sent; report the failure in-band
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/quiz", summary="Generate a quiz for the active session")
 async def get_quiz(session_id: str):
     try:
@@ -103,6 +114,8 @@ async def get_quiz(session_id: str):
         return await workflow.request_quiz(session_id)
     except HTTPException:
         raise
+    except (CircuitOpenError, DeadlineExceeded) as e:
+        raise _unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -113,6 +126,8 @@ async def submit_answer(body: QuizAnswerRequest):
         return await workflow.submit_answer(body.session_id, body.answer)
     except HTTPException:
         raise
+    except (CircuitOpenError, DeadlineExceeded) as e:
+        raise _unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -125,3 +140,21 @@ async def reset(session_id: str):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/metrics", summary="Cache, grading, LLM and session-store counters for this worker")
+async def metrics():
+    # the workflow (and LangGraph) is not imported just to report on it
+    workflow = sys.modules.get("app.core.workflow")
+    return {
+        "suggest_cache": get_suggest_cache().stats(),
+        "topic_cache": topic_cache_stats(),
+        "grader": grader_stats(),
+        "llm": llm_stats(),
+        "llm_cache": llm_cache_stats(),
+        "session_ops": session_ops(),
+        "topic_validation": topic_validation_stats(),
+        "search": search_stats(),
+        "breakers": resilience_stats(),
+        "nodes": workflow.workflow_stats() if workflow else {},
+        "startup": get_container().stats(),
+    }
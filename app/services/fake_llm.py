@@ -0,0 +1,116 @@
+# app/services/fake_llm.py
+"""
+Local stand-in for the chat model (LLM_PROVIDER=fake).
+
+Answers HealthBot's own prompts deterministically and without a network:
+summaries are the first sentences of the source text, quiz questions are
+built from summary sentences, grading uses word overlap and every topic is
+accepted by the validator. Output has the shape the real prompts ask for,
+so the whole flow (batching, parsing, caching, streaming) can be exercised
+in load tests and local development. LLM_FAKE_LATENCY_MS adds an artificial
+delay per call.
+"""
+import asyncio
+import json
+import os
+import re
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+LATENCY_MS = int(os.getenv("LLM_FAKE_LATENCY_MS", "0"))
+
+_SECTION_RE = r"^\s*{name}:\s*$\n(?P<body>[\s\S]*?)(?=^\s*[A-Z_]+:\s*$|\Z)"
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _section(text: str, name: str) -> str:
+    m = re.search(_SECTION_RE.format(name=name), text, re.MULTILINE)
+    return m.group("body").strip() if m else ""
+
+
+def _sentences(text: str) -> List[str]:
+    text = re.sub(r"\s+", " ", re.sub(r"^.*—.*$|^-+$", " ", text, flags=re.MULTILINE))
+    return [s.strip() for s in _SENTENCE_RE.split(text) if len(s.split()) >= 4]
+
+
+def _question(sentence: str, i: int) -> dict:
+    words = sentence.rstrip(".!?").split()
+    cut = max(2, len(words) // 2)
+    if i % 2:
+        return {
+            "question": f"True or false: {sentence}",
+            "options": ["True", "False"],
+            "answer": "True",
+            "hint": "Look at what the summary says.",
+        }
+    return {
+        "question": f"Complete the sentence: \"{' '.join(words[:cut])} ...\"",
+        "options": None,
+        "answer": " ".join(words[cut:]),
+        "hint": f"It is about {words[-1].lower()}.",
+    }
+
+
+def fake_reply(messages: List[BaseMessage]) -> str:
+    """The fake model's reply to one of HealthBot's prompts."""
+    prompt = "\n".join(str(m.content) for m in messages)
+
+    if "medical topic validator" in prompt:
+        m = re.search(r'USER INPUT: "(.*)"', prompt)
+        topic = (m.group(1) if m else "").strip()
+        valid = bool(re.search(r"[aeiouy]", topic.lower())) and len(topic) >= 3
+        return json.dumps({"valid": valid, "cleaned_topic": topic if valid else "",
+                           "reason": "Looks like a health topic." if valid else "Not a recognizable topic."})
+
+    if "Grade the USER_ANSWER" in prompt:
+        canonical = set(_WORD_RE.findall(_section(prompt, "CANONICAL_ANSWER").lower()))
+        given = set(_WORD_RE.findall(_section(prompt, "USER_ANSWER").lower()))
+        score = round(len(canonical & given) / len(canonical), 2) if canonical else 0.0
+        verdict = "correct" if score >= 0.7 else "partial" if score >= 0.3 else "incorrect"
+        summary = _sentences(_section(prompt, "SUMMARY"))
+        return json.dumps({"score": score, "verdict": verdict,
+                           "explanation": f"Your answer covers {int(score * 100)}% of the expected answer.",
+                           "citations": summary[:1]})
+
+    if "comprehension question" in prompt:
+        sentences = _sentences(_section(prompt, "SUMMARY")) or ["This topic is explained in the summary."]
+        m = re.search(r"create (\d+) different", prompt)
+        if m:
+            n = int(m.group(1))
+            return json.dumps([_question(sentences[i % len(sentences)], i) for i in range(n)])
+        return json.dumps(_question(sentences[0], 0))
+
+    # summary
+    sentences = _sentences(_section(prompt, "TEXT")) or ["There is not much information about this topic yet."]
+    takeaways = "\n".join(f"- {s}" for s in (sentences * 3)[:3])
+    return (" ".join(sentences[:4]) + "\n\nKey takeaways:\n" + takeaways
+            + "\n\nIf you are unsure about anything, please talk to your clinician.")
+
+
+class FakeChatModel(BaseChatModel):
+    latency_ms: int = LATENCY_MS
+
+    @property
+    def _llm_type(self) -> str:
+        return "healthbot-fake"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=fake_reply(messages)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return self._generate(messages, stop=stop)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        for piece in re.findall(r"\S+\s*", fake_reply(messages)):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
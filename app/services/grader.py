@@ -0,0 +1,196 @@
+# app/services/grader.py
+"""
+Tiered answer grading: cheap deterministic checks first, LLM only when unsure.
+
+ 1. exact   — MCQ: the chosen option is (or is not) the canonical option.
+              Short answer: normalized text equals the canonical answer.
+ 2. lexical — similarity between the user and canonical answers: character
+              trigram cosine blended with IDF-weighted recall of the
+              canonical answer's words (IDF over the summary's sentences).
+              At or above GRADER_ACCEPT it is correct. Low similarity is
+              not evidence of a wrong answer (a paraphrase such as
+              "hypoglycemia" for "low blood sugar" shares no words), so it
+              only rejects when the answer is the canonical one with its
+              negation flipped ("contagious" vs "not contagious").
+ 3. llm     — evaluate_answer for everything in between.
+ 4. fallback — if the LLM fails (circuit open, out of time), the answer is
+               returned ungraded: verdict "partial", the lexical similarity as
+               its score, and an explanation that grading is unavailable.
+               Similarity cannot confirm an answer ("Low blood pressure"
+               scores 0.71 against "High blood pressure"), so this tier
+               never says "correct".
+
+Tiers 1, 2 and 4 build their explanation from a template and cite the summary
+sentences closest to the canonical answer. Per-tier counts are kept for
+the /metrics endpoint.
+"""
+import functools
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.services.quiz_service import evaluate_answer
+
+logger = logging.getLogger("healthbot.grader")
+GRADER_ACCEPT = float(os.getenv("GRADER_ACCEPT", "0.85"))
+
+TIERS = ("exact", "lexical", "llm", "fallback")
+_stats: Counter = Counter()
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_OPTION_PREFIX_RE = re.compile(r"^\(?([a-h])\s*[\).:]\s*|^\(?([a-h])\)?$")
+_ARTICLES = {"a", "an", "the"}
+_NEGATIONS = {"no", "not", "never", "none", "cannot", "cant", "dont", "doesnt", "isnt", "arent", "wont", "without"}
+_STOPWORDS = _ARTICLES | {
+    "and", "or", "of", "to", "in", "on", "for", "is", "are", "it", "its", "be", "can", "with", "by",
+    "that", "this", "as", "at", "from", "your", "you", "they", "their", "which", "may", "do", "does",
+}
+
+
+def normalize_answer(text: str) -> str:
+    words = _WORD_RE.findall((text or "").lower().replace("'", ""))
+    return " ".join(w for w in words if w not in _ARTICLES)
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall((text or "").lower().replace("'", ""))
+
+
+def _trigrams(text: str) -> Counter:
+    t = f" {normalize_answer(text)} "
+    return Counter(t[i:i + 3] for i in range(len(t) - 2))
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(v * b.get(k, 0) for k, v in a.items())
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+def _sentences(summary: str) -> List[str]:
+    return [s.strip(" -*•\t") for s in _SENTENCE_RE.split(summary or "") if len(s.split()) >= 3]
+
+
+def _idf(sentences: List[str]) -> Dict[str, float]:
+    df = Counter(w for s in sentences for w in set(_words(s)))
+    n = len(sentences) or 1
+    return {w: math.log((n + 1) / (c + 1)) + 1.0 for w, c in df.items()}
+
+
+def similarity(user_answer: str, canonical: str, idf: Optional[Dict[str, float]] = None) -> float:
+    """0..1 lexical similarity of a user answer to the canonical answer."""
+    char_sim = _cosine(_trigrams(user_answer), _trigrams(canonical))
+    wanted = {w for w in _words(canonical) if w not in _STOPWORDS}
+    if not wanted:
+        return char_sim
+    idf = idf or {}
+    got = set(_words(user_answer))
+    total = sum(idf.get(w, 1.0) for w in wanted)
+    recall = sum(idf.get(w, 1.0) for w in wanted if w in got) / total
+    return 0.5 * char_sim + 0.5 * recall
+
+
+def _option_index(answer: str, options: List[str]) -> Optional[int]:
+    norm = normalize_answer(answer)
+    normalized = [normalize_answer(o) for o in options]
+    if norm in normalized:
+        return normalized.index(norm)
+    m = _OPTION_PREFIX_RE.match((answer or "").strip().lower())
+    if m:
+        idx = ord((m.group(1) or m.group(2))) - ord("a")
+        if idx < len(options):
+            rest = normalize_answer(answer[m.end():])
+            if not rest or rest == normalized[idx]:
+                return idx
+    return None
+
+
+def _strip_negations(text: str) -> str:
+    return " ".join(w for w in _words(text) if w not in _NEGATIONS)
+
+
+@functools.lru_cache(maxsize=256)
+def _summary_idf(summary: str) -> Dict[str, float]:
+    return _idf(_sentences(summary))
+
+
+@functools.lru_cache(maxsize=1024)
+def _citations(summary: str, canonical: str, k: int = 2) -> Tuple[str, ...]:
+    # summaries and canonical answers are shared per topic, so this is cached
+    sentences = _sentences(summary)
+    idf = _summary_idf(summary)
+    ranked = sorted(sentences, key=lambda s: similarity(s, canonical, idf), reverse=True)
+    return tuple(" ".join(s.split()[:40]) for s in ranked[:k]) or (canonical[:120],)
+
+
+def _result(tier: str, verdict: str, score: float, summary: str, canonical: str,
+            explanation: Optional[str] = None) -> dict:
+    _stats[tier] += 1
+    if explanation is None and verdict == "correct":
+        explanation = "Your answer matches the expected answer."
+    elif explanation is None:
+        explanation = f"The expected answer was: {canonical.strip()}"
+    return {
+        "score": round(score, 2),
+        "verdict": verdict,
+        "explanation": explanation,
+        "citations": list(_citations(summary, canonical)),
+        "graded_by": tier,
+    }
+
+
+async def grade_answer(summary: str, canonical: str, user_answer: str,
+                       options: Optional[List[str]] = None) -> dict:
+    """Grade with the cheapest tier that is confident; same shape as evaluate_answer."""
+    canonical = canonical or ""
+
+    # tier 1: exact
+    if options:
+        truth = _option_index(canonical, options)
+        chosen = _option_index(user_answer, options)
+        if truth is not None and chosen is not None:
+            if chosen == truth:
+                return _result("exact", "correct", 1.0, summary, canonical)
+            return _result("exact", "incorrect", 0.0, summary, options[truth])
+    if canonical.strip() and normalize_answer(user_answer) == normalize_answer(canonical):
+        return _result("exact", "correct", 1.0, summary, canonical)
+
+    # tier 2: lexical similarity
+    if canonical.strip() and user_answer.strip():
+        same_polarity = (set(_words(user_answer)) & _NEGATIONS) == (set(_words(canonical)) & _NEGATIONS)
+        if same_polarity:
+            sim = similarity(user_answer, canonical, _summary_idf(summary))
+            if sim >= GRADER_ACCEPT:
+                return _result("lexical", "correct", sim, summary, canonical)
+        elif similarity(_strip_negations(user_answer), _strip_negations(canonical)) >= GRADER_ACCEPT:
+            # the same statement with the opposite polarity
+            return _result("lexical", "incorrect", 0.0, summary, canonical)
+
+    # tier 3: LLM
+    try:
+        result = await evaluate_answer(summary, canonical, user_answer)
+    except Exception as e:
+        # tier 4: answer ungraded rather than fail the request (or guess a verdict)
+        logger.info("LLM grading unavailable, returning the answer ungraded: %s", e)
+        sim = similarity(user_answer, canonical, _summary_idf(summary)) if user_answer.strip() else 0.0
+        explanation = ("Automatic grading is unavailable right now, so your answer was not checked. "
+                       f"Compare it with the expected answer: {canonical.strip()}")
+        return _result("fallback", "partial", sim, summary, canonical, explanation)
+    _stats["llm"] += 1
+    if isinstance(result, dict):
+        result.setdefault("graded_by", "llm")
+    return result
+
+
+def grader_stats() -> dict:
+    total = sum(_stats[t] for t in TIERS)
+    return {
+        "total": total,
+        "by_tier": {t: _stats[t] for t in TIERS},
+        "hit_rate": {t: round(_stats[t] / total, 4) if total else 0.0 for t in TIERS},
+    }
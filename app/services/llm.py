@@ -1,26 +1,75 @@
 # app/services/llm.py
+import asyncio
+import functools
 import logging
 import os
-from dotenv import load_dotenv
-load_dotenv()
+from typing import Dict, Tuple
+
+from app.services.llm_cache import cached_completion
+from app.services.llm_dispatcher import LLMDispatcher
+from app.utils.resilience import call_with_retry, get_breaker
+
 logger = logging.getLogger("call llm")
 
-# Create/invoke LLM instance
-try:
-    from langchain_openai import ChatOpenAI
-    MODEL = os.getenv("LC_MODEL", "gpt-4o-mini")
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", None)
-    llm = ChatOpenAI(model=MODEL, temperature=0.2)
-except Exception as e:
-    llm = None
-    logger.debug("langchain_openai.ChatOpenAI not available at import: %s", e)
+# "openai" (default) or "fake" (app/services/fake_llm.py: offline, deterministic)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai").lower()
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+
+MODEL = "fake" if LLM_PROVIDER == "fake" else os.getenv("LC_MODEL", "gpt-4o-mini")
 
 
-async def call_llm(llm, messages):
+@functools.lru_cache(maxsize=1)
+def get_llm():
     """
-    Minimal wrapper for newest langchain-openai ChatOpenAI.
-    Expects llm.agenerate to be available and messages list of SystemMessage/HumanMessage.
+    The chat model, created on first use (or by the startup warm-up, see
+    app/core/container.py) so that importing the app does not load
+    langchain/openai. None if the provider is not available.
     """
-    result = await llm.agenerate([messages])
-    return result.generations[0][0].message.content
+    try:
+        if LLM_PROVIDER == "fake":
+            from app.services.fake_llm import FakeChatModel
+            return FakeChatModel()
+        from langchain_openai import ChatOpenAI
+        # retries are done by call_llm (app/utils/resilience.py), not the client
+        return ChatOpenAI(model=MODEL, temperature=0.2, max_retries=0)
+    except Exception as e:
+        logger.warning("LLM provider %r not available: %s", LLM_PROVIDER, e)
+        return None
+
+# one dispatcher (batching window, concurrency, rate budgets) per model
+# instance and event loop: its timer, semaphore and futures belong to the loop
+# that created them, and would stall in another (e.g. a second asyncio.run)
+_dispatchers: Dict[int, Tuple[asyncio.AbstractEventLoop, LLMDispatcher]] = {}
+
+
+def get_dispatcher(model) -> LLMDispatcher:
+    loop = asyncio.get_running_loop()
+    entry = _dispatchers.get(id(model))
+    if entry is None or entry[0] is not loop or entry[1].model is not model:
+        entry = _dispatchers[id(model)] = (loop, LLMDispatcher(model, breaker=get_breaker("llm"),
+                                                               timeout=LLM_TIMEOUT_SECONDS))
+    return entry[1]
 
+
+def llm_stats() -> dict:
+    # only a model that has been used has a dispatcher; never create one here
+    return next(iter(_dispatchers.values()))[1].stats() if _dispatchers else {}
+
+
+async def call_llm(llm, messages, kind: str = "default", cache_if=None):
+    """
+    Text of the model's reply to `messages` (a list of SystemMessage/HumanMessage).
+    Served from the LLM response cache when this prompt was answered before
+    (TTL per `kind`, see llm_cache); otherwise goes through the model's
+    dispatcher, so concurrent calls are batched into one llm.agenerate call
+    and kept within the configured rate budgets. Provider calls go through
+    the "llm" circuit breaker, which the dispatcher updates once per batch,
+    and failed prompts are retried (transient errors only) within the
+    request's deadline; cache hits keep working while it is open.
+    """
+    return await cached_completion(
+        llm, messages, kind,
+        lambda: call_with_retry(lambda: get_dispatcher(llm).generate(messages),
+                                timeout=LLM_TIMEOUT_SECONDS, name="llm"),
+        cache_if=cache_if,
+    )
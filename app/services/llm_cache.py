@@ -0,0 +1,217 @@
+# app/services/llm_cache.py
+"""
+Response cache beneath call_llm.
+
+Responses are keyed by a hash of the model name, its temperature and the
+prompt's messages (role + whitespace-normalized content), so any service
+resending an identical prompt gets the stored reply instead of a provider
+call. Tiers:
+ - an in-process LRU (LLM_CACHE_LOCAL_SIZE entries, at most LLM_CACHE_LOCAL_TTL)
+ - Redis, shared by all workers
+ - optionally, for the kinds listed in LLM_CACHE_NEAR_KINDS, an in-process
+   near-duplicate index: a prompt whose MinHash-estimated word-shingle
+   Jaccard similarity to a cached prompt of the same kind is at least
+   LLM_CACHE_NEAR_THRESHOLD reuses that reply. Off by default; only enable
+   it for kinds where a slightly different prompt may share an answer
+   (e.g. "summary"), never for grading.
+
+Each call kind has its own TTL (LLM_CACHE_TTL_<KIND> seconds, 0 disables
+caching for it). Quiz generation is not cached by default: asking again must
+produce new questions. Identical prompts in flight at the same time share one
+call. Cache errors are logged and treated as misses.
+"""
+import hashlib
+import logging
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.utils.cache import TTLCache
+from app.utils.redis_client import get_redis
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger("healthbot.llm_cache")
+
+DEFAULT_TTLS = {
+    "summary": 24 * 3600,
+    "grade": 3600,
+    "validate": 7 * 24 * 3600,
+    "quiz": 0,
+    "quiz_bank": 0,
+    "default": 3600,
+}
+LOCAL_SIZE = int(os.getenv("LLM_CACHE_LOCAL_SIZE", "1024"))
+LOCAL_TTL = float(os.getenv("LLM_CACHE_LOCAL_TTL", "600"))
+NEAR_KINDS = {k.strip() for k in os.getenv("LLM_CACHE_NEAR_KINDS", "").split(",") if k.strip()}
+NEAR_THRESHOLD = float(os.getenv("LLM_CACHE_NEAR_THRESHOLD", "0.9"))
+
+_local = TTLCache(maxsize=LOCAL_SIZE, ttl=LOCAL_TTL)
+_flights = SingleFlight()
+_stats: Counter = Counter()
+
+
+def cache_ttl(kind: str) -> int:
+    default = DEFAULT_TTLS.get(kind, DEFAULT_TTLS["default"])
+    return int(os.getenv(f"LLM_CACHE_TTL_{kind.upper()}", str(default)))
+
+
+def _model_id(model: Any) -> Tuple[str, str]:
+    name = getattr(model, "model_name", None) or getattr(model, "model", None) or type(model).__name__
+    return str(name), str(getattr(model, "temperature", ""))
+
+
+def _normalized(messages: List[Any]) -> str:
+    return "\n".join(
+        f"{getattr(m, 'type', type(m).__name__)}:{' '.join(str(getattr(m, 'content', m)).split())}"
+        for m in messages
+    )
+
+
+def llm_cache_key(model: Any, messages: List[Any]) -> str:
+    name, temperature = _model_id(model)
+    text = f"{name}\n{temperature}\n{_normalized(messages)}"
+    return "healthbot:llm:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# ---------- near-duplicate tier ----------
+_SHINGLE = 4
+_BANDS, _ROWS = 8, 4
+_PRIME = (1 << 61) - 1
+_PERMS = [((i * 0x9E3779B97F4A7C15 + 0x7F4A7C15) % _PRIME or 1, (i * 0xBF58476D1CE4E5B9 + 1) % _PRIME)
+          for i in range(_BANDS * _ROWS)]
+_WORD_RE = re.compile(r"\w+")
+
+
+def minhash(text: str) -> Tuple[int, ...]:
+    words = _WORD_RE.findall(text.lower())
+    shingles = {zlib.crc32(" ".join(words[i:i + _SHINGLE]).encode("utf-8"))
+                for i in range(max(1, len(words) - _SHINGLE + 1))}
+    return tuple(min((a * x + b) % _PRIME for x in shingles) for a, b in _PERMS)
+
+
+class NearDuplicateIndex:
+    """MinHash + LSH banding over recent prompts of one kind (in-process)."""
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._signatures = TTLCache(maxsize=maxsize, ttl=float("inf"))  # key -> signature
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[str]] = {}
+
+    def add(self, key: str, signature: Tuple[int, ...]):
+        if key in self._signatures:
+            return
+        self._signatures.set(key, signature)
+        if len(self._buckets) > 4 * _BANDS * self.maxsize:
+            # drop buckets that only point at evicted signatures
+            self._buckets = {b: keys for b, keys in self._buckets.items()
+                             if any(k in self._signatures for k in keys)}
+        for band in range(_BANDS):
+            bucket = self._buckets.setdefault((band, signature[band * _ROWS:(band + 1) * _ROWS]), [])
+            bucket.append(key)
+            del bucket[:-8]
+
+    def lookup(self, signature: Tuple[int, ...], threshold: float) -> Optional[str]:
+        best, best_sim = None, threshold
+        seen = set()
+        for band in range(_BANDS):
+            for key in self._buckets.get((band, signature[band * _ROWS:(band + 1) * _ROWS]), ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                other = self._signatures.get(key, count=False)
+                if other is None:
+                    continue
+                sim = sum(a == b for a, b in zip(signature, other)) / len(signature)
+                if sim >= best_sim:
+                    best, best_sim = key, sim
+        return best
+
+
+_near: Dict[str, NearDuplicateIndex] = {}
+
+
+# ---------- lookup ----------
+async def _get(key: str, tier_stats: bool = True) -> Optional[str]:
+    value = _local.get(key, count=False)
+    if value is not None:
+        _stats["hits_local"] += tier_stats
+        return value
+    try:
+        r = await get_redis()
+        value = await r.get(key)
+    except Exception as e:
+        logger.debug("LLM cache read failed for %s: %s", key, e)
+        return None
+    if value is not None:
+        _stats["hits_redis"] += tier_stats
+        _local.set(key, value)
+    return value
+
+
+async def _set(key: str, value: str, ttl: int):
+    _local.set(key, value, ttl=min(LOCAL_TTL, ttl))
+    try:
+        r = await get_redis()
+        await r.set(key, value, ex=ttl)
+    except Exception as e:
+        logger.debug("LLM cache write failed for %s: %s", key, e)
+
+
+async def cached_completion(model: Any, messages: List[Any], kind: str,
+                            compute: Callable[[], Awaitable[str]],
+                            cache_if: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    The cached reply for this prompt, or compute() stored under it. Replies
+    rejected by `cache_if` (e.g. unparseable output) are returned but not stored.
+    """
+    ttl = cache_ttl(kind)
+    if ttl <= 0:
+        _stats[f"bypass:{kind}"] += 1
+        return await compute()
+    key = llm_cache_key(model, messages)
+    value = await _get(key)
+    if value is not None:
+        _stats[f"hits:{kind}"] += 1
+        return value
+
+    signature = None
+    if kind in NEAR_KINDS:
+        signature = minhash(_normalized(messages))
+        index = _near.setdefault(kind, NearDuplicateIndex())
+        near_key = index.lookup(signature, NEAR_THRESHOLD)
+        if near_key is not None:
+            value = await _get(near_key, tier_stats=False)
+            if value is not None:
+                _stats["hits_near"] += 1
+                _stats[f"hits:{kind}"] += 1
+                return value
+
+    _stats[f"misses:{kind}"] += 1
+
+    async def run() -> str:
+        out = await compute()
+        if out and (cache_if is None or cache_if(out)):
+            await _set(key, out, ttl)
+            if signature is not None:
+                _near[kind].add(key, signature)
+        return out
+
+    return await _flights.do(key, run)
+
+
+def llm_cache_stats() -> dict:
+    kinds = sorted({k.split(":", 1)[1] for k in _stats if ":" in k})
+    hits = sum(_stats[f"hits:{k}"] for k in kinds)
+    misses = sum(_stats[f"misses:{k}"] for k in kinds)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "by_tier": {t: _stats[f"hits_{t}"] for t in ("local", "redis", "near")},
+        "by_kind": {k: {"hits": _stats[f"hits:{k}"], "misses": _stats[f"misses:{k}"],
+                        "bypassed": _stats[f"bypass:{k}"]} for k in kinds},
+        "local_size": len(_local),
+        "inflight": len(_flights),
+    }
@@ -0,0 +1,190 @@
+# app/services/llm_dispatcher.py
+"""
+Batched, rate-limited access to the chat model.
+
+Prompts submitted within LLM_BATCH_WINDOW_MS of each other (up to
+LLM_MAX_BATCH) go to the provider as one `agenerate` batch; each caller gets
+its own completion back. At most LLM_MAX_CONCURRENCY batches run at once, and
+two token buckets keep the process under the key's budgets:
+ - LLM_RPM: requests per minute (each prompt in a batch counts)
+ - LLM_TPM: tokens per minute, estimated as prompt chars / 4 plus
+   LLM_EXPECTED_OUTPUT_TOKENS per prompt
+A budget of 0 disables that bucket. Buckets hold LLM_BURST_SECONDS worth of
+budget, so a burst is spread out instead of spending a whole minute's budget
+at once (providers also enforce limits over sub-minute windows). Waiting here instead of firing requests
+that would be rejected turns bursts of 429s into a short queue.
+
+Each provider call goes through the dispatcher's circuit breaker and records
+one success or failure on it, however many prompts the batch carried; a
+provider call that takes longer than `timeout` counts as failed. If a batch
+fails, every prompt in it fails with the same error; call_llm retries each of
+them (app/utils/resilience.py), and the retries are batched again.
+"""
+import asyncio
+import contextlib
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from app.utils.resilience import CircuitBreaker, CircuitOpenError, is_retryable
+
+BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", "5"))
+MAX_BATCH = int(os.getenv("LLM_MAX_BATCH", "8"))
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+RPM = float(os.getenv("LLM_RPM", "0"))
+TPM = float(os.getenv("LLM_TPM", "0"))
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "300"))
+BURST_SECONDS = float(os.getenv("LLM_BURST_SECONDS", "5"))
+
+
+def estimate_tokens(messages: List[Any]) -> int:
+    """Rough prompt + completion token count for budgeting."""
+    chars = sum(len(str(getattr(m, "content", m))) for m in messages)
+    return chars // 4 + EXPECTED_OUTPUT_TOKENS
+
+
+def generation_text(gen: Any) -> str:
+    text = getattr(gen, "text", None)
+    if text:
+        return text
+    message = getattr(gen, "message", None)
+    if message is not None and getattr(message, "content", None) is not None:
+        return message.content
+    return text if text is not None else str(gen)
+
+
+class TokenBucket:
+    """Refills `per_minute` tokens per minute, holding at most `burst_seconds` worth."""
+
+    def __init__(self, per_minute: float, burst_seconds: float = BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waited = 0.0  # seconds spent waiting, for /metrics
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, n: float):
+        if self.rate <= 0:
+            return
+        n = min(n, self.capacity)
+        # one waiter at a time, so large requests are not starved by small ones
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                delay = (n - self.tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+
+class LLMDispatcher:
+    def __init__(self, model: Any, window_ms: float = BATCH_WINDOW_MS, max_batch: int = MAX_BATCH,
+                 concurrency: int = MAX_CONCURRENCY, rpm: float = RPM, tpm: float = TPM,
+                 breaker: Optional[CircuitBreaker] = None, timeout: Optional[float] = None):
+        self.model = model
+        self.breaker = breaker
+        self.timeout = timeout
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._sem = asyncio.Semaphore(concurrency)
+        self._pending: List[Tuple[List[Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._stats: Dict[str, int] = {"prompts": 0, "batches": 0, "largest_batch": 0, "failed_batches": 0}
+
+    async def generate(self, messages: List[Any]) -> str:
+        """Text of the model's completion for one prompt (a list of messages)."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((messages, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[List[Any], asyncio.Future]]):
+        calling = False
+        try:
+            async with self._sem:
+                # callers that gave up while queued cost nothing
+                batch = [(m, f) for m, f in batch if not f.done()]
+                if not batch:
+                    return
+                if self.breaker is not None:
+                    self.breaker.allow()
+                calling = True
+                await self.requests.acquire(len(batch))
+                await self.tokens.acquire(sum(estimate_tokens(m) for m, _ in batch))
+                self._stats["prompts"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+                result = await asyncio.wait_for(self.model.agenerate([m for m, _ in batch]), self.timeout)
+        except BaseException as e:
+            if calling:
+                self._stats["failed_batches"] += 1
+                self._record(e)
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e if isinstance(e, Exception) else RuntimeError("LLM batch cancelled"))
+            if not isinstance(e, Exception):
+                raise
+            return
+        self._record(None)
+        generations = result.generations
+        if len(generations) != len(batch):
+            self._stats["failed_batches"] += 1
+        for i, (_, fut) in enumerate(batch):
+            if fut.done():
+                continue
+            if i < len(generations) and generations[i]:
+                fut.set_result(generation_text(generations[i][0]))
+            else:
+                # never leave a caller waiting on a completion that will not come
+                fut.set_exception(RuntimeError(
+                    f"LLM batch returned {len(generations)} generations for {len(batch)} prompts"))
+
+    def _record(self, error: Optional[BaseException]):
+        """One breaker outcome for the provider call just made."""
+        if self.breaker is None or isinstance(error, CircuitOpenError):
+            return
+        if error is None:
+            self.breaker.record_success()
+        elif isinstance(error, Exception) and is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_other()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, messages: List[Any]) -> AsyncIterator[None]:
+        """Concurrency and budget for a call made outside of batching (e.g. streaming)."""
+        async with self._sem:
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimate_tokens(messages))
+            self._stats["prompts"] += 1
+            yield
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "queued": len(self._pending),
+            "rate_limit_wait_seconds": round(self.requests.waited + self.tokens.waited, 3),
+        }
@@ -0,0 +1,96 @@
+# app/services/popularity.py
+"""
+Time-decayed topic popularity used to order /suggest results.
+
+Each successful /start for a dictionary topic adds a weight to a per-process
+counter. Weights use forward decay: a start at time t weighs
+2 ** ((t - EPOCH) / half_life), so newer starts count for more and counters
+from different workers can simply be added together (no timestamps needed).
+Ratios between scores equal the exponentially decayed counts.
+
+Pending increments are flushed to a Redis hash with HINCRBYFLOAT every
+POPULARITY_FLUSH_SECONDS, and the merged global scores are read back in the
+same round-trip. If Redis is unavailable the process keeps ranking with its
+local counts.
+"""
+import asyncio
+import functools
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger("healthbot.popularity")
+
+POPULARITY_KEY = "healthbot:popularity"
+HALF_LIFE_SECONDS = float(os.getenv("POPULARITY_HALF_LIFE_SECONDS", str(7 * 24 * 3600)))
+FLUSH_SECONDS = float(os.getenv("POPULARITY_FLUSH_SECONDS", "30"))
+
+# Forward-decay landmark (2023-11-14). With a 7-day half-life weights stay
+# well inside float range for ~19 years; move the landmark and clear the
+# hash if the half-life is shortened drastically.
+EPOCH = 1_700_000_000
+
+
+class PopularityCounter:
+    def __init__(self, half_life: float = HALF_LIFE_SECONDS, flush_seconds: float = FLUSH_SECONDS):
+        self.half_life = half_life
+        self.flush_seconds = flush_seconds
+        self._pending: Dict[str, float] = {}  # local increments not yet in Redis
+        self._scores: Dict[str, float] = {}   # global scores as last read + local pending
+        self._flushed_at = time.monotonic()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _weight(self, now: Optional[float] = None) -> float:
+        return 2.0 ** (((now or time.time()) - EPOCH) / self.half_life)
+
+    def record(self, topic_l: str):
+        """Count one start of a (lowercase) dictionary topic."""
+        w = self._weight()
+        self._pending[topic_l] = self._pending.get(topic_l, 0.0) + w
+        self._scores[topic_l] = self._scores.get(topic_l, 0.0) + w
+        self.maybe_flush()
+
+    def score(self, topic_l: str) -> float:
+        return self._scores.get(topic_l, 0.0)
+
+    def maybe_flush(self):
+        """Schedule a background flush when the interval has elapsed."""
+        if time.monotonic() - self._flushed_at < self.flush_seconds:
+            return
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._flushed_at = time.monotonic()
+        self._flush_task = loop.create_task(self.flush())
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        try:
+            r = await get_redis()
+            async with r.pipeline(transaction=False) as pipe:
+                for topic_l, w in pending.items():
+                    pipe.hincrbyfloat(POPULARITY_KEY, topic_l, w)
+                pipe.hgetall(POPULARITY_KEY)
+                results = await pipe.execute()
+        except Exception as e:
+            # keep the increments for the next attempt
+            for topic_l, w in pending.items():
+                self._pending[topic_l] = self._pending.get(topic_l, 0.0) + w
+            logger.debug("Popularity flush failed: %s", e)
+            return
+        scores = {k: float(v) for k, v in (results[-1] or {}).items()}
+        # increments recorded while the flush was in flight are not in Redis yet
+        for topic_l, w in self._pending.items():
+            scores[topic_l] = scores.get(topic_l, 0.0) + w
+        self._scores = scores
+
+
+@functools.lru_cache(maxsize=1)
+def get_popularity() -> PopularityCounter:
+    return PopularityCounter()
@@ -0,0 +1,115 @@
+# app/services/quiz_bank.py
+"""
+Per-topic bank of pre-generated quiz questions.
+
+One LLM call (generate_quiz_bank) produces QUIZ_BANK_BATCH varied questions
+for a topic's cached summary. The bank is a list in the topic cache
+(in-process LRU + a Redis list, keyed by topic and prompt version), so every
+session on every worker draws from it. Sessions track the ids of questions
+they have seen and are served unseen ones; when a session has
+QUIZ_BANK_REFILL_AT or fewer unseen questions left, a refill batch is
+generated in the background. Refills append to the list atomically, so two
+workers refilling the same topic keep both batches (a question both happened
+to generate is deduplicated on read). The bank keeps the newest QUIZ_BANK_MAX
+questions.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+from typing import Dict, List, Optional, Set
+
+from app.services.quiz_service import generate_quiz_bank
+from app.services.topic_cache import append_cached, get_cached_list, normalize_topic
+from app.utils.resilience import BACKGROUND_DEADLINE_SECONDS, deadline
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger("healthbot.quiz_bank")
+
+QUIZ_BANK = "quizlist"  # a Redis list of JSON questions
+QUIZ_BANK_BATCH = int(os.getenv("QUIZ_BANK_BATCH", "8"))
+QUIZ_BANK_REFILL_AT = int(os.getenv("QUIZ_BANK_REFILL_AT", "2"))
+QUIZ_BANK_MAX = int(os.getenv("QUIZ_BANK_MAX", "40"))
+
+_refills = SingleFlight()
+_background: Set[asyncio.Task] = set()
+
+
+def question_id(quiz: Dict) -> str:
+    text = " ".join(str(quiz.get("question", "")).lower().split())
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def _decode(items: List[str]) -> List[Dict]:
+    bank, known = [], set()
+    for raw in items:
+        try:
+            quiz = json.loads(raw)
+        except json.JSONDecodeError:
+            continue
+        if quiz.get("id") not in known:
+            known.add(quiz.get("id"))
+            bank.append(quiz)
+    return bank
+
+
+async def load_bank(topic: str) -> List[Dict]:
+    return _decode(await get_cached_list(QUIZ_BANK, topic) or [])
+
+
+async def refill(topic: str, summary: str) -> List[Dict]:
+    """Generate one batch and merge it into the bank (one refill per topic at a time)."""
+    return await _refills.do(normalize_topic(topic), lambda: _refill(topic, summary))
+
+
+async def _refill(topic: str, summary: str) -> List[Dict]:
+    fresh = await generate_quiz_bank(summary, QUIZ_BANK_BATCH)
+    bank = await load_bank(topic)
+    known = {q["id"] for q in bank}
+    added = []
+    for quiz in fresh:
+        quiz = {k: quiz.get(k) for k in ("question", "options", "answer", "hint")}
+        quiz["id"] = question_id(quiz)
+        if quiz["id"] not in known:
+            known.add(quiz["id"])
+            added.append(json.dumps(quiz))
+    if not added:
+        return bank
+    return _decode(await append_cached(QUIZ_BANK, topic, added, keep=QUIZ_BANK_MAX))
+
+
+def _refill_in_background(topic: str, summary: str):
+    async def run():
+        try:
+            with deadline(BACKGROUND_DEADLINE_SECONDS, detach=True):
+                await refill(topic, summary)
+        except Exception as e:
+            logger.info("Background quiz bank refill failed for %r: %s", topic, e)
+
+    task = asyncio.create_task(run())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def next_question(topic: str, summary: str, seen: List[str]) -> Optional[Dict]:
+    """
+    An unseen question for this session (dict with id, question, options,
+    answer, hint), or None if the bank cannot be filled.
+    """
+    bank = await load_bank(topic)
+    seen_ids = set(seen)
+    unseen = [q for q in bank if q["id"] not in seen_ids]
+    if not unseen:
+        try:
+            bank = await refill(topic, summary)
+        except Exception as e:
+            logger.info("Quiz bank refill failed for %r: %s", topic, e)
+            return None
+        unseen = [q for q in bank if q["id"] not in seen_ids]
+        if not unseen:
+            return None
+    elif len(unseen) <= QUIZ_BANK_REFILL_AT and len(bank) < QUIZ_BANK_MAX:
+        _refill_in_background(topic, summary)
+    return random.choice(unseen)
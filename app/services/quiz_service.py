@@ -1,43 +1,41 @@
 # app/services/quiz_service.py
 import logging
-import json
-import re
-from tenacity import retry, stop_after_attempt, wait_exponential
+from typing import List
 
-from app.core.prompts import build_quiz_messages, build_grader_messages
-from app.services.llm import llm  # reuse same LLM instance (ChatOpenAI)
+from app.core.prompts import build_quiz_messages, build_quiz_bank_messages, build_grader_messages
+from app.services.llm import call_llm, get_llm  # reuse same LLM instance (ChatOpenAI)
+from app.services.structured_output import (
+    Schema, StructuredOutputError, TruncatedOutputError, accepts, parse_structured, parse_structured_list,
+)
 
 logger = logging.getLogger("healthbot.quiz_service")
 
+VERDICTS = ("correct", "partial", "incorrect")
 
-def _extract_text_from_agenerate_result(result) -> str:
-    """
-    Safely extract generated text from langchain_core agenerate result.
-    Handles different possible shapes:
-      - result.generations -> list[list[Generation]]
-      - Generation may have .text or .message (with .content) attributes
-      - result may already be a plain string (fallback)
-    """
-    try:
-        gens = getattr(result, "generations", None)
-        if gens and len(gens) > 0 and len(gens[0]) > 0:
-            gen = gens[0][0]
-            if hasattr(gen, "text") and gen.text is not None:
-                return gen.text
-            if hasattr(gen, "message") and getattr(gen.message, "content", None) is not None:
-                return gen.message.content
-            return str(gen)
-        if isinstance(result, str):
-            return result
-        return str(result)
-    except Exception:
-        try:
-            return str(result)
-        except Exception:
-            return ""
+
+def _check_grade(grade: dict) -> dict:
+    grade["score"] = min(1.0, max(0.0, grade["score"]))
+    verdict = (grade["verdict"] or "").lower()
+    if verdict not in VERDICTS:
+        verdict = "correct" if grade["score"] >= 0.7 else "partial" if grade["score"] >= 0.3 else "incorrect"
+    grade["verdict"] = verdict
+    return grade
+
+
+# a cut-off question or answer would be served and graded against; a cut-off hint is just dropped
+QUIZ_SCHEMA = Schema({"question": str, "options": list, "answer": str, "hint": str},
+                     required=("question",), defaults={"answer": "", "hint": ""},
+                     complete=("question", "answer"))
+# bank questions are graded later, so they need an answer
+QUIZ_BANK_SCHEMA = Schema(QUIZ_SCHEMA.fields, required=("question", "answer"), defaults={"hint": ""},
+                          complete=QUIZ_SCHEMA.complete)
+GRADE_SCHEMA = Schema({"score": float, "verdict": str, "explanation": str, "citations": list},
+                      required=("score",), defaults={"explanation": "", "citations": []}, post=_check_grade,
+                      complete=("score", "verdict"))
+# one more request when the model's output was cut off mid-answer
+TRUNCATED_RETRIES = 1
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=8))
 async def generate_quiz_question(summary: str) -> dict:
     """
     Generate exactly one quiz question using centralized prompts.
@@ -47,19 +45,22 @@ async def generate_quiz_question(summary: str) -> dict:
     messages = build_quiz_messages(summary, prefer_short_answer=True)
 
     try:
-        # agenerate expects a batch (list of message-lists)
-        result = await llm.agenerate([messages])
-
-        out_text = _extract_text_from_agenerate_result(result)
-        logger.debug("LLM raw output (generate_quiz_question): %s", out_text[:1000])
+        for attempt in range(TRUNCATED_RETRIES + 1):
+            # batched with other concurrent prompts by the dispatcher; truncated output is not cached
+            out_text = await call_llm(get_llm(), messages, kind="quiz", cache_if=accepts(QUIZ_SCHEMA))
+            logger.debug("LLM raw output (generate_quiz_question): %s", out_text[:1000])
 
-        # try parse JSON blob from model output
-        m = re.search(r"(\{[\s\S]*\})", out_text)
-        if m:
+            # parse (and if needed repair) the JSON object in the model output
             try:
-                return json.loads(m.group(1))
-            except json.JSONDecodeError:
-                logger.debug("Found JSON-like blob but failed to decode; blob: %s", m.group(1)[:500])
+                return parse_structured(out_text, QUIZ_SCHEMA)
+            except TruncatedOutputError as e:
+                logger.info("Quiz output cut off (%s), attempt %d", e, attempt + 1)
+                continue
+            except StructuredOutputError as e:
+                logger.debug("No usable quiz JSON in output (%s)", e)
+                break
+        else:
+            raise RuntimeError("Quiz output was cut off")
 
         # fallback: return raw text as question
         return {"question": out_text.strip(), "options": None, "answer": "", "hint": ""}
@@ -68,7 +69,31 @@ async def generate_quiz_question(summary: str) -> dict:
         raise RuntimeError("Quiz generation failed") from e
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=8))
+async def generate_quiz_bank(summary: str, n: int = 8) -> List[dict]:
+    """
+    Generate up to `n` varied questions (short-answer and MCQ) in one LLM call.
+    Returns a list of dicts with keys: question, options (or None), answer, hint.
+    """
+    messages = build_quiz_bank_messages(summary, n)
+
+    try:
+        out_text = await call_llm(get_llm(), messages, kind="quiz_bank", cache_if=accepts(QUIZ_BANK_SCHEMA, many=True))
+        logger.debug("LLM raw output (generate_quiz_bank): %s", out_text[:1000])
+    except Exception as e:
+        logger.exception("Quiz bank generation failed: %s", e)
+        raise RuntimeError("Quiz bank generation failed") from e
+
+    try:
+        questions = parse_structured_list(out_text, QUIZ_BANK_SCHEMA)
+    except StructuredOutputError as e:
+        logger.debug("No JSON array in quiz bank output (%s)", e)
+        questions = []
+    if not questions:
+        # callers fall back (on-demand generation, or no quiz) rather than re-asking
+        raise RuntimeError("Quiz bank generation returned no usable questions")
+    return questions[:n]
+
+
 async def evaluate_answer(summary: str, canonical_answer: str, user_answer: str) -> dict:
     """
     Grade the user's answer using centralized grader prompts.
@@ -77,16 +102,13 @@ async def evaluate_answer(summary: str, canonical_answer: str, user_answer: str)
     messages = build_grader_messages(summary, canonical_answer, user_answer)
 
     try:
-        result = await llm.agenerate([messages])
-        out_text = _extract_text_from_agenerate_result(result)
+        out_text = await call_llm(get_llm(), messages, kind="grade", cache_if=accepts(GRADE_SCHEMA))
         logger.debug("LLM raw output (evaluate_answer): %s", out_text[:1000])
 
-        m = re.search(r"(\{[\s\S]*\})", out_text)
-        if m:
-            try:
-                return json.loads(m.group(1))
-            except json.JSONDecodeError:
-                logger.debug("Found JSON-like blob but failed to decode; blob: %s", m.group(1)[:500])
+        try:
+            return parse_structured(out_text, GRADE_SCHEMA)
+        except StructuredOutputError as e:
+            logger.debug("No usable grade JSON in output (%s)", e)
 
         # fallback heuristic
         verdict = "correct" if canonical_answer.strip().lower() in user_answer.strip().lower() else "incorrect"
@@ -1,30 +1,94 @@
 # app/services/search_service.py
 import os
 import asyncio
+import functools
+import hashlib
 import logging
-from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_exponential
-from concurrent.futures import ThreadPoolExecutor
+import re
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from app.utils.resilience import CircuitOpenError, DeadlineExceeded, call_with_retry, get_breaker, time_left
+
+if TYPE_CHECKING:
+    import httpx
 
-load_dotenv()
 logger = logging.getLogger("healthbot.search_service")
 logger.setLevel(logging.INFO)
 
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY", "")
-TAVILY_BASE = os.getenv("TAVILY_BASE_URL", "").rstrip("/")
+TAVILY_BASE = os.getenv("TAVILY_BASE_URL", "").rstrip("/") or "https://api.tavily.com"
 TAVILY_MOCK = os.getenv("TAVILY_MOCK", "false").lower() in ("1","true","yes")
 
-_executor = ThreadPoolExecutor(max_workers=3)
+# One pooled client per process: keep-alive connections are reused across
+# requests; the semaphore caps in-flight searches (queueing the rest).
+TAVILY_MAX_CONCURRENCY = int(os.getenv("TAVILY_MAX_CONCURRENCY", "32"))
+TAVILY_MAX_CONNECTIONS = int(os.getenv("TAVILY_MAX_CONNECTIONS", "32"))
+TAVILY_TIMEOUT_SECONDS = float(os.getenv("TAVILY_TIMEOUT_SECONDS", "10"))
+
+# Fan-out: one search per query variant, run concurrently and merged as they
+# arrive. The first variant is the original query; the others add coverage.
+QUERY_VARIANTS = (
+    "medical explanation for {topic}",
+    "{topic} symptoms and causes",
+    "{topic} treatment options",
+    "{topic} prevention and risk factors",
+)
+SEARCH_FANOUT = int(os.getenv("SEARCH_FANOUT", str(len(QUERY_VARIANTS))))
+SEARCH_RESULTS_PER_QUERY = int(os.getenv("SEARCH_RESULTS_PER_QUERY", "4"))
+# return once this many good results are in (and the primary query answered) ...
+SEARCH_ENOUGH_RESULTS = int(os.getenv("SEARCH_ENOUGH_RESULTS", "8"))
+SEARCH_MIN_SCORE = float(os.getenv("SEARCH_MIN_SCORE", "0.5"))
+# ... or when the deadline passes with at least one result in hand
+SEARCH_DEADLINE_SECONDS = float(os.getenv("SEARCH_DEADLINE_SECONDS", "4"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "8"))
+
+
+class TavilySearchClient:
+    """Long-lived async client for the Tavily REST API (POST /search)."""
+
+    def __init__(self, base_url: str = TAVILY_BASE, api_key: str = TAVILY_API_KEY,
+                 max_concurrency: int = TAVILY_MAX_CONCURRENCY,
+                 max_connections: int = TAVILY_MAX_CONNECTIONS,
+                 timeout: float = TAVILY_TIMEOUT_SECONDS):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional["httpx.AsyncClient"] = None
+
+    def _http(self) -> "httpx.AsyncClient":
+        if self._client is None or self._client.is_closed:
+            # imported with the first search, not when the app starts
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(self.timeout),
+                headers={"Authorization": f"Bearer {self.api_key}"},
+            )
+        return self._client
+
+    async def search(self, query: str, max_results: int = 4, timeout: Optional[float] = None) -> dict:
+        payload = {"api_key": self.api_key, "query": query, "max_results": max_results}
+        async with self._semaphore:
+            resp = await self._http().post("/search", json=payload, timeout=timeout or self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
 
-# Try to import Tavily SDK (best-effort)
-try:
-    from tavily import TavilyClient  # adapt if SDK package differs
-    TAVILY_SDK_AVAILABLE = True
-    logger.info("Tavily SDK imported.")
-except Exception as e:
-    TavilyClient = None
-    TAVILY_SDK_AVAILABLE = False
-    logger.warning("Tavily SDK not available: %s", e)
+@functools.lru_cache(maxsize=1)
+def get_tavily_client() -> TavilySearchClient:
+    return TavilySearchClient()
 
 
 def _format_pieces_from_results(results):
@@ -58,11 +122,12 @@ def _format_pieces_from_results(results):
     return str(results)
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=8))
-async def tavily_search(query: str, max_results: int = 4) -> dict:
+async def tavily_search(query: str, max_results: int = 4, timeout: Optional[float] = None) -> dict:
     """
-    Wrapper that calls Tavily SDK if present, otherwise raises helpful errors.
-    It also supports a MOCK mode (TAVILY_MOCK env var).
+    Search Tavily through the shared pooled client, under the "tavily" circuit
+    breaker, retrying transient failures within the request's deadline.
+    It also supports a MOCK mode (TAVILY_MOCK env var); for an end-to-end
+    stand-in, run app/services/tavily_stub.py and point TAVILY_BASE_URL at it.
     """
     if TAVILY_MOCK:
         logger.info("TAVILY_MOCK enabled — returning canned results")
@@ -72,57 +137,162 @@ async def tavily_search(query: str, max_results: int = 4) -> dict:
             ]
         }
 
-    if not TAVILY_SDK_AVAILABLE:
-        raise RuntimeError("Tavily SDK not installed or failed to import. Set TAVILY_MOCK=true to use mock results for local development.")
-
-    # construct client — adapt to your SDK constructor if needed
-    try:
-        client = TavilyClient(api_key=TAVILY_API_KEY, base_url=TAVILY_BASE)
-    except TypeError:
-        # fallback if SDK constructor signature differs
-        client = TavilyClient(api_key=TAVILY_API_KEY)
-
-    # Prefer an async SDK method if present
-    if hasattr(client, "asearch") and asyncio.iscoroutinefunction(getattr(client, "asearch")):
-        try:
-            raw = await client.asearch(query=query, top_k=max_results)
-            logger.info("Tavily async search returned type: %s", type(raw))
-            return raw
-        except Exception as e:
-            logger.exception("Tavily async search failed: %s", e)
-            raise
-
-    # Fallback: run sync search in threadpool (common pattern)
-    loop = asyncio.get_running_loop()
-
-    def _sync_search():
-        try:
-            if hasattr(client, "search"):
-                return client.search(query=query, top_k=max_results)
-            # other common method names
-            if hasattr(client, "query"):
-                return client.query(query=query, top_k=max_results)
-            raise RuntimeError("Tavily client has no known search method (tried 'asearch','search','query').")
-        except Exception as e:
-            # bubble up for tenacity to catch
-            raise
-
     try:
-        raw = await loop.run_in_executor(_executor, _sync_search)
-        logger.info("Tavily sync search returned type: %s", type(raw))
+        raw = await call_with_retry(
+            lambda: get_tavily_client().search(query, max_results=max_results, timeout=timeout),
+            breaker=get_breaker("tavily"), timeout=timeout or TAVILY_TIMEOUT_SECONDS,
+        )
+        logger.info("Tavily search returned type: %s", type(raw))
         return raw
+    except (CircuitOpenError, DeadlineExceeded):
+        raise
     except Exception as e:
-        logger.exception("Tavily sync search failed: %s", e)
+        logger.exception("Tavily search failed: %s", e)
         raise
 
 
+_stats: Counter = Counter()
+_WS_RE = re.compile(r"\s+")
+
+
+def _result_keys(r) -> List[str]:
+    """Dedupe keys for one result: its normalized URL and a hash of its text."""
+    if not isinstance(r, dict):
+        return ["text:" + hashlib.sha1(str(r).encode("utf-8")).hexdigest()]
+    keys = []
+    url = (r.get("url") or r.get("source") or "").strip().lower()
+    if url:
+        url = re.sub(r"^https?://(www\.)?", "", url.split("#", 1)[0]).rstrip("/")
+        keys.append("url:" + url)
+    text = r.get("content") or r.get("snippet") or r.get("summary") or ""
+    if text:
+        text = _WS_RE.sub(" ", text).strip().lower()
+        keys.append("text:" + hashlib.sha1(text.encode("utf-8")).hexdigest())
+    return keys
+
+
+def _result_score(r) -> float:
+    try:
+        return float(r.get("score", SEARCH_MIN_SCORE)) if isinstance(r, dict) else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class SearchAggregator:
+    """Merges result lists as they arrive: dedupes, then ranks by score."""
+
+    def __init__(self):
+        self._seen: set = set()
+        self._results: List[tuple] = []  # (score, variant, arrival, result)
+        self.duplicates = 0
+
+    def add(self, variant: int, raw) -> int:
+        if isinstance(raw, dict):
+            raw = raw.get("results", [raw])
+        if not isinstance(raw, list):
+            raw = [raw]
+        added = 0
+        for r in raw:
+            keys = _result_keys(r)
+            if not keys or any(k in self._seen for k in keys):
+                self.duplicates += bool(keys)
+                continue
+            self._seen.update(keys)
+            self._results.append((_result_score(r), variant, len(self._results), r))
+            added += 1
+        return added
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def good(self) -> int:
+        return sum(score >= SEARCH_MIN_SCORE for score, *_ in self._results)
+
+    def ranked(self, limit: int = SEARCH_MAX_RESULTS) -> list:
+        # best score first; ties keep the primary query's results, then arrival order
+        ordered = sorted(self._results, key=lambda t: (-t[0], t[1], t[2]))
+        return [r for *_, r in ordered[:limit]]
+
+
+async def fanout_search(topic: str, variants=QUERY_VARIANTS, deadline: float = SEARCH_DEADLINE_SECONDS) -> list:
+    """
+    Runs the query variants for `topic` concurrently and returns the merged,
+    ranked results. Returns early once SEARCH_ENOUGH_RESULTS good results are
+    in and the primary (first) query has answered, or at the deadline if any
+    results are in; searches still running are cancelled. Failed variants are
+    skipped; raises only if every variant fails.
+    """
+    queries = [v.format(topic=topic) for v in variants[:max(1, SEARCH_FANOUT)]]
+    tasks: Dict[asyncio.Task, int] = {
+        asyncio.create_task(tavily_search(q, max_results=SEARCH_RESULTS_PER_QUERY)): i
+        for i, q in enumerate(queries)
+    }
+    agg = SearchAggregator()
+    pending = set(tasks)
+    errors = []
+    primary_done = False
+    left = time_left()
+    stop_at = time.monotonic() + (deadline if left is None else min(deadline, left))
+    try:
+        while pending:
+            remaining = stop_at - time.monotonic()
+            if remaining <= 0 and len(agg):
+                _stats["deadline"] += 1
+                break
+            # past the deadline with nothing in hand: wait for whatever answers first
+            done, pending = await asyncio.wait(pending, timeout=remaining if remaining > 0 else None,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=tasks.get):  # primary first on duplicates
+                variant = tasks[task]
+                primary_done = primary_done or variant == 0
+                if task.exception() is not None:
+                    errors.append(task.exception())
+                    _stats["failed"] += 1
+                    continue
+                agg.add(variant, task.result())
+            if pending and primary_done and agg.good() >= SEARCH_ENOUGH_RESULTS:
+                _stats["early"] += 1
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+        _stats["cancelled"] += len(pending)
+
+    _stats["searches"] += 1
+    _stats["queries"] += len(queries) - len(pending)
+    _stats["duplicates"] += agg.duplicates
+    results = agg.ranked()
+    if not results and errors:
+        raise errors[0]
+    return results
+
+
+def search_stats() -> dict:
+    return dict(_stats)
+
+
+# returned instead of results so the flow can go on (e.g. to reject the
+# topic); never cached, and summaries made from them are not cached either
+NO_RESULTS = "No useful search results found for '{topic}'."
+UNPARSEABLE = "Unable to parse search results for '{topic}': {error}"
+_PLACEHOLDER_PREFIXES = tuple(t.split("{topic}")[0] for t in (NO_RESULTS, UNPARSEABLE))
+
+
+def is_search_placeholder(text: str) -> bool:
+    """True for the NO_RESULTS / UNPARSEABLE stand-ins (also after a checkpoint round trip)."""
+    return text.startswith(_PLACEHOLDER_PREFIXES)
+
+
 async def search_medical_info(topic: str) -> str:
     """
-    Public helper used by workflow: returns a safe string summary built from Tavily results.
+    Public helper used by workflow: returns a safe string summary built from Tavily results
+    (several query variants, merged; see fanout_search). When nothing usable
+    came back it returns a placeholder; check with is_search_placeholder.
     """
-    query = f"medical explanation for {topic}"
     try:
-        raw = await tavily_search(query, max_results=4)
+        raw = await fanout_search(topic)
+    except (CircuitOpenError, DeadlineExceeded):
+        raise
     except Exception as e:
         # raise a clear runtime error upward for API to report
         raise RuntimeError(f"Tavily search failed: {e}")
@@ -137,9 +307,9 @@ async def search_medical_info(topic: str) -> str:
     try:
         summary = _format_pieces_from_results(raw)
         if not summary:
-            return f"No useful search results found for '{topic}'."
+            return NO_RESULTS.format(topic=topic)
         return summary
     except Exception as e:
         logger.exception("Failed to normalize tavily results: %s", e)
         # fallback: return repr
-        return f"Unable to parse search results for '{topic}': {e}"
+        return UNPARSEABLE.format(topic=topic, error=e)
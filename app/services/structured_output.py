@@ -0,0 +1,358 @@
+# app/services/structured_output.py
+"""
+JSON output from the LLM: extraction, local repair and schema checks.
+
+ - JsonExtractor scans text incrementally (feed() chunks as they stream in)
+   and yields each complete top-level JSON object/array, skipping any prose
+   or code fences around it.
+ - repair_json fixes the defects models commonly produce: code fences,
+   single-quoted strings, trailing commas, Python literals (True/False/None),
+   comments, and output truncated mid-value (open strings and brackets are
+   closed).
+ - Schema checks the parsed value's fields: required keys, types (with
+   simple coercions, e.g. "0.8" -> 0.8) and defaults.
+
+parse_structured ties them together: try the text as-is, then each extracted
+candidate, then its repaired form. Malformed output is fixed here instead of
+re-calling the model; StructuredOutputError is raised only when nothing usable
+is left.
+
+Output repaired from truncation is flagged: the value being written when it
+was cut may be incomplete ("The airw"). Such a value falls back to its default,
+and a schema's `complete` fields reject the result instead
+(TruncatedOutputError), so the caller can ask again. accepts() never lets
+truncated output into the cache.
+"""
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+_FENCE_RE = re.compile(r"```[a-zA-Z]*\s*\n?|```")
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class StructuredOutputError(ValueError):
+    pass
+
+
+class TruncatedOutputError(StructuredOutputError):
+    """The output was cut off before a field that must be complete."""
+
+
+class Repair(NamedTuple):
+    text: str
+    truncated: bool = False  # brackets or a string had to be closed
+    value_cut: bool = False  # ... and the last value written may be incomplete
+
+
+# ---------- extraction ----------
+class JsonExtractor:
+    """
+    Incremental scanner for top-level JSON values embedded in text.
+    Strings (double-quoted, or single-quoted where a key/value may start) are
+    tracked so brackets inside them do not count.
+    """
+
+    def __init__(self, opening: str = "{["):
+        self.opening = opening
+        self._buf: List[str] = []
+        self._stack: List[str] = []
+        self._quote: Optional[str] = None
+        self._escape = False
+        self._prev = ""  # last non-space character inside the value
+
+    @property
+    def partial(self) -> str:
+        """Text of the value being scanned (empty between values)."""
+        return "".join(self._buf)
+
+    def feed(self, chunk: str) -> List[str]:
+        """Scans `chunk`; returns the text of every value completed in it."""
+        done = []
+        for ch in chunk:
+            if not self._stack:
+                if ch in self.opening:
+                    self._stack.append(ch)
+                    self._buf = [ch]
+                    self._prev = ch
+                continue
+            self._buf.append(ch)
+            if self._quote:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == self._quote:
+                    self._quote = None
+                    self._prev = ch
+                continue
+            if ch == '"' or (ch == "'" and self._prev in "{[,:"):
+                self._quote = ch
+            elif ch in "{[":
+                self._stack.append(ch)
+            elif ch in "}]":
+                self._stack.pop()
+                if not self._stack:
+                    done.append("".join(self._buf))
+                    self._buf = []
+            if not ch.isspace():
+                self._prev = ch
+        return done
+
+
+def extract_json(text: str, opening: str = "{[") -> Iterator[str]:
+    """Complete top-level JSON candidates in `text`, then a truncated trailing one."""
+    extractor = JsonExtractor(opening)
+    yield from extractor.feed(text)
+    if extractor.partial:
+        yield extractor.partial
+
+
+# ---------- repair ----------
+def repair_json(text: str) -> str:
+    """Best-effort fix of common LLM JSON defects (see module docstring)."""
+    return repair(text).text
+
+
+def repair(text: str) -> Repair:
+    """repair_json, also reporting whether the text was truncated."""
+    text = _FENCE_RE.sub("", text).strip()
+    out: List[str] = []
+    stack: List[str] = []
+    quote: Optional[str] = None
+    escape = False
+    prev = ""
+    key_start: Optional[int] = None  # where an object key without its ':' yet begins
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if quote:
+            if escape:
+                escape = False
+                if ch == "'":
+                    out[-1] = "'"  # \' is not a JSON escape
+                else:
+                    out.append(ch)
+            elif ch == "\\":
+                escape = True
+                out.append(ch)
+            elif ch == quote:
+                quote = None
+                out.append('"')
+                prev = '"'
+            elif ch == '"':
+                out.append('\\"')  # inside a single-quoted string
+            elif ch == "\n":
+                out.append("\\n")
+            else:
+                out.append(ch)
+            i += 1
+            continue
+        in_object = bool(stack) and stack[-1] == "{"
+        if ch == '"' or (ch == "'" and prev in "{[,:"):
+            if in_object and prev in "{,":
+                key_start = len(out)
+            quote = ch
+            out.append('"')
+        elif ch == ":":
+            key_start = None
+            out.append(ch)
+        elif ch in "{[":
+            stack.append(ch)
+            out.append(ch)
+        elif ch in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(ch)
+        elif ch == "/" and text.startswith("//", i):
+            while i < n and text[i] != "\n":
+                i += 1
+            continue
+        elif ch.isalpha() or ch == "_":
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            if in_object and prev in "{,":
+                key_start = len(out)
+                out.append(f'"{word}"')  # bare key
+            else:
+                out.append(_PY_LITERALS.get(word, word))
+            prev = word[-1]
+            i = j
+            continue
+        else:
+            out.append(ch)
+        if not ch.isspace():
+            prev = ch
+        i += 1
+
+    # truncated output: drop a dangling key, give a dangling ':' a value, close the rest
+    truncated = bool(stack) or quote is not None
+    value_cut = False
+    if quote:
+        value_cut = key_start is None  # inside a value rather than a key
+        if escape:
+            out.pop()
+        out.append('"')
+    if key_start is not None:
+        del out[key_start:]
+    while out and (out[-1].isspace() or out[-1] == ","):
+        out.pop()
+    while truncated and out and out[-1] in (".", "-", "+"):
+        value_cut = True  # a number cut before its digits ("0.")
+        out.pop()
+    if out and out[-1] == ":":
+        value_cut = True
+        out.append("null")
+    elif truncated and out and out[-1][-1:] not in ('"', "}", "]"):
+        value_cut = True  # a number or literal may have more digits/letters
+    for opener in reversed(stack):
+        out.append(_CLOSERS[opener])
+    return Repair("".join(out), truncated, value_cut)
+
+
+# ---------- schemas ----------
+def _coerce(value: Any, kind: Any) -> Any:
+    if kind is str:
+        if isinstance(value, (dict, list)):
+            raise TypeError("expected text")
+        return "" if value is None else str(value).strip()
+    if kind is float:
+        return float(value)
+    if kind is bool:
+        if isinstance(value, str):
+            if value.strip().lower() in ("true", "yes", "1"):
+                return True
+            if value.strip().lower() in ("false", "no", "0"):
+                return False
+            raise TypeError("expected true/false")
+        return bool(value)
+    if kind is list:
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return [value.strip()] if value.strip() else []
+        if not isinstance(value, list):
+            raise TypeError("expected a list")
+        return [str(v).strip() for v in value if v is not None and str(v).strip()]
+    return value
+
+
+class Schema:
+    """
+    Expected fields of a JSON object: {name: type} with type one of str,
+    float, bool, list (of strings). Missing optional fields get `defaults`
+    (else None); `post` may check or adjust the result (raising
+    StructuredOutputError to reject it). In output repaired from truncation,
+    the `complete` fields must be present and not the one that was cut.
+    """
+
+    def __init__(self, fields: Dict[str, Any], required: Iterable[str] = (),
+                 defaults: Optional[Dict[str, Any]] = None,
+                 post: Optional[Callable[[dict], dict]] = None,
+                 complete: Iterable[str] = ()):
+        self.fields = fields
+        self.required = tuple(required)
+        self.defaults = defaults or {}
+        self.post = post
+        self.complete = tuple(complete)
+
+    def validate(self, value: Any, truncated: bool = False, value_cut: bool = False) -> dict:
+        if not isinstance(value, dict):
+            raise StructuredOutputError(f"expected an object, got {type(value).__name__}")
+        cut = next(reversed(value), None) if value_cut else None
+        if truncated:
+            for name in self.complete:
+                if name == cut or value.get(name) in (None, ""):
+                    raise TruncatedOutputError(f"output cut off before {name!r} was complete")
+        out = {}
+        for name, kind in self.fields.items():
+            raw = None if name == cut else value.get(name)
+            if raw is None or raw == "":
+                if name in self.required:
+                    raise StructuredOutputError(f"missing field {name!r}")
+                out[name] = self.defaults.get(name)
+                continue
+            try:
+                out[name] = _coerce(raw, kind)
+            except (TypeError, ValueError) as e:
+                raise StructuredOutputError(f"field {name!r}: {e}")
+        return self.post(out) if self.post else out
+
+
+# ---------- parsing ----------
+def _candidates(text: str, opening: str) -> Iterator[Repair]:
+    yield Repair(text.strip())
+    for candidate in extract_json(text, opening):
+        yield Repair(candidate)
+        yield repair(candidate)
+
+
+def _parse_json(text: str, opening: str, allow_truncated: bool = True) -> Tuple[Any, Repair]:
+    for candidate in _candidates(text or "", opening):
+        if candidate.truncated and not allow_truncated:
+            continue
+        try:
+            value = json.loads(candidate.text)
+        except ValueError:
+            continue
+        if (isinstance(value, dict) and "{" in opening) or (isinstance(value, list) and "[" in opening):
+            return value, candidate
+    raise StructuredOutputError("no JSON value found")
+
+
+def parse_json(text: str, opening: str = "{[") -> Any:
+    """The first JSON value in `text` (starting with one of `opening`), repaired if needed."""
+    return _parse_json(text, opening)[0]
+
+
+def parse_structured(text: str, schema: Schema, allow_truncated: bool = True) -> dict:
+    """The first JSON object in `text` that satisfies `schema`."""
+    last_error: Optional[Exception] = None
+    for candidate in _candidates(text or "", "{"):
+        if candidate.truncated and not allow_truncated:
+            continue
+        try:
+            return schema.validate(json.loads(candidate.text), candidate.truncated, candidate.value_cut)
+        except (ValueError, StructuredOutputError) as e:
+            last_error = e
+    if isinstance(last_error, StructuredOutputError):
+        raise last_error
+    raise StructuredOutputError(str(last_error) if last_error else "no JSON object found")
+
+
+def parse_structured_list(text: str, schema: Schema, allow_truncated: bool = True) -> List[dict]:
+    """Items of the first JSON array in `text` that satisfy `schema` (others dropped)."""
+    items, candidate = _parse_json(text, "[", allow_truncated)
+    items = items if isinstance(items, list) else []
+    out = []
+    for i, item in enumerate(items):
+        # only the last item can have been cut off
+        last = candidate.truncated and i == len(items) - 1
+        try:
+            out.append(schema.validate(item, last, last and candidate.value_cut))
+        except StructuredOutputError:
+            continue
+    return out
+
+
+def accepts(schema: Schema, many: bool = False) -> Callable[[str], bool]:
+    """
+    Predicate for cache_if: does the text parse into `schema` (a non-empty
+    list of them if `many`) without repairing a truncation?
+    """
+    def check(text: str) -> bool:
+        try:
+            if many:
+                return bool(parse_structured_list(text, schema, allow_truncated=False))
+            parse_structured(text, schema, allow_truncated=False)
+            return True
+        except StructuredOutputError:
+            return False
+    return check
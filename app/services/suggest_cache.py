@@ -0,0 +1,89 @@
+# app/services/suggest_cache.py
+"""
+Result cache in front of the suggest index.
+
+Typeahead sends every prefix of what the user types ("d", "di", "dia",
+"diab"), so two things are cached:
+ - final results, keyed by (normalized query, limit)
+ - candidate id sets (all terms containing the query), keyed by query
+
+On a result miss for "diab" the candidates cached for "dia" (or "di") are
+narrowed to the terms containing "diab" and only those are scored, instead of
+going back to the full index. Candidate sets larger than
+SUGGEST_CANDIDATE_LIMIT are not kept; very short queries use the tier
+indexes directly.
+
+Both caches are dropped whenever the index changes (dictionary reload).
+Popularity changes show up once cached results expire (SUGGEST_CACHE_TTL).
+"""
+import functools
+import os
+from typing import Callable, FrozenSet, List, Optional, Tuple
+
+from app.services.suggest_index import SuggestIndex
+from app.utils.cache import TTLCache
+
+CACHE_SIZE = int(os.getenv("SUGGEST_CACHE_SIZE", "4096"))
+CACHE_TTL = float(os.getenv("SUGGEST_CACHE_TTL", "60"))
+CANDIDATE_LIMIT = int(os.getenv("SUGGEST_CANDIDATE_LIMIT", "5000"))
+MIN_CANDIDATE_QUERY = 2
+
+
+def normalize_query(q: str) -> str:
+    return " ".join(q.lower().split())
+
+
+class SuggestCache:
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL,
+                 candidate_limit: int = CANDIDATE_LIMIT):
+        self.candidate_limit = candidate_limit
+        self.results = TTLCache(maxsize, ttl)
+        self.candidates = TTLCache(maxsize, ttl)
+        self.narrowed = 0
+        self._stamp: Optional[Tuple[int, int]] = None
+
+    def _candidates_for(self, index: SuggestIndex, q: str) -> Optional[FrozenSet[int]]:
+        if len(q) < MIN_CANDIDATE_QUERY:
+            return None
+        cached = self.candidates.get(q, count=False)
+        if cached is not None:
+            return cached
+        ids = None
+        # longest shorter prefix we already have candidates for
+        for n in range(len(q) - 1, MIN_CANDIDATE_QUERY - 1, -1):
+            parent = self.candidates.get(q[:n], count=False)
+            if parent is not None:
+                ids = index.narrow(q, parent)
+                self.narrowed += 1
+                break
+        if ids is None:
+            ids = index.candidates(q)
+        if len(ids) > self.candidate_limit:
+            return None
+        ids = frozenset(ids)
+        self.candidates.set(q, ids)
+        return ids
+
+    def search(self, index: SuggestIndex, q: str, limit: int = 10,
+               boost: Optional[Callable[[str], float]] = None) -> List[str]:
+        stamp = (id(index), index.generation)
+        if stamp != self._stamp:
+            self.results.clear()
+            self.candidates.clear()
+            self._stamp = stamp
+        q = normalize_query(q)
+        key = (q, limit)
+        cached = self.results.get(key)
+        if cached is not None:
+            return cached
+        result = index.search(q, limit, boost=boost, candidates=self._candidates_for(index, q))
+        self.results.set(key, result)
+        return result
+
+    def stats(self) -> dict:
+        return {"results": self.results.stats(), "candidate_sets": len(self.candidates), "narrowed": self.narrowed}
+
+
+@functools.lru_cache(maxsize=1)
+def get_suggest_cache() -> SuggestCache:
+    return SuggestCache()
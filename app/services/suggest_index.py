@@ -0,0 +1,389 @@
+# app/services/suggest_index.py
+"""
+Precomputed index for topic autocomplete.
+
+The index is built from the topic dictionary (see topic_store.py) and answers
+each keystroke by touching only candidate terms:
+ - exact matches via a lowercase term map
+ - prefix matches via a sorted (lowercase term, id) array (a flattened trie)
+ - word-prefix matches via a sorted (lowercase word, id) array
+ - substring matches via an n-gram posting index (1-, 2- and 3-grams)
+ - typo-tolerant matches via a SymSpell-style deletion dictionary over words
+
+Ranking is the same as the original linear scan: exact (100) > prefix (80) >
+word prefix (60) > substring (40), ties broken by an optional boost (topic
+popularity) and then by topic name. Fuzzy hits only fill the slots left over,
+scored 30 minus 10 per edit.
+"""
+import bisect
+import heapq
+import re
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+SCORE_EXACT = 100
+SCORE_PREFIX = 80
+SCORE_WORD_PREFIX = 60
+SCORE_SUBSTRING = 40
+SCORE_FUZZY = 30
+
+GRAM_SIZE = 3
+_MAX_CHAR = "\U0010ffff"
+
+# Fuzzy tier: words shorter than FUZZY_MIN_LEN must match exactly, words under
+# FUZZY_TWO_EDIT_LEN characters allow one edit, longer words two. Deletes are
+# generated on the first FUZZY_PREFIX_LEN characters only (the SymSpell prefix
+# trick): a one-edit word costs at most 8 dictionary keys, a two-edit word 29.
+FUZZY_MIN_LEN = 4
+FUZZY_TWO_EDIT_LEN = 8
+FUZZY_PREFIX_LEN = 7
+MAX_EDIT_DISTANCE = 2
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def score_topic(term_l: str, q_l: str) -> int:
+    """Score a lowercase term against a lowercase query (0 means no match)."""
+    if term_l == q_l:
+        return SCORE_EXACT
+    if term_l.startswith(q_l):
+        return SCORE_PREFIX
+    for w in term_l.split():
+        if w.startswith(q_l):
+            return SCORE_WORD_PREFIX
+    if q_l in term_l:
+        return SCORE_SUBSTRING
+    return 0
+
+
+def _grams(text: str) -> Set[str]:
+    grams = set()
+    for n in range(1, GRAM_SIZE + 1):
+        for i in range(len(text) - n + 1):
+            grams.add(text[i:i + n])
+    return grams
+
+
+def _max_edits(word: str) -> int:
+    if len(word) < FUZZY_MIN_LEN:
+        return 0
+    return 1 if len(word) < FUZZY_TWO_EDIT_LEN else MAX_EDIT_DISTANCE
+
+
+def _deletes(word: str, max_d: int) -> Set[str]:
+    """All strings reachable from word[:FUZZY_PREFIX_LEN] by up to max_d deletions."""
+    word = word[:FUZZY_PREFIX_LEN]
+    out = {word}
+    frontier = {word}
+    for _ in range(max_d):
+        nxt = set()
+        for w in frontier:
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        nxt -= out
+        out |= nxt
+        frontier = nxt
+    return out
+
+
+def edit_distance(a: str, b: str, max_d: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions).
+    Returns max_d + 1 as soon as the distance is known to exceed max_d.
+    """
+    if abs(len(a) - len(b)) > max_d:
+        return max_d + 1
+    if a == b:
+        return 0
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > max_d:
+            return max_d + 1
+        prev2, prev = prev, cur
+    return min(prev[-1], max_d + 1)
+
+
+def _post(postings: Dict[str, array], key: str, tid: int):
+    # ids only grow, so appending keeps every posting list sorted
+    ids = postings.get(key)
+    if ids is None:
+        postings[key] = array("I", (tid,))
+    else:
+        ids.append(tid)
+
+
+def _unpost(postings: Dict[str, array], key: str, tid: int) -> bool:
+    """Remove `tid` from `key`'s posting list; True if the list became empty (and was dropped)."""
+    ids = postings[key]
+    i = bisect.bisect_left(ids, tid)
+    if i < len(ids) and ids[i] == tid:
+        del ids[i]
+    if ids:
+        return False
+    del postings[key]
+    return True
+
+
+def _as_tuple(tokens: Union[str, Tuple[str, ...]]) -> Tuple[str, ...]:
+    return (tokens,) if isinstance(tokens, str) else tokens
+
+
+def _remove_sorted(keys: List[Tuple[str, int]], key: Tuple[str, int]):
+    i = bisect.bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
+
+
+def _range(keys: List[Tuple[str, int]], prefix: str) -> List[Tuple[str, int]]:
+    lo = bisect.bisect_left(keys, (prefix,))
+    hi = bisect.bisect_left(keys, (prefix + _MAX_CHAR,), lo)
+    return keys[lo:hi]
+
+
+class SuggestIndex:
+    """
+    Autocomplete index over a list of topics.
+
+    Built in bulk from a topic list; `sync` applies the difference against a
+    newer topic list in place, so a dictionary reload only re-indexes the
+    terms that changed. Term ids are never reused; removed ids are tombstoned.
+    """
+
+    def __init__(self, topics: Iterable[str] = ()):
+        self._terms: List[Optional[str]] = []
+        self._lower: List[Optional[str]] = []
+        self._ids: Dict[str, int] = {}
+        self._exact: Dict[str, List[int]] = {}
+        self._prefix: List[Tuple[str, int]] = []  # sorted (lowercase term, id)
+        self._words: List[Tuple[str, int]] = []   # sorted (lowercase word, id)
+        # posting lists are sorted arrays of 32-bit ids: a few bytes per entry
+        # instead of a set slot and an int object
+        self._grams: Dict[str, array] = {}
+        self._tokens: Dict[str, array] = {}       # word token -> term ids
+        # delete variant -> word token, or a tuple of tokens when shared
+        self._deletes: Dict[str, Union[str, Tuple[str, ...]]] = {}
+        self.generation = 0  # bumped whenever the term set changes
+        for term in topics:
+            self._add(term, bulk=True)
+        self._prefix.sort()
+        self._words.sort()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def tombstones(self) -> int:
+        return len(self._terms) - len(self._ids)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._ids
+
+    def _add(self, term: str, bulk: bool = False):
+        term = term.strip()
+        if not term or term in self._ids:
+            return
+        tid = len(self._terms)
+        term_l = term.lower()
+        self._terms.append(term)
+        self._lower.append(term_l)
+        self._ids[term] = tid
+        self._exact.setdefault(term_l, []).append(tid)
+        insert = list.append if bulk else bisect.insort
+        insert(self._prefix, (term_l, tid))
+        for w in set(term_l.split()):
+            insert(self._words, (w, tid))
+        for g in _grams(term_l):
+            _post(self._grams, g, tid)
+        for token in set(_TOKEN_RE.findall(term_l)):
+            if token not in self._tokens:
+                for variant in _deletes(token, _max_edits(token)):
+                    prev = self._deletes.get(variant)
+                    if prev is None:
+                        self._deletes[variant] = token
+                    elif isinstance(prev, str):
+                        self._deletes[variant] = (prev, token)
+                    else:
+                        self._deletes[variant] = prev + (token,)
+            _post(self._tokens, token, tid)
+
+    def _discard(self, term: str):
+        tid = self._ids.pop(term, None)
+        if tid is None:
+            return
+        term_l = self._lower[tid]
+        self._terms[tid] = None
+        self._lower[tid] = None
+        exact = self._exact[term_l]
+        exact.remove(tid)
+        if not exact:
+            del self._exact[term_l]
+        _remove_sorted(self._prefix, (term_l, tid))
+        for w in set(term_l.split()):
+            _remove_sorted(self._words, (w, tid))
+        for g in _grams(term_l):
+            _unpost(self._grams, g, tid)
+        for token in set(_TOKEN_RE.findall(term_l)):
+            if not _unpost(self._tokens, token, tid):
+                continue
+            for variant in _deletes(token, _max_edits(token)):
+                rest = tuple(t for t in _as_tuple(self._deletes[variant]) if t != token)
+                if not rest:
+                    del self._deletes[variant]
+                else:
+                    self._deletes[variant] = rest[0] if len(rest) == 1 else rest
+
+    def sync(self, topics: Iterable[str]) -> Tuple[int, int]:
+        """Add/remove terms so the index matches `topics`; returns (added, removed)."""
+        wanted = {t.strip() for t in topics if t.strip()}
+        removed = [t for t in self._ids if t not in wanted]
+        added = [t for t in wanted if t not in self._ids]
+        if added or removed:
+            self.generation += 1
+        for term in removed:
+            self._discard(term)
+        # large batches are appended and sorted once instead of insorted
+        bulk = len(added) * 8 > len(self._prefix)
+        for term in added:
+            self._add(term, bulk=bulk)
+        if bulk:
+            self._prefix.sort()
+            self._words.sort()
+        return len(added), len(removed)
+
+    # ---------- candidate tiers ----------
+    def _exact_ids(self, q_l: str) -> Iterable[int]:
+        return self._exact.get(q_l, ())
+
+    def _prefix_ids(self, q_l: str) -> Iterable[int]:
+        return (tid for _, tid in _range(self._prefix, q_l))
+
+    def _word_prefix_ids(self, q_l: str) -> Iterable[int]:
+        return (tid for _, tid in _range(self._words, q_l))
+
+    def _substring_ids(self, q_l: str) -> Iterable[int]:
+        if len(q_l) <= GRAM_SIZE:
+            return self._grams.get(q_l, ())
+        postings = []
+        for i in range(len(q_l) - GRAM_SIZE + 1):
+            ids = self._grams.get(q_l[i:i + GRAM_SIZE])
+            if not ids:
+                return ()
+            postings.append(ids)
+        postings.sort(key=len)
+        ids = set(postings[0]).intersection(*postings[1:])
+        return (tid for tid in ids if q_l in self._lower[tid])
+
+    def _fuzzy_tokens(self, word: str) -> Dict[str, int]:
+        """Indexed tokens within the allowed edit distance of `word`."""
+        max_d = _max_edits(word)
+        if max_d == 0:
+            return {word: 0} if word in self._tokens else {}
+        hits: Dict[str, int] = {}
+        for variant in _deletes(word, max_d):
+            for token in _as_tuple(self._deletes.get(variant, ())):
+                if token in hits:
+                    continue
+                d = edit_distance(word, token, min(max_d, _max_edits(token)))
+                if d <= max_d and d <= _max_edits(token):
+                    hits[token] = d
+        return hits
+
+    def _fuzzy_ids(self, q_l: str) -> Dict[int, int]:
+        """
+        Terms where every query word matches one of the term's words within
+        its edit budget; maps term id -> total edits (at most MAX_EDIT_DISTANCE).
+        """
+        words = _TOKEN_RE.findall(q_l)
+        if not words:
+            return {}
+        matched: Dict[int, int] = {}
+        for n, word in enumerate(words):
+            dist: Dict[int, int] = {}
+            for token, d in self._fuzzy_tokens(word).items():
+                for tid in self._tokens[token]:
+                    if tid not in dist or d < dist[tid]:
+                        dist[tid] = d
+            if n == 0:
+                matched = dist
+            else:
+                matched = {tid: matched[tid] + d for tid, d in dist.items() if tid in matched}
+            matched = {tid: d for tid, d in matched.items() if d <= MAX_EDIT_DISTANCE}
+            if not matched:
+                break
+        return matched
+
+    def is_topic(self, text: str) -> bool:
+        """True when `text` is a dictionary topic (case-insensitive)."""
+        return text.strip().lower() in self._exact
+
+    def terms(self) -> Iterator[str]:
+        """Live terms, in insertion order."""
+        return (t for t in self._terms if t is not None)
+
+    def fuzzy_terms(self, text: str) -> Dict[str, int]:
+        """Terms matching every word of `text` within the edit budget -> total edits."""
+        return {self._terms[tid]: d for tid, d in self._fuzzy_ids(text.strip().lower()).items()}
+
+    def candidates(self, q: str) -> Set[int]:
+        """
+        Ids of all terms containing `q`: a superset of every non-fuzzy tier,
+        which callers may cache and later `narrow` for longer queries.
+        """
+        q_l = q.strip().lower()
+        return set(self._substring_ids(q_l)) if q_l else set()
+
+    def narrow(self, q: str, ids: Iterable[int]) -> Set[int]:
+        """Filter a candidate set for a shorter query down to terms containing `q`."""
+        q_l = q.strip().lower()
+        lower = self._lower
+        return {tid for tid in ids if lower[tid] is not None and q_l in lower[tid]}
+
+    def search(self, q: str, limit: int = 10, boost: Optional[Callable[[str], float]] = None,
+               candidates: Optional[Iterable[int]] = None) -> List[str]:
+        """
+        Return up to `limit` topics for `q`, best tier first.
+        `boost(lowercase_term)` (e.g. popularity) orders terms within a tier;
+        the topic name breaks remaining ties. When `candidates` (from
+        `candidates`/`narrow` for this query) is given, only those are scored
+        instead of walking the tier indexes.
+        """
+        q_l = q.strip().lower()
+        if not q_l or limit <= 0:
+            return []
+        if boost is None:
+            rank = self._terms.__getitem__
+        else:
+            def rank(tid):
+                return -boost(self._lower[tid]), self._terms[tid]
+        if candidates is not None:
+            scored = {tid: score_topic(self._lower[tid], q_l) for tid in candidates}
+            picked = heapq.nsmallest(limit, (tid for tid, s in scored.items() if s),
+                                     key=lambda tid: (-scored[tid], rank(tid)))
+        else:
+            picked = self._search_tiers(q_l, limit, rank)
+        need = limit - len(picked)
+        if need > 0:
+            seen = set(picked)
+            fuzzy = {tid: d for tid, d in self._fuzzy_ids(q_l).items() if tid not in seen}
+            picked.extend(heapq.nsmallest(need, fuzzy, key=lambda tid: (fuzzy[tid], rank(tid))))
+        return [self._terms[tid] for tid in picked]
+
+    def _search_tiers(self, q_l: str, limit: int, rank: Callable) -> List[int]:
+        picked: List[int] = []
+        seen: Set[int] = set()
+        tiers = (self._exact_ids, self._prefix_ids, self._word_prefix_ids, self._substring_ids)
+        for tier in tiers:
+            need = limit - len(picked)
+            if need <= 0:
+                break
+            candidates = {tid for tid in tier(q_l) if tid not in seen}
+            best = heapq.nsmallest(need, candidates, key=rank)
+            picked.extend(best)
+            seen.update(best)
+        return picked
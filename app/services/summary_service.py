@@ -1,28 +1,67 @@
 # app/services/summary_service.py
 import logging
-from tenacity import retry, stop_after_attempt, wait_exponential
-from app.services.llm import call_llm , llm
+from typing import AsyncIterator
+from app.services.llm import call_llm, get_dispatcher, get_llm
 from app.core.prompts import build_summary_messages
+from app.utils.resilience import CircuitOpenError, DeadlineExceeded, get_breaker, is_retryable
 
 logger = logging.getLogger("healthbot.summary_service")
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=8))
-async def summarize_text_for_patient(text: str, max_tokens: int = 500) -> str:
+async def summarize_text_for_patient(text: str, max_tokens: int = 500, topic: str = "") -> str:
     """
     Build messages from prompts.py and call the LLM via the simple call_llm wrapper.
-    Returns a patient-friendly summary string.
+    Returns a patient-friendly summary string. `topic` steers which search
+    snippets are kept when the text exceeds the prompt's token budget.
     """
+    llm = get_llm()
     if not llm:
         raise RuntimeError("LLM not initialized. Ensure langchain_openai is installed and configured.")
 
     # build messages (returns [SystemMessage, HumanMessage] when langchain is available)
-    messages = build_summary_messages(text)
+    messages = build_summary_messages(text, topic=topic)
 
     try:
-        # call_llm will call llm.agenerate([messages]) internally and return the text content
-        out = await call_llm(llm, messages)
+        # call_llm batches concurrent prompts into one llm.agenerate call and returns the text content
+        out = await call_llm(llm, messages, kind="summary")
         return out.strip()
+    except (CircuitOpenError, DeadlineExceeded):
+        raise
     except Exception as exc:
         logger.exception("LLM summarization failed: %s", exc)
         raise RuntimeError(f"LLM summarization failed: {exc}")
+
+
+async def stream_summary_for_patient(text: str, topic: str = "") -> AsyncIterator[str]:
+    """
+    Same prompt as summarize_text_for_patient, but yields text chunks as the
+    model produces them (llm.astream). Not batched, but it counts against the
+    dispatcher's concurrency and rate budgets and the "llm" circuit breaker.
+    Not retried: chunks may already have reached the client when a failure
+    happens.
+    """
+    llm = get_llm()
+    if not llm:
+        raise RuntimeError("LLM not initialized. Ensure langchain_openai is installed and configured.")
+
+    messages = build_summary_messages(text, topic=topic)
+    breaker = get_breaker("llm")
+    breaker.allow()
+    healthy = None
+    try:
+        async with get_dispatcher(llm).slot(messages):
+            async for chunk in llm.astream(messages):
+                if chunk.content:
+                    yield chunk.content
+        healthy = True
+    except Exception as exc:
+        healthy = False if is_retryable(exc) else None
+        logger.exception("LLM summary streaming failed: %s", exc)
+        raise RuntimeError(f"LLM summarization failed: {exc}")
+    finally:
+        if healthy:
+            breaker.record_success()
+        elif healthy is False:
+            breaker.record_failure()
+        else:
+            breaker.record_other()
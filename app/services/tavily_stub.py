@@ -0,0 +1,43 @@
+# app/services/tavily_stub.py
+"""
+Local stand-in for the Tavily search API.
+
+    uvicorn app.services.tavily_stub:app --port 8765
+    TAVILY_BASE_URL=http://localhost:8765 uvicorn app.main:app
+
+Serves POST /search with deterministic results shaped like Tavily's, so the
+real pooled HTTP client can be exercised (load tests, local dev) without an
+API key. TAVILY_STUB_LATENCY_MS adds an artificial delay per request.
+"""
+import asyncio
+import os
+from typing import Optional
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+LATENCY_MS = int(os.getenv("TAVILY_STUB_LATENCY_MS", "0"))
+
+app = FastAPI(title="Tavily stub")
+
+
+class SearchRequest(BaseModel):
+    query: str
+    max_results: int = 5
+    api_key: Optional[str] = None
+
+
+@app.post("/search")
+async def search(req: SearchRequest):
+    if LATENCY_MS:
+        await asyncio.sleep(LATENCY_MS / 1000)
+    results = [
+        {
+            "title": f"{req.query} — overview {i + 1}",
+            "url": f"https://example.org/{i + 1}/{req.query.replace(' ', '-')}",
+            "content": f"Stub content {i + 1} about {req.query}.",
+            "score": round(1.0 - i * 0.1, 2),
+        }
+        for i in range(req.max_results)
+    ]
+    return {"query": req.query, "results": results, "response_time": LATENCY_MS / 1000}
@@ -0,0 +1,190 @@
+# app/services/topic_cache.py
+"""
+Shared, topic-keyed cache for search results and patient summaries.
+
+Thousands of sessions ask about the same topic, so the normalized Tavily
+text and the generated summary are cached per topic:
+ - an in-process LRU (TOPIC_CACHE_LOCAL_SIZE entries, TOPIC_CACHE_LOCAL_TTL)
+ - Redis, shared by all workers (TOPIC_CACHE_TTL_SECONDS)
+
+Keys include prompt_version() (a hash of the prompt templates), so summaries
+made with an older prompt are never served after a prompt change.
+Cache errors are logged and treated as misses; they never fail a request.
+
+`get_or_compute` also coalesces concurrent misses for the same topic: within
+a process through a SingleFlight, and across workers through a short Redis
+lock (SET NX PX) next to the result key. Workers that lose the lock poll the
+result key instead of calling the upstream themselves. Values rejected by
+`cache_if` (e.g. search placeholders) are returned but not stored.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, List, Optional
+
+from app.core.prompts import prompt_version
+from app.utils.cache import TTLCache
+from app.utils.singleflight import SingleFlight
+from app.utils.redis_client import get_redis
+from app.utils.resilience import time_left
+
+logger = logging.getLogger("healthbot.topic_cache")
+
+TOPIC_CACHE_TTL = int(os.getenv("TOPIC_CACHE_TTL_SECONDS", str(24 * 3600)))
+LOCAL_SIZE = int(os.getenv("TOPIC_CACHE_LOCAL_SIZE", "512"))
+LOCAL_TTL = float(os.getenv("TOPIC_CACHE_LOCAL_TTL", "600"))
+# cross-worker coalescing: lock lifetime and how long losers wait for the winner
+LOCK_TTL_MS = int(os.getenv("TOPIC_LOCK_TTL_MS", "60000"))
+LOCK_WAIT_SECONDS = float(os.getenv("TOPIC_LOCK_WAIT_SECONDS", "30"))
+LOCK_POLL_SECONDS = 0.1
+
+SEARCH = "search"
+SUMMARY = "summary"
+
+_local = TTLCache(maxsize=LOCAL_SIZE, ttl=LOCAL_TTL)
+_flights = SingleFlight()
+
+# delete the lock only if we still own it
+_RELEASE_LOCK = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+
+def topic_cache_key(kind: str, topic: str) -> str:
+    digest = hashlib.sha1(normalize_topic(topic).encode("utf-8")).hexdigest()[:20]
+    return f"healthbot:topic:{prompt_version()}:{kind}:{digest}"
+
+
+async def get_cached(kind: str, topic: str) -> Optional[str]:
+    key = topic_cache_key(kind, topic)
+    value = _local.get(key)
+    if value is not None:
+        return value
+    try:
+        r = await get_redis()
+        value = await r.get(key)
+    except Exception as e:
+        logger.debug("Topic cache read failed for %s: %s", key, e)
+        return None
+    if value is not None:
+        _local.set(key, value)
+    return value
+
+
+async def set_cached(kind: str, topic: str, value: str, ttl: int = TOPIC_CACHE_TTL):
+    key = topic_cache_key(kind, topic)
+    _local.set(key, value, ttl=min(LOCAL_TTL, ttl))
+    try:
+        r = await get_redis()
+        await r.set(key, value, ex=ttl)
+    except Exception as e:
+        logger.debug("Topic cache write failed for %s: %s", key, e)
+
+
+async def get_cached_list(kind: str, topic: str) -> Optional[List[str]]:
+    key = topic_cache_key(kind, topic)
+    values = _local.get(key)
+    if values is not None:
+        return values
+    try:
+        r = await get_redis()
+        values = await r.lrange(key, 0, -1)
+    except Exception as e:
+        logger.debug("Topic cache read failed for %s: %s", key, e)
+        return None
+    if not values:
+        return None
+    _local.set(key, values)
+    return values
+
+
+async def append_cached(kind: str, topic: str, values: List[str], keep: int,
+                        ttl: int = TOPIC_CACHE_TTL) -> List[str]:
+    """
+    Append `values` to the (kind, topic) list, keeping the newest `keep`, and
+    return the merged list. The Redis append is atomic (MULTI), so concurrent
+    appends from other workers are kept rather than overwritten.
+    """
+    key = topic_cache_key(kind, topic)
+    try:
+        r = await get_redis()
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, *values)
+            pipe.ltrim(key, -keep, -1)
+            pipe.expire(key, ttl)
+            pipe.lrange(key, 0, -1)
+            merged = (await pipe.execute())[-1]
+    except Exception as e:
+        logger.debug("Topic cache append failed for %s: %s", key, e)
+        merged = (list(_local.get(key) or []) + list(values))[-keep:]
+    _local.set(key, merged, ttl=min(LOCAL_TTL, ttl))
+    return merged
+
+
+async def get_or_compute(kind: str, topic: str, compute: Callable[[], Awaitable[str]],
+                         cache_if: Optional[Callable[[str], bool]] = None) -> str:
+    """Cached value for (kind, topic), computing it at most once across concurrent requests."""
+    value = await get_cached(kind, topic)
+    if value is not None:
+        return value
+    return await _flights.do(topic_cache_key(kind, topic), lambda: _compute_once(kind, topic, compute, cache_if))
+
+
+async def _compute_once(kind: str, topic: str, compute: Callable[[], Awaitable[str]],
+                        cache_if: Optional[Callable[[str], bool]] = None) -> str:
+    lock_key = topic_cache_key(kind, topic) + ":lock"
+    token = uuid.uuid4().hex
+    r = None
+    try:
+        r = await get_redis()
+        owner = bool(await r.set(lock_key, token, nx=True, px=LOCK_TTL_MS))
+    except Exception as e:
+        logger.debug("Topic lock unavailable for %s: %s", lock_key, e)
+        owner = False
+        r = None
+
+    if r is not None and not owner:
+        # another worker is computing this topic; wait for its result
+        left = time_left()
+        deadline = time.monotonic() + (LOCK_WAIT_SECONDS if left is None else min(LOCK_WAIT_SECONDS, left))
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_SECONDS)
+            value = await get_cached(kind, topic)
+            if value is not None:
+                return value
+            try:
+                if not await r.exists(lock_key):
+                    # the winner may have stored its result just before releasing
+                    value = await get_cached(kind, topic)
+                    if value is not None:
+                        return value
+                    break
+            except Exception:
+                break
+        logger.info("No shared result for %s after waiting; computing locally", lock_key)
+
+    try:
+        value = await compute()
+        if cache_if is None or cache_if(value):
+            await set_cached(kind, topic, value)
+        return value
+    finally:
+        if owner:
+            try:
+                await r.eval(_RELEASE_LOCK, 1, lock_key, token)
+            except Exception as e:
+                logger.debug("Topic lock release failed for %s: %s", lock_key, e)
+
+
+def topic_cache_stats() -> dict:
+    return {**_local.stats(), "inflight": len(_flights)}
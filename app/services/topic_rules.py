@@ -0,0 +1,220 @@
+# app/services/topic_rules.py
+"""
+Local topic validation: settles common /start topics without the LLM.
+
+ 1. dictionary — the topic (or one of its aliases: the name without its
+                 parenthetical, or the parenthetical itself, e.g. "flu" for
+                 "Influenza (Flu)") is in the topic dictionary
+ 2. partial    — the topic is the leading words of the names of at most
+                 PARTIAL_MAX_TERMS dictionary topics ("diabetes"), named in full
+                 when only one matches ("alzheimers"); words that start many
+                 topics ("health") are too generic
+ 3. fuzzy      — as 1 or 2 with one misspelled word, when the topic has at
+                 least two words and all the others match exactly
+                 ("type 2 diabtes")
+ 4. contains   — the text mentions a dictionary topic name of at least
+                 CONTAINS_MIN_CHARS characters ("asthma in children")
+ 5. empty      — no letters or digits ("???")
+ 6. gibberish  — keyboard mashing ("asdfgh", "zxcvbnm"): a single word of at
+                 least GIBBERISH_MIN_CHARS letters that no tier above nor the
+                 suggest index's fuzzy match finds, typed entirely with
+                 repeated or nearby keys, whose mean character-trigram
+                 log-probability (model trained on the dictionary's words) is
+                 below TOPIC_GIBBERISH_THRESHOLD
+
+Only tiers 5 and 6 reject. Anything else is uncertain and left to the LLM
+validator, including single misspelled words: one edit turns plenty of
+ordinary words into topics ("rental" -> "dental", "scabies" -> "rabies").
+The trigram score alone cannot tell drug names and rare conditions ("xanax",
+"wegovy", "yaws") from mashing, so tier 6 also needs the keyboard pattern,
+which those words lack; ordinary words that have it ("refer", "assert")
+score well above the threshold.
+"""
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from app.services.suggest_index import MAX_EDIT_DISTANCE, SuggestIndex, edit_distance
+
+GIBBERISH_THRESHOLD = float(os.getenv("TOPIC_GIBBERISH_THRESHOLD", "-4.0"))
+GIBBERISH_MIN_CHARS = 5
+CONTAINS_MIN_CHARS = 5
+PARTIAL_MAX_TERMS = 10
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_LETTERS_RE = re.compile(r"[a-z]+")
+_PAREN_RE = re.compile(r"\(([^)]*)\)")
+
+# QWERTY rows and their horizontal offsets, in key widths
+_KEY_ROWS = (("qwertyuiop", 0.0), ("asdfghjkl", 0.25), ("zxcvbnm", 0.75))
+_KEYS = {c: (row, col + offset) for row, (keys, offset) in enumerate(_KEY_ROWS) for col, c in enumerate(keys)}
+
+
+def normalize(text: str) -> str:
+    text = (text or "").lower().replace("'", "").replace("\u2019", "")
+    return " ".join(_TOKEN_RE.findall(text))
+
+
+def aliases(term: str) -> List[str]:
+    """Normalized names a dictionary term may be asked for by."""
+    names = [term, _PAREN_RE.sub(" ", term)] + _PAREN_RE.findall(term)
+    out = []
+    for name in names:
+        name = normalize(name)
+        if name and name not in out:
+            out.append(name)
+    return out
+
+
+def keyboard_walk(word: str) -> bool:
+    """
+    Whether every letter is typed with the previous letter's key, one at most
+    two keys along the same row, or one touching it on the next row.
+    """
+    if not all(c in _KEYS for c in word):
+        return False
+    for a, b in zip(word, word[1:]):
+        (ra, xa), (rb, xb) = _KEYS[a], _KEYS[b]
+        if abs(ra - rb) > 1 or abs(xa - xb) > (2 if ra == rb else 1):
+            return False
+    return True
+
+
+class CharNgramModel:
+    """Character trigram model (interpolated with bigrams and unigrams) over words."""
+
+    WEIGHTS = (0.6, 0.3, 0.1)
+
+    def __init__(self, words: Iterable[str]):
+        self._tri: Counter = Counter()
+        self._bi: Counter = Counter()
+        self._uni: Counter = Counter()
+        for word in words:
+            p = f"^^{word}$"
+            for i in range(len(p) - 2):
+                self._tri[p[i:i + 3]] += 1
+            for i in range(len(p) - 1):
+                self._bi[p[i:i + 2]] += 1
+            self._uni.update(p)
+        self._total = sum(self._uni.values())
+        self._vocab = len(self._uni) + 1
+
+    def _logprob(self, gram: str) -> float:
+        w3, w2, w1 = self.WEIGHTS
+        ctx = self._bi[gram[:2]]
+        p3 = self._tri[gram] / ctx if ctx else 0.0
+        first = self._uni[gram[1]]
+        p2 = self._bi[gram[1:]] / first if first else 0.0
+        p1 = (self._uni[gram[2]] + 1) / (self._total + self._vocab)
+        return math.log(w3 * p3 + w2 * p2 + w1 * p1)
+
+    def score(self, word: str) -> float:
+        """Mean log-probability per trigram of a lowercase word."""
+        p = f"^^{word}$"
+        grams = [p[i:i + 3] for i in range(len(p) - 2)]
+        return sum(self._logprob(g) for g in grams) / len(grams)
+
+
+def _result(valid: bool, cleaned_topic: str, reason: str, by: str) -> dict:
+    return {"valid": valid, "cleaned_topic": cleaned_topic if valid else "", "reason": reason,
+            "validated_by": by}
+
+
+class LocalTopicValidator:
+    def __init__(self, index: SuggestIndex):
+        self.index = index
+        self.generation = index.generation
+        self._aliases: Dict[str, str] = {}  # normalized alias -> dictionary term
+        words = []
+        for term in index.terms():
+            for name in aliases(term):
+                self._aliases.setdefault(name, term)
+            words.extend(_LETTERS_RE.findall(term.lower()))
+        self.model = CharNgramModel(words)
+
+    def _windows(self, term: str, n_words: int) -> Iterable[str]:
+        for name in aliases(term):
+            words = name.split()
+            for i in range(len(words) - n_words + 1):
+                yield " ".join(words[i:i + n_words])
+
+    def _partial(self, q: str) -> List[str]:
+        """Topics whose names start with the words of `q`; empty if `q` is too generic."""
+        if len(q) < CONTAINS_MIN_CHARS:
+            return []
+        prefix = f"{q} "
+        hits = sorted({term for name, term in self._aliases.items() if name.startswith(prefix)}, key=len)
+        return hits if len(hits) <= PARTIAL_MAX_TERMS else []
+
+    def _fuzzy(self, q: str) -> Optional[tuple]:
+        """
+        (corrected words, topics they name or start) for the closest dictionary
+        match that differs from `q` in exactly one word; None for single words.
+        """
+        words = q.split()
+        if len(words) < 2:
+            return None
+        windows: Dict[str, int] = {}
+        for term in self.index.fuzzy_terms(q):
+            for window in self._windows(term, len(words)):
+                if window in windows:
+                    continue
+                if sum(a != b for a, b in zip(words, window.split())) != 1:
+                    windows[window] = MAX_EDIT_DISTANCE + 1
+                else:
+                    windows[window] = edit_distance(q, window, MAX_EDIT_DISTANCE)
+        best = None
+        for window, d in windows.items():
+            if d > MAX_EDIT_DISTANCE:
+                continue
+            hits = [self._aliases[window]] if window in self._aliases else self._partial(window)
+            # fewest edits, then a full name, then the word most topics start with
+            rank = (d, window not in self._aliases, -len(hits))
+            if hits and (best is None or rank < best[0]):
+                best = (rank, window, hits)
+        return best[1:] if best else None
+
+    def check(self, raw_topic: str) -> Optional[dict]:
+        """A validation result, or None when only the LLM can tell."""
+        q = normalize(raw_topic)
+        if not q:
+            return _result(False, "", "No letters or digits.", "empty")
+
+        term = self._aliases.get(q)
+        if term is not None:
+            return _result(True, term, f"Dictionary topic: {term}.", "dictionary")
+
+        # a single match is named in full ("remote" -> "Remote Monitoring")
+        hits = self._partial(q)
+        if hits:
+            cleaned = hits[0] if len(hits) == 1 else " ".join(raw_topic.split())
+            return _result(True, cleaned, f"Starts dictionary topic: {hits[0]}.", "partial")
+
+        fuzzy = self._fuzzy(q)
+        if fuzzy is not None:
+            window, hits = fuzzy
+            cleaned = hits[0] if len(hits) == 1 else window
+            return _result(True, cleaned, f"Close to dictionary topic: {hits[0]}.", "fuzzy")
+
+        tokens = q.split()
+        for n in range(min(4, len(tokens) - 1), 0, -1):
+            for i in range(len(tokens) - n + 1):
+                phrase = " ".join(tokens[i:i + n])
+                term = self._aliases.get(phrase)
+                if term is not None and len(phrase) >= CONTAINS_MIN_CHARS:
+                    return _result(True, " ".join(raw_topic.split()), f"Mentions dictionary topic: {term}.",
+                                   "contains")
+
+        if self._gibberish(q):
+            return _result(False, "", "Looks like keyboard mashing.", "gibberish")
+        return None
+
+    def _gibberish(self, q: str) -> bool:
+        """Tier 6, for input tiers 1-4 left undecided."""
+        if " " in q or len(q) < GIBBERISH_MIN_CHARS or not keyboard_walk(q):
+            return False
+        if self.index.fuzzy_terms(q):
+            return False
+        return self.model.score(q) < GIBBERISH_THRESHOLD
@@ -0,0 +1,258 @@
+# app/services/topic_store.py
+"""
+Hot-reloadable topic dictionary.
+
+medical_topics.txt is compiled offline into a compact blob that every worker
+mmaps read-only, so the OS page cache holds one shared copy:
+
+    magic  b"HBTOPIC1"
+    uint32 version
+    uint32 count
+    uint32 offsets[count]      byte offset of each record, from blob start
+    record[count]              uint16 length + UTF-8 bytes (longer topics are
+                               cut to 65535 bytes on a character boundary)
+
+Records are deduplicated and sorted case-insensitively. Build with:
+
+    python -m app.services.topic_store [medical_topics.txt] [medical_topics.bin]
+
+At runtime the store stats its source file at most every
+TOPICS_RELOAD_SECONDS; when the mtime or blob version changes it loads a new
+snapshot, syncs the suggest index incrementally and swaps both in at once.
+If no blob exists (or the text file is newer), the text file is read directly.
+
+Only the raw dictionary is shared between workers. Each worker still builds
+its own SuggestIndex from it (Python strings and posting arrays), roughly
+95 MB per 50k terms; see scripts/bench_suggest_index.py.
+"""
+import functools
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from collections.abc import Sequence
+from typing import Iterator, List, Optional, Tuple, Union
+
+from app.services.suggest_index import SuggestIndex
+
+logger = logging.getLogger("healthbot.topic_store")
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+DATA_PATH = os.getenv("TOPICS_PATH", os.path.join(DATA_DIR, "medical_topics.txt"))
+BLOB_PATH = os.getenv("TOPICS_BLOB_PATH", os.path.join(DATA_DIR, "medical_topics.bin"))
+RELOAD_SECONDS = float(os.getenv("TOPICS_RELOAD_SECONDS", "5"))
+
+MAGIC = b"HBTOPIC1"
+_HEADER = struct.Struct("<8sII")
+_OFFSET = struct.Struct("<I")
+_LENGTH = struct.Struct("<H")
+
+
+def load_medical_topics(path: str = DATA_PATH) -> List[str]:
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return [line.strip() for line in fh if line.strip()]
+    except Exception:
+        # On any read error, return empty list — don't crash import
+        return []
+
+
+def _sorted_unique(topics: Sequence[str]) -> List[str]:
+    return sorted(set(topics), key=lambda t: (t.lower(), t))
+
+
+# ---------- Blob format ----------
+def read_blob_version(path: str = BLOB_PATH) -> Optional[int]:
+    try:
+        with open(path, "rb") as fh:
+            magic, version, _ = _HEADER.unpack(fh.read(_HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return version if magic == MAGIC else None
+
+
+def _encode_record(topic: str) -> bytes:
+    rec = topic.encode("utf-8")
+    if len(rec) <= 0xFFFF:
+        return rec
+    # cut on a character boundary: a split UTF-8 sequence would not decode
+    logger.warning("Topic of %d bytes truncated to fit a blob record: %.40r...", len(rec), topic)
+    return rec[:0xFFFF].decode("utf-8", "ignore").encode("utf-8")
+
+
+def build_topic_blob(src: str = DATA_PATH, dst: str = BLOB_PATH, version: Optional[int] = None) -> int:
+    """Compile the text dictionary into the mmap-able blob; returns the new version."""
+    topics = _sorted_unique(load_medical_topics(src))
+    if version is None:
+        version = (read_blob_version(dst) or 0) + 1
+    records = [_encode_record(t) for t in topics]
+    offset = _HEADER.size + _OFFSET.size * len(records)
+    offsets = []
+    for rec in records:
+        offsets.append(offset)
+        offset += _LENGTH.size + len(rec)
+
+    tmp = f"{dst}.tmp.{os.getpid()}"
+    with open(tmp, "wb") as fh:
+        fh.write(_HEADER.pack(MAGIC, version, len(records)))
+        fh.write(b"".join(_OFFSET.pack(o) for o in offsets))
+        for rec in records:
+            fh.write(_LENGTH.pack(len(rec)))
+            fh.write(rec)
+    # readers never see a half-written blob
+    os.replace(tmp, dst)
+    return version
+
+
+class TopicSnapshot(Sequence):
+    """Read-only view of one version of the dictionary (mmapped blob or list)."""
+
+    def __init__(self, source: Union[mmap.mmap, List[str]], version: int, path: str):
+        self.version = version
+        self.path = path
+        self._list: Optional[List[str]] = None
+        self._buf: Optional[mmap.mmap] = None
+        if isinstance(source, list):
+            self._list = source
+            self._count = len(source)
+        else:
+            self._buf = source
+            _, _, self._count = _HEADER.unpack_from(source, 0)
+
+    @classmethod
+    def from_blob(cls, path: str) -> "TopicSnapshot":
+        with open(path, "rb") as fh:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _ = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            buf.close()
+            raise ValueError(f"{path} is not a topic blob")
+        return cls(buf, version, path)
+
+    @classmethod
+    def from_text(cls, path: str) -> "TopicSnapshot":
+        try:
+            version = os.stat(path).st_mtime_ns
+        except OSError:
+            version = 0
+        return cls(_sorted_unique(load_medical_topics(path)), version, path)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if self._list is not None:
+            return self._list[i]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        (offset,) = _OFFSET.unpack_from(self._buf, _HEADER.size + _OFFSET.size * i)
+        (length,) = _LENGTH.unpack_from(self._buf, offset)
+        start = offset + _LENGTH.size
+        return self._buf[start:start + length].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self[i]
+
+
+# ---------- Hot-reloading store ----------
+def _source_path() -> str:
+    """Prefer the blob unless the text dictionary was edited after it was built."""
+    try:
+        blob_mtime = os.stat(BLOB_PATH).st_mtime_ns
+    except OSError:
+        return DATA_PATH
+    try:
+        if os.stat(DATA_PATH).st_mtime_ns > blob_mtime:
+            return DATA_PATH
+    except OSError:
+        pass
+    return BLOB_PATH
+
+
+def _fingerprint(path: str) -> Tuple:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (path, None)
+    version = read_blob_version(path) if path == BLOB_PATH else None
+    return (path, st.st_mtime_ns, st.st_size, version)
+
+
+class TopicStore:
+    """Holds the current (snapshot, index) pair and swaps it when the source changes."""
+
+    def __init__(self, reload_seconds: float = RELOAD_SECONDS):
+        self.reload_seconds = reload_seconds
+        self._checked_at = 0.0
+        self._fingerprint: Optional[Tuple] = None
+        self._current: Tuple[TopicSnapshot, SuggestIndex] = (TopicSnapshot([], 0, ""), SuggestIndex())
+
+    @property
+    def snapshot(self) -> TopicSnapshot:
+        return self._refresh()[0]
+
+    @property
+    def index(self) -> SuggestIndex:
+        return self._refresh()[1]
+
+    def _refresh(self) -> Tuple[TopicSnapshot, SuggestIndex]:
+        now = time.monotonic()
+        if self._fingerprint is not None and now - self._checked_at < self.reload_seconds:
+            return self._current
+        self._checked_at = now
+        path = _source_path()
+        fingerprint = _fingerprint(path)
+        if fingerprint != self._fingerprint:
+            self._swap(path, fingerprint)
+        return self._current
+
+    def _swap(self, path: str, fingerprint: Tuple):
+        try:
+            if path == BLOB_PATH:
+                snapshot = TopicSnapshot.from_blob(path)
+            else:
+                snapshot = TopicSnapshot.from_text(path)
+        except Exception as e:
+            # keep serving the previous snapshot
+            logger.warning("Failed to load topic dictionary from %s: %s", path, e)
+            self._fingerprint = fingerprint
+            return
+
+        _, index = self._current
+        if not len(index) or index.tombstones > len(snapshot):
+            index = SuggestIndex(snapshot)
+            added, removed = len(index), 0
+        else:
+            # note: the index is patched in place while the old snapshot is
+            # still current; this is synchronous, so no request sees a mix.
+            added, removed = index.sync(snapshot)
+        self._current = (snapshot, index)
+        self._fingerprint = fingerprint
+        logger.info("Loaded topic dictionary v%s from %s (+%d/-%d terms)",
+                    snapshot.version, path, added, removed)
+
+
+@functools.lru_cache(maxsize=1)
+def get_topic_store() -> TopicStore:
+    return TopicStore()
+
+
+def get_suggest_index() -> SuggestIndex:
+    """Current suggest index, reloaded when the topic dictionary changes."""
+    return get_topic_store().index
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else DATA_PATH
+    dst = sys.argv[2] if len(sys.argv) > 2 else BLOB_PATH
+    v = build_topic_blob(src, dst)
+    print(f"wrote {dst} (version {v})")
@@ -1,13 +1,58 @@
-from langchain_core.messages import SystemMessage, HumanMessage
-from app.services.summary_service import llm  # same model you use
-import json
+from app.services.llm import call_llm, get_llm  # same model you use
+from app.services.structured_output import Schema, StructuredOutputError, accepts, parse_structured
+from app.services.topic_rules import LocalTopicValidator, normalize
+from app.services.topic_store import get_suggest_index
+from app.utils.cache import TTLCache
+from collections import Counter
+import os
+
+# validated topics (normalized) -> result, from either tier
+_memo = TTLCache(maxsize=int(os.getenv("TOPIC_VALIDATION_CACHE_SIZE", "4096")),
+                 ttl=float(os.getenv("TOPIC_VALIDATION_CACHE_TTL", "3600")))
+_local = None
+_stats: Counter = Counter()
+
+TOPIC_SCHEMA = Schema({"valid": bool, "cleaned_topic": str, "reason": str},
+                      required=("valid",), defaults={"cleaned_topic": "", "reason": ""}, complete=("valid",))
+
+
+def get_local_validator() -> LocalTopicValidator:
+    """Rule-based validator for the current dictionary (rebuilt when it changes)."""
+    global _local
+    index = get_suggest_index()
+    if _local is None or _local.index is not index or _local.generation != index.generation:
+        _local = LocalTopicValidator(index)
+        _memo.clear()
+    return _local
 
 
 async def validate_topic(raw_topic: str) -> dict:
     """
     Validates if the user topic is a real, medically meaningful topic.
-    Returns JSON: {valid: bool, cleaned_topic: str, reason: str}
+    Returns JSON: {valid: bool, cleaned_topic: str, reason: str, validated_by: str}
+    Dictionary hits, multi-word typos of dictionary topics, input without
+    letters and keyboard mashing are decided locally (see topic_rules); the
+    rest goes to the LLM.
     """
+    validator = get_local_validator()
+    key = normalize(raw_topic)
+    cached = _memo.get(key)
+    if cached is not None:
+        return dict(cached)
+
+    result = validator.check(raw_topic)
+    if result is None:
+        result = await _validate_with_llm(raw_topic)
+    _stats[result["validated_by"]] += 1
+    if result["validated_by"] != "failed":
+        _memo.set(key, result)
+    return dict(result)
+
+
+async def _validate_with_llm(raw_topic: str) -> dict:
+    # imported here so that starting the app does not load langchain
+    from langchain_core.messages import SystemMessage, HumanMessage
+
     system = SystemMessage(
         content="You are a medical topic validator. Decide if the user input refers to a real health-related topic."
     )
@@ -27,9 +72,20 @@ async def validate_topic(raw_topic: str) -> dict:
         """
     )
 
-    res = await llm.agenerate(messages=[[system, user]])
-    text = res.generations[0][0].text  # safe extraction
+    text = await call_llm(get_llm(), [system, user], kind="validate", cache_if=accepts(TOPIC_SCHEMA))
     try:
-        return json.loads(text)
-    except:
-        return {"valid": False, "cleaned_topic": "", "reason": "Validator failed"}
+        result = parse_structured(text, TOPIC_SCHEMA)
+    except StructuredOutputError:
+        return {"valid": False, "cleaned_topic": "", "reason": "Validator failed", "validated_by": "failed"}
+    result["validated_by"] = "llm"
+    return result
+
+
+def topic_validation_stats() -> dict:
+    total = sum(_stats.values())
+    return {
+        "total": total,
+        "by_tier": dict(_stats),
+        "local_rate": round(1 - (_stats["llm"] + _stats["failed"]) / total, 4) if total else 0.0,
+        "memo": _memo.stats(),
+    }
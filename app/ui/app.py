@@ -3,7 +3,9 @@ import streamlit as st
 import requests
 import time
 import hashlib
-from typing import List
+import json
+import re
+from typing import Iterator, List
 
 BASE = "http://localhost:8000/healthbot"
 SUGGEST_LIMIT = 8
@@ -32,12 +34,47 @@ def api_post(path: str, params: dict = None, json_body: dict = None, timeout: in
         return {"error": str(e)}
 
 
+def api_stream(path: str, json_body: dict = None, timeout: int = 60) -> Iterator[dict]:
+    """POST to a Server-Sent Events endpoint and yield each event as a dict with an 'event' key."""
+    url = f"{BASE.rstrip('/')}/{path.lstrip('/')}"
+    with requests.post(url, json=json_body, stream=True, timeout=timeout) as resp:
+        resp.raise_for_status()
+        name, data = "message", []
+        for line in resp.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                name = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data.append(line[len("data:"):].strip())
+            elif not line and data:
+                ev = json.loads("\n".join(data))
+                ev["event"] = name
+                yield ev
+                name, data = "message", []
+
+
 def get_suggestions_from_backend(query: str, limit: int = SUGGEST_LIMIT) -> List[str]:
+    # honour the backend's ETag / Cache-Control so repeated prefixes are free
+    cache = st.session_state.setdefault("suggest_cache", {})
+    key = (query.lower(), limit)
+    cached = cache.get(key)
+    if cached and cached["expires"] > time.time():
+        return cached["suggestions"]
+    headers = {"If-None-Match": cached["etag"]} if cached and cached.get("etag") else {}
     try:
-        r = requests.get(f"{BASE}/suggest", params={"q": query, "limit": limit}, timeout=2)
-        r.raise_for_status()
-        j = r.json()
-        return j.get("suggestions", []) if isinstance(j, dict) else []
+        r = requests.get(f"{BASE}/suggest", params={"q": query, "limit": limit}, headers=headers, timeout=2)
+        if r.status_code == 304 and cached:
+            suggestions = cached["suggestions"]
+        else:
+            r.raise_for_status()
+            j = r.json()
+            suggestions = j.get("suggestions", []) if isinstance(j, dict) else []
+        match = re.search(r"max-age=(\d+)", r.headers.get("Cache-Control", ""))
+        cache[key] = {
+            "etag": r.headers.get("ETag"),
+            "suggestions": suggestions,
+            "expires": time.time() + (int(match.group(1)) if match else 0),
+        }
+        return suggestions
     except Exception:
         return []
 
@@ -85,8 +122,27 @@ def start_session_callback():
         st.warning("Please enter a topic before submitting.")
         return
 
-    with st.spinner("Starting session and fetching summary..."):
-        res = api_post("start", json_body={"topic": topic, "session_id": session_id})
+    # stream the summary as it is generated instead of waiting for all of it
+    status = st.empty()
+    summary_box = st.empty()
+    status.info("Searching trusted sources...")
+    res, text = None, ""
+    try:
+        for ev in api_stream("start/stream", json_body={"topic": topic, "session_id": session_id}):
+            if ev["event"] == "search_done":
+                status.info("Writing your summary...")
+            elif ev["event"] == "token":
+                text += ev.get("text", "")
+                summary_box.markdown(text)
+            elif ev["event"] == "done":
+                res = {k: ev.get(k) for k in ("session_id", "topic", "summary")}
+            elif ev["event"] == "error":
+                res = {"error": ev.get("detail")}
+    except requests.RequestException as e:
+        res = {"error": str(e)}
+    status.empty()
+    if res is None:
+        res = {"error": "Stream ended before the summary was complete."}
     if isinstance(res, dict) and res.get("error"):
         st.error(f"Failed to start session: {res['error']}")
     else:
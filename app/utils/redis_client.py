@@ -0,0 +1,82 @@
+# app/utils/redis_client.py
+"""
+Shared Redis connection for the session store and the topic/popularity caches.
+
+Set REDIS_URL to an empty string to run without Redis: get_redis() then
+raises immediately and the caches fall back to their in-process tiers. After
+a failed connection attempt, further attempts are skipped for
+REDIS_RETRY_SECONDS so an unreachable server does not add a connect timeout
+to every request.
+
+get_redis() returns str values; get_redis(decode_responses=False) returns a
+client on its own pool that returns bytes, for binary payloads such as the
+compressed session fields.
+"""
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    import redis.asyncio as aioredis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_RETRY_SECONDS = float(os.getenv("REDIS_RETRY_SECONDS", "5"))
+
+_clients: Dict[bool, "aioredis.Redis"] = {}  # by decode_responses
+_failed_at: Optional[float] = None
+_connecting: Dict[bool, asyncio.Lock] = {}
+
+
+def redis_enabled() -> bool:
+    return bool(REDIS_URL)
+
+
+async def get_redis(decode_responses: bool = True) -> "aioredis.Redis":
+    client = _clients.get(decode_responses)
+    if client is not None:
+        return client
+    if not REDIS_URL:
+        raise RuntimeError("Redis is disabled (REDIS_URL is empty)")
+    # one connection attempt at a time: concurrent first callers share its client
+    lock = _connecting.setdefault(decode_responses, asyncio.Lock())
+    async with lock:
+        client = _clients.get(decode_responses)
+        if client is None:
+            client = _clients[decode_responses] = await _connect(decode_responses)
+    return client
+
+
+async def _connect(decode_responses: bool) -> "aioredis.Redis":
+    global _failed_at
+    if _failed_at is not None and time.monotonic() - _failed_at < REDIS_RETRY_SECONDS:
+        raise RuntimeError(f"Redis at {REDIS_URL} is unavailable; retrying later")
+
+    # Use redis.asyncio from the official redis package (only when Redis is used)
+    import redis.asyncio as aioredis
+
+    client = aioredis.from_url(REDIS_URL, encoding="utf-8", decode_responses=decode_responses)
+    try:
+        await client.ping()
+    except Exception as e:
+        _failed_at = time.monotonic()
+        try:
+            await _close(client)
+        except Exception:
+            pass
+        raise RuntimeError(f"Unable to connect to Redis at {REDIS_URL}: {e}")
+    _failed_at = None
+    return client
+
+
+async def _close(client: "aioredis.Redis"):
+    # aclose() replaced close() in redis 5
+    close = getattr(client, "aclose", None) or client.close
+    await close()
+
+
+async def close_redis():
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await _close(client)
@@ -0,0 +1,216 @@
+# app/utils/resilience.py
+"""
+Deadlines, retries and circuit breakers for calls to upstream services.
+
+ - deadline(seconds) sets the time left for the current request in a
+   context variable. Tasks started inside it (fan-out searches, batched LLM
+   calls) inherit it, and a nested deadline can only shorten it. Background
+   work opts out with deadline(seconds, detach=True).
+ - call_with_retry(fn, breaker=...) runs one upstream call. Each attempt is
+   capped by the per-call timeout and by the time left. Only retryable errors
+   are retried: timeouts, connection errors, 429 and 5xx. The wait between
+   attempts grows exponentially, with jitter. A retry is skipped when the
+   deadline would pass before it could finish. Without a breaker, `fn` is
+   expected to check and record one itself: the LLM dispatcher does, once
+   per provider call, since one batch serves many callers.
+ - CircuitBreaker (one per upstream, see get_breaker) opens after
+   BREAKER_FAILURES consecutive retryable failures. While open, calls fail at
+   once with CircuitOpenError instead of holding a worker. After
+   BREAKER_RESET_SECONDS it lets one probe call through (half-open): success
+   closes the breaker, failure opens it again.
+"""
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import random
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger("healthbot.resilience")
+
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "30"))
+BACKGROUND_DEADLINE_SECONDS = float(os.getenv("BACKGROUND_DEADLINE_SECONDS", "120"))
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BASE_SECONDS = float(os.getenv("RETRY_BASE_SECONDS", "0.5"))
+RETRY_MAX_SECONDS = float(os.getenv("RETRY_MAX_SECONDS", "4"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# by class name, so neither httpx nor openai has to be imported here
+RETRYABLE_ERRORS = {
+    "TimeoutException", "ConnectError", "ReadError", "WriteError", "RemoteProtocolError",  # httpx
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",  # openai
+}
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("healthbot_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+# ---------- deadlines ----------
+@contextlib.contextmanager
+def deadline(seconds: Optional[float] = REQUEST_DEADLINE_SECONDS, detach: bool = False) -> Iterator[None]:
+    """Limit everything awaited inside to `seconds` (never extends an outer deadline unless detached)."""
+    at = time.monotonic() + seconds if seconds is not None else None
+    outer = _deadline.get()
+    if not detach and outer is not None and (at is None or outer < at):
+        at = outer
+    token = _deadline.set(at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left() -> Optional[float]:
+    """Seconds until the current deadline (None if there is none)."""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def check_deadline():
+    left = time_left()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (DeadlineExceeded, CircuitOpenError)):
+        return False
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(exc).__mro__)
+
+
+# ---------- circuit breaker ----------
+class CircuitBreaker:
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._stats: Counter = Counter()
+
+    def allow(self):
+        """Raises CircuitOpenError unless a call may go through now."""
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                self._stats["rejected"] += 1
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                self._stats["rejected"] += 1
+                raise CircuitOpenError(f"{self.name} is unavailable (probing)")
+            self._probing = True
+
+    def record_success(self):
+        self._stats["successes"] += 1
+        self._consecutive = 0
+        self._probing = False
+        if self.state != "closed":
+            logger.info("Circuit %s closed", self.name)
+            self.state = "closed"
+
+    def record_failure(self):
+        self._stats["failures"] += 1
+        self._consecutive += 1
+        self._probing = False
+        if self.state == "half_open" or self._consecutive >= self.failures:
+            if self.state != "open":
+                logger.warning("Circuit %s opened after %d failures", self.name, self._consecutive)
+                self._stats["opened"] += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def record_other(self):
+        """The call ended without telling whether the upstream is healthy (e.g. a 400 or a cancellation)."""
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._consecutive, **self._stats}
+
+
+class _NoBreaker(CircuitBreaker):
+    """Stands in when the call records its own outcomes."""
+
+    def allow(self):
+        pass
+
+    def record_success(self):
+        pass
+
+    def record_failure(self):
+        pass
+
+
+_NO_BREAKER = _NoBreaker("none")
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def resilience_stats() -> dict:
+    return {name: b.stats() for name, b in _breakers.items()}
+
+
+# ---------- retries ----------
+async def call_with_retry(fn: Callable[[], Awaitable[Any]], breaker: Optional[CircuitBreaker] = None,
+                          timeout: Optional[float] = None, attempts: int = RETRY_ATTEMPTS,
+                          name: Optional[str] = None) -> Any:
+    """
+    fn() under the breaker (if any), with per-attempt timeouts and
+    budget-aware retries of retryable errors (see module docstring).
+    """
+    name = name or (breaker.name if breaker is not None else "upstream")
+    breaker = breaker or _NO_BREAKER
+    for attempt in range(1, attempts + 1):
+        check_deadline()
+        breaker.allow()
+        left = time_left()
+        limits = [t for t in (timeout, left) if t is not None]
+        limit = min(limits) if limits else None
+        try:
+            result = await asyncio.wait_for(fn(), limit)
+        except asyncio.CancelledError:
+            breaker.record_other()
+            raise
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError) and left is not None and limit == left:
+                # cut short by the request's deadline, not (necessarily) the upstream's fault
+                breaker.record_other()
+                raise DeadlineExceeded(f"request deadline exceeded waiting for {name}") from e
+            if not is_retryable(e):
+                breaker.record_other()
+                raise
+            breaker.record_failure()
+            delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            left = time_left()
+            if attempt == attempts or (left is not None and delay >= left):
+                raise
+            logger.info("%s call failed (%s); retry %d in %.2fs", name, e, attempt, delay)
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
@@ -0,0 +1,172 @@
+# app/utils/session_codec.py
+"""
+Binary encoding of session fields for the Redis and SQLite session stores.
+
+Each field value is encoded on its own:
+ - JSON (orjson when installed), as-is for small values;
+ - compressed when the JSON is at least SESSION_COMPRESS_MIN_BYTES and
+   compression actually shrinks it (zstd when installed, else zlib);
+ - for BLOB_FIELDS (the Tavily text and the summary, which every session on
+   a topic shares), a reference to a content-addressed blob: the encoded
+   value is stored once under its SHA-1 and sessions hold only the digest.
+
+Compressed values and references start with a control byte that JSON text
+never starts with, so plain JSON values written by older versions still
+decode. Blobs are immutable, so decoded blobs are kept in an in-process LRU
+and a reference usually resolves without a store round-trip. The stores
+extend a blob's TTL when a session referencing it is read or touched, so a
+blob outlives the sessions using it. A field whose blob is missing or whose
+value is corrupt is dropped with a warning naming the session and field.
+"""
+import hashlib
+import json
+import logging
+import os
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.utils.cache import TTLCache
+
+try:
+    import orjson
+except Exception:  # optional speedup
+    orjson = None
+
+try:
+    import zstandard
+    _zstd_c = zstandard.ZstdCompressor(level=3)
+    _zstd_d = zstandard.ZstdDecompressor()
+except Exception:  # optional; zlib is used instead
+    zstandard = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("SESSION_COMPRESS_MIN_BYTES", "512"))
+BLOB_MIN_BYTES = int(os.getenv("SESSION_BLOB_MIN_BYTES", "256"))
+BLOB_TTL_SECONDS = int(os.getenv("SESSION_BLOB_TTL_SECONDS", str(24 * 3600)))
+BLOB_FIELDS = ("search_results", "summary")
+
+_ZLIB = b"\x01"
+_ZSTD = b"\x02"
+_REF = b"\x03"
+_MISSING = object()
+
+logger = logging.getLogger("healthbot.session_codec")
+
+
+def _dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def pack(value: Any) -> bytes:
+    """JSON-encode a value, compressed when that pays off."""
+    raw = _dumps(value)
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return raw
+    if zstandard is not None:
+        packed = _ZSTD + _zstd_c.compress(raw)
+    else:
+        packed = _ZLIB + zlib.compress(raw, 6)
+    return packed if len(packed) < len(raw) else raw
+
+
+def unpack(data: bytes) -> Any:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    tag = data[:1]
+    if tag == _ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd-compressed session value but zstandard is not installed")
+        return _loads(_zstd_d.decompress(data[1:]))
+    if tag == _ZLIB:
+        return _loads(zlib.decompress(data[1:]))
+    return _loads(data)
+
+
+class SessionCodec:
+    """Encodes session patches into stored fields plus blobs, and back."""
+
+    def __init__(self, blob_fields: Iterable[str] = BLOB_FIELDS, blob_min_bytes: int = BLOB_MIN_BYTES,
+                 cache_size: int = 256):
+        self.blob_fields = frozenset(blob_fields)
+        self.blob_min_bytes = blob_min_bytes
+        # digest -> decoded value; content-addressed, so entries never go stale
+        # (they are only dropped no later than the stored blob would be)
+        self._blobs = TTLCache(maxsize=cache_size, ttl=BLOB_TTL_SECONDS)
+        # digests whose stored TTL this process extended in the last half TTL
+        self._refreshed = TTLCache(maxsize=cache_size, ttl=BLOB_TTL_SECONDS / 2)
+
+    def encode(self, patch: Dict[str, Any]) -> Tuple[Dict[str, bytes], Dict[str, bytes]]:
+        """
+        (field -> encoded value, digest -> encoded blob) for a session patch.
+        The store writes the blobs along with the fields, refreshing their TTL.
+        """
+        fields, blobs = {}, {}
+        for k, v in patch.items():
+            if k in self.blob_fields and isinstance(v, str) and len(v) >= self.blob_min_bytes:
+                digest = hashlib.sha1(v.encode("utf-8")).hexdigest()
+                blobs[digest] = pack(v)
+                self._blobs.set(digest, v)
+                self._refreshed.set(digest, True)
+                fields[k] = _REF + digest.encode("ascii")
+            else:
+                fields[k] = pack(v)
+        return fields, blobs
+
+    @staticmethod
+    def digest(data: Optional[bytes]) -> Optional[str]:
+        """The blob digest if `data` is a reference."""
+        if data and data[:1] == _REF:
+            return data[1:].decode("ascii")
+        return None
+
+    def missing_blobs(self, raw: Dict[str, Optional[bytes]]) -> List[str]:
+        """Digests referenced by `raw` that are not cached in this process."""
+        digests = {self.digest(v) for v in raw.values()}
+        return [d for d in digests if d is not None and d not in self._blobs]
+
+    def blobs_to_refresh(self, raw: Dict[str, Optional[bytes]]) -> List[str]:
+        """Digests referenced by `raw` whose TTL this process has not extended in the last half TTL."""
+        digests = {self.digest(v) for v in raw.values()}
+        return [d for d in digests if d is not None and d not in self._refreshed]
+
+    def blobs_refreshed(self, digests: Iterable[str]):
+        """Record that the store extended these blobs' TTL."""
+        for digest in digests:
+            self._refreshed.set(digest, True)
+
+    def decode(self, raw: Dict[str, Optional[bytes]], blobs: Optional[Dict[str, Optional[bytes]]] = None,
+               session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Decode stored fields; `blobs` holds fetched blobs listed by missing_blobs()."""
+        for digest, data in (blobs or {}).items():
+            if data is None:
+                continue
+            try:
+                self._blobs.set(digest, unpack(data))
+            except Exception as e:
+                logger.warning("Session blob %s is corrupt: %s", digest, e)
+        state = {}
+        for k, v in raw.items():
+            if v is None:
+                continue
+            digest = self.digest(v)
+            if digest is not None:
+                value = self._blobs.get(digest, _MISSING, count=False)
+                if value is _MISSING:
+                    logger.warning("Session %s: blob %s for field %r is missing or corrupt; field dropped",
+                                   session_id, digest, k)
+                    continue
+                state[k] = value
+                continue
+            try:
+                state[k] = unpack(v)
+            except Exception as e:
+                logger.warning("Session %s: field %r is corrupt (%s); field dropped", session_id, k, e)
+        return state
+
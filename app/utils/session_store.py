@@ -0,0 +1,409 @@
+# app/utils/session_store.py
+"""
+Session store backends.
+
+A session is a flat mapping of field -> JSON-serializable value with a
+sliding TTL: every read or write of a session extends its life by `ttl`
+seconds. All backends offer the same operations (see SessionStore):
+
+ - RedisSessionStore  — a Redis hash per session; shared by all workers.
+ - MemorySessionStore — an in-process LRU with TTL, bounded to `maxsize`
+                        sessions; no serialization, lost on restart.
+ - SQLiteSessionStore — an embedded SQLite database in WAL mode; survives
+                        restarts and can be shared by the workers of one
+                        host (writes are serialized), no server needed.
+
+The Redis and SQLite stores encode fields with SessionCodec (compact JSON,
+compression for large values, shared blobs for per-topic text).
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from app.utils.cache import TTLCache
+from app.utils.redis_client import get_redis
+from app.utils.session_codec import BLOB_TTL_SECONDS, SessionCodec
+
+
+class SessionStore:
+    """Interface implemented by the session backends."""
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    async def create(self, session_id: str, state: Dict[str, Any]):
+        """Replace any session with this id by `state`."""
+        raise NotImplementedError
+
+    async def get(self, session_id: str, fields: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        """The session's `fields` (all if None; missing ones left out), or None if there is no session."""
+        raise NotImplementedError
+
+    async def update(self, session_id: str, patch: Dict[str, Any], only_if_exists: bool = False,
+                     unless_field: Optional[str] = None) -> bool:
+        """Write `patch` atomically unless a condition fails; returns whether it was applied."""
+        raise NotImplementedError
+
+    async def delete(self, session_id: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+# KEYS[1] session key
+# ARGV[1] ttl, ARGV[2] "1" to require an existing session,
+# ARGV[3] field that must be absent ("" for none), ARGV[4..] field/value pairs
+_PATCH_SCRIPT = """
+if ARGV[2] == "1" and redis.call("EXISTS", KEYS[1]) == 0 then
+    return 0
+end
+if ARGV[3] ~= "" and redis.call("HEXISTS", KEYS[1], ARGV[3]) == 1 then
+    return 0
+end
+redis.call("HSET", KEYS[1], unpack(ARGV, 4))
+redis.call("EXPIRE", KEYS[1], ARGV[1])
+return 1
+"""
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Each session is a Redis hash (healthbot:session:<id>) with one field per
+    top-level session key, so a patch only writes the fields it changes and a
+    reader can fetch just the fields it needs. Every access refreshes the TTL
+    in the same round-trip; patches run as a Lua script, so they are atomic
+    and can be made conditional. Shared blobs live under healthbot:blob:<sha1>
+    and are written in the same round-trip as the fields referencing them;
+    a read only needs a second round-trip for blobs this process has not
+    seen yet (MGET) or whose TTL it has not extended lately (EXPIRE).
+    """
+
+    def __init__(self, ttl: int, codec: Optional[SessionCodec] = None):
+        super().__init__(ttl)
+        self.codec = codec or SessionCodec()
+        self._patch_script = None
+
+    @staticmethod
+    def key(session_id: str) -> str:
+        return f"healthbot:session:{session_id}"
+
+    @staticmethod
+    def blob_key(digest: str) -> str:
+        return f"healthbot:blob:{digest}"
+
+    async def _client(self):
+        # session values are binary (compressed / references)
+        return await get_redis(decode_responses=False)
+
+    async def _decode(self, r, session_id: str, raw: Dict[str, Optional[bytes]]) -> Dict[str, Any]:
+        missing = self.codec.missing_blobs(raw)
+        # blobs outlive the sessions reading them (at most one EXPIRE per blob per half TTL)
+        stale = self.codec.blobs_to_refresh(raw)
+        blobs = None
+        if missing or stale:
+            async with r.pipeline(transaction=False) as pipe:
+                if missing:
+                    pipe.mget([self.blob_key(d) for d in missing])
+                for digest in stale:
+                    pipe.expire(self.blob_key(digest), BLOB_TTL_SECONDS)
+                results = await pipe.execute()
+            self.codec.blobs_refreshed(stale)
+            if missing:
+                blobs = dict(zip(missing, results[0]))
+        return self.codec.decode(raw, blobs, session_id)
+
+    async def create(self, session_id: str, state: Dict[str, Any]):
+        r = await self._client()
+        key = self.key(session_id)
+        fields, blobs = self.codec.encode(state)
+        # replace any previous session with the same id atomically
+        async with r.pipeline(transaction=True) as pipe:
+            for digest, data in blobs.items():
+                pipe.set(self.blob_key(digest), data, ex=BLOB_TTL_SECONDS)
+            pipe.delete(key)
+            if fields:
+                pipe.hset(key, mapping=fields)
+                pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def get(self, session_id: str, fields: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        r = await self._client()
+        key = self.key(session_id)
+        if fields is None:
+            async with r.pipeline(transaction=False) as pipe:
+                pipe.hgetall(key)
+                pipe.expire(key, self.ttl)
+                raw, _ = await pipe.execute()
+            if not raw:
+                return None
+            return await self._decode(r, session_id, {k.decode("utf-8"): v for k, v in raw.items()})
+        fields = list(fields)
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.hmget(key, fields)
+            pipe.expire(key, self.ttl)
+            values, exists = await pipe.execute()
+        if not exists:
+            return None
+        return await self._decode(r, session_id, dict(zip(fields, values)))
+
+    async def update(self, session_id: str, patch: Dict[str, Any], only_if_exists: bool = False,
+                     unless_field: Optional[str] = None) -> bool:
+        r = await self._client()
+        if self._patch_script is None:
+            self._patch_script = r.register_script(_PATCH_SCRIPT)
+        fields, blobs = self.codec.encode(patch)
+        args = [self.ttl, "1" if only_if_exists else "0", unless_field or ""]
+        for k, v in fields.items():
+            args.extend((k, v))
+        async with r.pipeline(transaction=False) as pipe:
+            for digest, data in blobs.items():
+                pipe.set(self.blob_key(digest), data, ex=BLOB_TTL_SECONDS)
+            # queues EVALSHA on the pipeline; it must be awaited to be queued
+            await self._patch_script(keys=[self.key(session_id)], args=args, client=pipe)
+            results = await pipe.execute()
+        return bool(results and results[-1])
+
+    async def delete(self, session_id: str):
+        r = await self._client()
+        await r.delete(self.key(session_id))
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions held in this process (least recently used evicted beyond
+    `maxsize`). Values are stored as given, without copying or encoding:
+    callers replace session fields, they never mutate stored values in place.
+    Only for single-worker deployments and tests.
+    """
+
+    def __init__(self, ttl: int, maxsize: int = 10000):
+        super().__init__(ttl)
+        self._sessions = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def _touch(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session = self._sessions.get(session_id, count=False)
+        if session is not None:
+            # sliding expiry, as EXPIRE on every Redis access
+            self._sessions.set(session_id, session, ttl=self.ttl)
+        return session
+
+    async def create(self, session_id: str, state: Dict[str, Any]):
+        if state:
+            self._sessions.set(session_id, dict(state), ttl=self.ttl)
+        else:
+            self._sessions.pop(session_id)
+
+    async def get(self, session_id: str, fields: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        session = self._touch(session_id)
+        if session is None:
+            return None
+        if fields is None:
+            return dict(session)
+        return {k: session[k] for k in fields if k in session}
+
+    async def update(self, session_id: str, patch: Dict[str, Any], only_if_exists: bool = False,
+                     unless_field: Optional[str] = None) -> bool:
+        session = self._touch(session_id)
+        if session is None:
+            if only_if_exists:
+                return False
+            session = {}
+            self._sessions.set(session_id, session, ttl=self.ttl)
+        if unless_field and unless_field in session:
+            return False
+        session.update(patch)
+        return True
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in an SQLite database (WAL journal, synchronous=NORMAL), one row
+    per session field, plus a table of shared blobs. Statements run in worker
+    threads (asyncio.to_thread), each with its own connection, so a busy
+    database never blocks the event loop. Under WAL, readers see a snapshot
+    and are not blocked by a writer, but writers (from every worker on the
+    host) still take turns on the single write lock; waiting for it is
+    bounded by `busy_timeout`.
+
+    Reads only write when the session's expiry has gone stale by more than
+    `touch_seconds` (the sliding TTL is refreshed at that granularity), so
+    most reads never take the write lock. Expired sessions and blobs are
+    ignored on access and purged every `purge_seconds`.
+    """
+
+    def __init__(self, ttl: int, path: str, purge_seconds: float = 60.0, codec: Optional[SessionCodec] = None,
+                 touch_seconds: Optional[float] = None, busy_timeout: float = 5.0):
+        super().__init__(ttl)
+        self.codec = codec or SessionCodec()
+        self.path = path
+        self.purge_seconds = purge_seconds
+        self.touch_seconds = min(60.0, ttl / 10) if touch_seconds is None else touch_seconds
+        self.busy_timeout = busy_timeout
+        self._purged_at = 0.0
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        db = self._conn()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS session_fields (
+                id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+                field TEXT NOT NULL,
+                value BLOB NOT NULL,
+                PRIMARY KEY (id, field)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions(expires_at);
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection (connections are not shared between threads)."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                 timeout=self.busy_timeout)
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            self._local.db = db
+            with self._lock:
+                self._connections.append(db)
+        return db
+
+    def _maybe_purge(self, db: sqlite3.Connection, now: float):
+        if now - self._purged_at >= self.purge_seconds:
+            self._purged_at = now
+            db.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            db.execute("DELETE FROM blobs WHERE expires_at <= ?", (now,))
+
+    def _touch(self, db: sqlite3.Connection, session_id: str, now: float) -> bool:
+        """Extend a live session's expiry, and its blobs'; False if it does not exist (or has expired)."""
+        cur = db.execute("UPDATE sessions SET expires_at = ? WHERE id = ? AND expires_at > ?",
+                         (now + self.ttl, session_id, now))
+        if cur.rowcount == 0:
+            return False
+        # references are b"\x03" + hex digest (see SessionCodec)
+        db.execute(
+            "UPDATE blobs SET expires_at = ? WHERE expires_at > ? AND digest IN ("
+            "SELECT CAST(substr(value, 2) AS TEXT) FROM session_fields"
+            " WHERE id = ? AND substr(value, 1, 1) = X'03')",
+            (now + BLOB_TTL_SECONDS, now, session_id),
+        )
+        return True
+
+    def _write(self, db: sqlite3.Connection, session_id: str, patch: Dict[str, Any], now: float):
+        fields, blobs = self.codec.encode(patch)
+        db.executemany(
+            "INSERT OR REPLACE INTO blobs (digest, value, expires_at) VALUES (?, ?, ?)",
+            [(digest, data, now + BLOB_TTL_SECONDS) for digest, data in blobs.items()],
+        )
+        db.executemany(
+            "INSERT OR REPLACE INTO session_fields (id, field, value) VALUES (?, ?, ?)",
+            [(session_id, k, v) for k, v in fields.items()],
+        )
+
+    def _decode(self, db: sqlite3.Connection, session_id: str, raw: Dict[str, Any], now: float) -> Dict[str, Any]:
+        missing = self.codec.missing_blobs(raw)
+        blobs = {}
+        for digest in missing:
+            row = db.execute("SELECT value FROM blobs WHERE digest = ? AND expires_at > ?",
+                             (digest, now)).fetchone()
+            blobs[digest] = row[0] if row else None
+        return self.codec.decode(raw, blobs, session_id)
+
+    # ---------- blocking implementations (run in a worker thread) ----------
+    def _create(self, session_id: str, state: Dict[str, Any]):
+        db = self._conn()
+        now = time.time()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            if state:
+                db.execute("INSERT INTO sessions (id, expires_at) VALUES (?, ?)", (session_id, now + self.ttl))
+                self._write(db, session_id, state, now)
+            self._maybe_purge(db, now)
+
+    def _get(self, session_id: str, fields: Optional[list]) -> Optional[Dict[str, Any]]:
+        db = self._conn()
+        now = time.time()
+        # a deferred transaction: one consistent snapshot, no write lock
+        with db:
+            db.execute("BEGIN")
+            row = db.execute("SELECT expires_at FROM sessions WHERE id = ? AND expires_at > ?",
+                             (session_id, now)).fetchone()
+            if row is None:
+                return None
+            if fields is None:
+                rows = db.execute("SELECT field, value FROM session_fields WHERE id = ?", (session_id,))
+            else:
+                marks = ",".join("?" * len(fields))
+                rows = db.execute(
+                    f"SELECT field, value FROM session_fields WHERE id = ? AND field IN ({marks})",
+                    (session_id, *fields),
+                )
+            raw = dict(rows.fetchall())
+            data = self._decode(db, session_id, raw, now)
+        if now + self.ttl - row[0] >= self.touch_seconds:
+            with db:
+                self._touch(db, session_id, now)
+        return data
+
+    def _update(self, session_id: str, patch: Dict[str, Any], only_if_exists: bool,
+                unless_field: Optional[str]) -> bool:
+        db = self._conn()
+        now = time.time()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            if not self._touch(db, session_id, now):
+                if only_if_exists:
+                    return False
+                # drop an expired leftover before starting afresh
+                db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                db.execute("INSERT INTO sessions (id, expires_at) VALUES (?, ?)", (session_id, now + self.ttl))
+            elif unless_field and db.execute(
+                    "SELECT 1 FROM session_fields WHERE id = ? AND field = ?",
+                    (session_id, unless_field)).fetchone():
+                return False
+            self._write(db, session_id, patch, now)
+            return True
+
+    def _delete(self, session_id: str):
+        db = self._conn()
+        with db:
+            db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    # ---------- SessionStore ----------
+    async def create(self, session_id: str, state: Dict[str, Any]):
+        await asyncio.to_thread(self._create, session_id, state)
+
+    async def get(self, session_id: str, fields: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, session_id, None if fields is None else list(fields))
+
+    async def update(self, session_id: str, patch: Dict[str, Any], only_if_exists: bool = False,
+                     unless_field: Optional[str] = None) -> bool:
+        return await asyncio.to_thread(self._update, session_id, patch, only_if_exists, unless_field)
+
+    async def delete(self, session_id: str):
+        await asyncio.to_thread(self._delete, session_id)
+
+    async def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for db in connections:
+            db.close()
@@ -1,60 +1,95 @@
 # app/utils/state.py
-import os
-import json
-import asyncio
-from typing import Optional, Dict, Any
-from dotenv import load_dotenv
+"""
+Session storage.
+
+The backend is chosen with SESSION_BACKEND:
+ - "redis"  (default) — shared by all workers; see RedisSessionStore
+ - "memory" — in-process, bounded to SESSION_MEMORY_MAX sessions; for a
+              single worker or tests, needs no external service
+ - "sqlite" — embedded database at SESSION_SQLITE_PATH (WAL mode); persists
+              across restarts without a server
 
-load_dotenv()
+Sessions expire SESSION_TTL_SECONDS after their last access on every backend.
+"""
+import os
+from collections import Counter
+from typing import Optional, Dict, Any, Iterable
 
-# Use redis.asyncio from the official redis package
-import redis.asyncio as aioredis
+from app.utils.redis_client import get_redis  # noqa: F401  (re-exported for older imports)
+from app.utils.session_store import (
+    MemorySessionStore,
+    RedisSessionStore,
+    SessionStore,
+    SQLiteSessionStore,
+)
 
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "redis").lower()
 SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "900"))  # 15 minutes
+SESSION_MEMORY_MAX = int(os.getenv("SESSION_MEMORY_MAX", "10000"))
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "healthbot_sessions.db")
+
+_store: Optional[SessionStore] = None
+
+# round-trips to the session store by kind, for /metrics
+_ops: Counter = Counter()
 
-_redis: Optional[aioredis.Redis] = None
-
-async def get_redis() -> aioredis.Redis:
-    global _redis
-    if _redis is None:
-        # Redis.from_url returns a Redis async client
-        _redis = aioredis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
-        # (optional) test connection
-        try:
-            await _redis.ping()
-        except Exception as e:
-            # If redis isn't ready, you might want to raise or log and continue
-            raise RuntimeError(f"Unable to connect to Redis at {REDIS_URL}: {e}")
-    return _redis
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        if SESSION_BACKEND == "redis":
+            _store = RedisSessionStore(SESSION_TTL_SECONDS)
+        elif SESSION_BACKEND == "memory":
+            _store = MemorySessionStore(SESSION_TTL_SECONDS, maxsize=SESSION_MEMORY_MAX)
+        elif SESSION_BACKEND == "sqlite":
+            _store = SQLiteSessionStore(SESSION_TTL_SECONDS, SESSION_SQLITE_PATH)
+        else:
+            raise RuntimeError(f"Unknown SESSION_BACKEND {SESSION_BACKEND!r} (use redis, memory or sqlite)")
+    return _store
+
+async def close_session_store():
+    global _store
+    if _store is not None:
+        store, _store = _store, None
+        await store.close()
 
 def session_key(session_id: str) -> str:
-    return f"healthbot:session:{session_id}"
+    return RedisSessionStore.key(session_id)
 
 async def create_session(session_id: str, initial_state: Optional[Dict[str, Any]] = None):
-    r = await get_redis()
-    key = session_key(session_id)
     state = initial_state or {}
-    await r.set(key, json.dumps(state), ex=SESSION_TTL_SECONDS)
+    await get_session_store().create(session_id, state)
+    _ops["write"] += 1
     return state
 
 async def get_session(session_id: str) -> Optional[Dict[str, Any]]:
-    r = await get_redis()
-    raw = await r.get(session_key(session_id))
-    if not raw:
-        return None
-    try:
-        return json.loads(raw)
-    except Exception:
-        return None
-
-async def update_session(session_id: str, patch: Dict[str, Any]):
-    r = await get_redis()
-    state = await get_session(session_id) or {}
-    state.update(patch)
-    await r.set(session_key(session_id), json.dumps(state), ex=SESSION_TTL_SECONDS)
+    state = await get_session_store().get(session_id)
+    _ops["read"] += 1
+    return state
+
+async def get_session_fields(session_id: str, fields: Iterable[str]) -> Optional[Dict[str, Any]]:
+    """Fetch only `fields` (missing ones are left out); None if the session does not exist."""
+    state = await get_session_store().get(session_id, fields)
+    _ops["read"] += 1
     return state
 
+async def update_session(session_id: str, patch: Dict[str, Any], only_if_exists: bool = False,
+                         unless_field: Optional[str] = None) -> bool:
+    """
+    Write the fields in `patch` and refresh the TTL, atomically and in one
+    round-trip. With only_if_exists the patch is skipped for a missing
+    (e.g. cleared) session; with unless_field it is skipped when that field
+    is already set. Returns whether the patch was applied.
+    """
+    if not patch:
+        return False
+    applied = await get_session_store().update(session_id, patch, only_if_exists=only_if_exists,
+                                               unless_field=unless_field)
+    _ops["write"] += 1
+    return applied
+
 async def clear_session(session_id: str):
-    r = await get_redis()
-    await r.delete(session_key(session_id))
+    await get_session_store().delete(session_id)
+    _ops["delete"] += 1
+
+def session_ops() -> Dict[str, int]:
+    return {k: _ops[k] for k in ("read", "write", "delete")}
@@ -0,0 +1,66 @@
+"""
+Session-store round-trips per endpoint.
+
+Drives the workflow helpers (the same calls the routes make) offline: fake
+LLM, Tavily mock and the in-memory session store. For each step it prints
+the reads, writes and deletes counted by app.utils.state.session_ops. The
+background quiz pre-generation is counted separately.
+
+Run from the project root (needs the app's dependencies, e.g. langgraph):
+
+    python scripts/bench_session_roundtrips.py
+"""
+import asyncio
+import os
+import sys
+
+for key, value in (("LLM_PROVIDER", "fake"), ("TAVILY_MOCK", "true"),
+                   ("SESSION_BACKEND", "memory"), ("REDIS_URL", "")):
+    os.environ.setdefault(key, value)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import workflow  # noqa: E402
+from app.utils.state import session_ops  # noqa: E402
+
+
+class Ops:
+    def __init__(self):
+        self.last = session_ops()
+
+    def report(self, label: str):
+        now = session_ops()
+        diff = {k: now[k] - self.last[k] for k in now}
+        self.last = now
+        print(f"{label:28} {sum(diff.values()):3}   " + "  ".join(f"{k}={v}" for k, v in diff.items()))
+
+
+async def _pregeneration(session_id: str):
+    task = workflow._quiz_tasks.get(session_id)
+    if task is not None:
+        await asyncio.wait({task})
+
+
+async def main():
+    ops = Ops()
+    print(f"{'step':28} {'ops':>3}")
+    await workflow.start_topic_flow("Asthma", "bench-1")
+    ops.report("/start")
+    await _pregeneration("bench-1")
+    ops.report("  background pre-generation")
+    await workflow.request_quiz("bench-1")
+    ops.report("/quiz (prefetched)")
+    quiz = await workflow.request_quiz("bench-1")
+    ops.report("/quiz (generated)")
+    await workflow.submit_answer("bench-1", quiz["quiz"].get("hint") or "answer")
+    ops.report("/answer")
+    async for _ in workflow.start_topic_flow_stream("Asthma", "bench-2"):
+        pass
+    # the cached quiz bank makes pre-generation finish during the stream
+    await _pregeneration("bench-2")
+    ops.report("/start/stream + pre-generation")
+    await workflow.reset_session("bench-2")
+    ops.report("/reset")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+Encoded session size: plain JSON fields vs SessionCodec.
+
+Builds synthetic sessions spread over --topics topics. Each one has 4 Tavily
+results of about 150 words, a 200-word summary, a quiz, seen ids and an
+evaluation. The script reports bytes per session (field names plus values)
+as plain JSON and as encoded by SessionCodec. It counts the shared
+per-topic blobs once, and also reports compression alone, without blobs.
+
+Run from the project root:
+
+    python scripts/bench_session_size.py --sessions 10000 --topics 500
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.session_codec import SessionCodec  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _vocabulary():
+    words = []
+    for name in ("README.md", "DESIGN.md"):
+        try:
+            with open(os.path.join(ROOT, name), encoding="utf-8") as fh:
+                words.extend(w for w in fh.read().split() if w.isalpha())
+        except OSError:
+            pass
+    return words or ["health", "symptom", "treatment", "patient", "clinician"]
+
+
+def make_session(topic_id: int, session_id: str, words) -> dict:
+    # everything except the ids depends only on the topic, as real sessions share it
+    r = random.Random(topic_id)
+    results = "\n\n---\n\n".join(
+        f"Title {i} — https://example.org/{topic_id}/{i}\n" + " ".join(r.choice(words) for _ in range(150))
+        for i in range(4)
+    )
+    return {
+        "session_id": session_id,
+        "topic": f"topic {topic_id}",
+        "search_results": results,
+        "summary": " ".join(r.choice(words) for _ in range(200)),
+        "quiz": {
+            "public": {"question": "What is the most common symptom of this condition in adults?",
+                       "options": ["A) Fever", "B) Cough", "C) Rash", "D) Fatigue"],
+                       "hint": "Think about the airways."},
+            "_canonical": "B) Cough", "prefetched": False, "id": "a1b2c3d4e5f6",
+        },
+        "quiz_seen": ["a1b2c3d4e5f6", "0f1e2d3c4b5a"],
+        "last_eval": {"score": 1.0, "verdict": "correct",
+                      "explanation": "Your answer matches the expected answer.",
+                      "citations": [" ".join(r.choice(words) for _ in range(40)) for _ in range(2)],
+                      "graded_by": "exact"},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--topics", type=int, default=500)
+    args = parser.parse_args()
+
+    words = _vocabulary()
+    codec = SessionCodec()
+    plain = encoded = 0
+    blobs = {}
+    for i in range(args.sessions):
+        session = make_session(i % args.topics, f"{i:08x}-0000-0000-0000-000000000000", words)
+        plain += sum(len(k) + len(json.dumps(v).encode("utf-8")) for k, v in session.items())
+        fields, new_blobs = codec.encode(session)
+        encoded += sum(len(k) + len(v) for k, v in fields.items())
+        blobs.update(new_blobs)
+    blob_bytes = sum(len(v) for v in blobs.values())
+
+    fields, _ = SessionCodec(blob_fields=()).encode(make_session(1, "x", words))
+    n = args.sessions
+    print(f"plain JSON         {plain / n / 1000:.1f} KB/session, {plain / 1e6:.1f} MB total")
+    print(f"encoded            {encoded / n / 1000:.1f} KB/session + {blob_bytes / 1e6:.2f} MB of "
+          f"{len(blobs)} blobs = {(encoded + blob_bytes) / 1e6:.1f} MB total")
+    print(f"compression only   {sum(len(k) + len(v) for k, v in fields.items()) / 1000:.1f} KB/session")
+
+
+if __name__ == "__main__":
+    main()
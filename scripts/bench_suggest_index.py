@@ -0,0 +1,68 @@
+"""
+Build time, memory and query latency of the suggest index at scale.
+
+Pads the real topic dictionary with synthetic multi-word terms up to --terms,
+builds a SuggestIndex, and reports build time, the RSS it added, the size of
+the fuzzy deletion dictionary, and the mean latency of typo'd queries.
+
+Run from the project root:
+
+    python scripts/bench_suggest_index.py --terms 50000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.suggest_index import SuggestIndex  # noqa: E402
+from app.services.topic_store import load_medical_topics  # noqa: E402
+
+
+def _rss_mb() -> float:
+    # Linux only; 0 elsewhere
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        return 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--terms", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 11)))
+             for _ in range(max(1, args.terms // 2))]
+    terms = load_medical_topics()
+    while len(terms) < args.terms:
+        terms.append(" ".join(rng.sample(words, rng.randint(1, 3))))
+
+    before = _rss_mb()
+    start = time.perf_counter()
+    index = SuggestIndex(terms)
+    build_s = time.perf_counter() - start
+    print(f"terms            {len(index)}")
+    print(f"build            {build_s:.2f} s")
+    print(f"added RSS        {_rss_mb() - before:.0f} MB")
+    print(f"deletion keys    {len(index._deletes)}")
+
+    queries = []
+    for w in rng.sample(words, min(args.queries, len(words))):
+        i = rng.randrange(len(w))
+        queries.append(w[:i] + w[i + 1:])
+    start = time.perf_counter()
+    for q in queries:
+        index.search(q, 10)
+    print(f"typo'd search    {(time.perf_counter() - start) / len(queries) * 1e6:.0f} us/query")
+
+
+if __name__ == "__main__":
+    main()
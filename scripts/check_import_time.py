@@ -0,0 +1,85 @@
+"""
+Startup import profile and regression check.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter (best
+of --runs) and prints the slowest imports. Fails (exit 1) when:
+ - a module that should load on first use is imported at startup
+   (LangGraph, langchain, the OpenAI SDK, httpx, redis, tiktoken), or
+ - importing the app takes longer than --budget-ms (IMPORT_BUDGET_MS).
+
+Run from the project root:
+
+    python scripts/check_import_time.py
+    python scripts/check_import_time.py --top 30
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFERRED = ("langgraph", "langchain", "langchain_core", "langchain_openai", "openai", "httpx", "redis", "tiktoken")
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile(module: str) -> List[Tuple[str, int, int, int]]:
+    """(name, self_us, cumulative_us, depth) for every import, in import order."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-2000:])
+        raise SystemExit(f"importing {module} failed")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--allow", action="append", default=[], help="deferred package allowed at import")
+    args = parser.parse_args()
+
+    # the fastest run is the least disturbed by disk cache and other processes
+    runs = [profile(args.module) for _ in range(max(1, args.runs))]
+    rows = min(runs, key=lambda r: next((c for name, _, c, _ in r if name == args.module), 0))
+    total_ms = next((c for name, _, c, _ in rows if name == args.module), 0) / 1000
+
+    print(f"import {args.module}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)\n")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cum_us, _ in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{cum_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
+
+    packages: Dict[str, int] = {}
+    for name, _, cum_us, _ in rows:
+        top = name.split(".")[0]
+        if top in DEFERRED and top not in args.allow:
+            packages[top] = max(packages.get(top, 0), cum_us)
+
+    failed = False
+    if packages:
+        failed = True
+        print("\nimported at startup, should load on first use:")
+        for top, cum_us in sorted(packages.items(), key=lambda kv: -kv[1]):
+            print(f"  {top} ({cum_us / 1000:.0f} ms)")
+    if total_ms > args.budget_ms:
+        failed = True
+        print(f"\nimport time {total_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+# tests/conftest.py
+"""
+Tests run offline: the fake chat model (app/services/fake_llm.py), the
+built-in Tavily mock and in-process session/cache backends. Settings are
+read at import time, so they are set here before any app module loads.
+"""
+import os
+import sys
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("TAVILY_MOCK", "true")
+os.environ.setdefault("SESSION_BACKEND", "memory")
+os.environ.setdefault("REDIS_URL", "")
+os.environ.setdefault("LLM_BATCH_WINDOW_MS", "5")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,60 @@
+# tests/test_context.py
+import sys
+
+from app.core import context
+from app.core.context import PIECE_SEPARATOR, count_tokens, pack_context
+
+LONG = " ".join(f"word{i}" for i in range(400)) + "."
+
+
+def test_keeps_relevant_sentences_in_order():
+    text = "Asthma narrows the airways. Cats are popular pets. Inhalers relieve asthma symptoms."
+    budget = count_tokens("Asthma narrows the airways. Inhalers relieve asthma symptoms.") + 2
+    packed = pack_context(text, budget=budget, query="asthma inhalers")
+    assert packed == "Asthma narrows the airways. Inhalers relieve asthma symptoms."
+
+
+def test_drops_duplicates_and_boilerplate():
+    text = ("Asthma narrows the airways in the lungs. Asthma narrows the airways in the lungs! "
+            "Subscribe to our newsletter.")
+    packed = pack_context(text, budget=500)
+    assert packed == "Asthma narrows the airways in the lungs."
+
+
+def test_oversize_sentence_is_cut_to_fit():
+    packed = pack_context(LONG, budget=100)
+    assert packed and LONG.startswith(packed)
+    assert count_tokens(packed) <= 100
+
+
+def test_search_results_keep_their_headers():
+    text = PIECE_SEPARATOR.join([
+        "Asthma — https://example.org/a\nAsthma narrows the airways.",
+        "Flu — https://example.org/f\n" + LONG,
+    ])
+    packed = pack_context(text, budget=120, query="asthma")
+    assert packed.startswith("Asthma — https://example.org/a\nAsthma narrows the airways.")
+    assert "Flu — https://example.org/f\nword0 word1" in packed
+
+
+def test_never_empty_for_non_empty_input():
+    assert pack_context("Click here to subscribe to our newsletter.", budget=50)
+    assert pack_context(LONG, budget=3)
+    assert pack_context("", budget=50) == ""
+
+
+def test_tokenizer_failure_falls_back_to_estimate(monkeypatch):
+    class Broken:
+        def encoding_for_model(self, model):
+            raise OSError("no network")
+
+        def get_encoding(self, name):
+            raise OSError("no network")
+
+    context._encoding.cache_clear()
+    monkeypatch.setitem(sys.modules, "tiktoken", Broken())
+    try:
+        assert context._encoding() is None
+        assert count_tokens("four words right here") > 0
+    finally:
+        context._encoding.cache_clear()
@@ -0,0 +1,91 @@
+# tests/test_grader.py
+import asyncio
+
+import pytest
+
+from app.services import grader
+
+SUMMARY = (
+    "Hypoglycemia means low blood sugar. It can cause shaking, sweating and confusion. "
+    "Eating fast-acting sugar usually helps within minutes. Flu is contagious and spreads through droplets."
+)
+
+
+def grade(canonical, answer, options=None):
+    return asyncio.run(grader.grade_answer(SUMMARY, canonical, answer, options=options))
+
+
+@pytest.fixture
+def llm_grades(monkeypatch):
+    """Replace the LLM tier; records the answers it was asked to grade."""
+    calls = []
+
+    async def evaluate(summary, canonical, answer):
+        calls.append(answer)
+        return {"score": 0.9, "verdict": "correct", "explanation": "ok", "citations": []}
+
+    monkeypatch.setattr(grader, "evaluate_answer", evaluate)
+    return calls
+
+
+def test_mcq_exact(llm_grades):
+    options = ["Low blood sugar", "High blood pressure", "A rash", "A fever"]
+    assert grade("Low blood sugar", "a", options)["verdict"] == "correct"
+    wrong = grade("Low blood sugar", "B) High blood pressure", options)
+    assert wrong["verdict"] == "incorrect" and wrong["graded_by"] == "exact"
+    assert llm_grades == []
+
+
+def test_short_answer_exact_ignores_case_and_articles(llm_grades):
+    result = grade("Low blood sugar", "the LOW blood sugar!")
+    assert result["graded_by"] == "exact" and result["verdict"] == "correct"
+
+
+def test_lexical_accepts_close_answer(llm_grades):
+    result = grade("Eating fast-acting sugar", "eating fast acting sugar")
+    assert result["verdict"] == "correct" and result["graded_by"] in ("exact", "lexical")
+    assert llm_grades == []
+
+
+def test_paraphrase_is_not_rejected_locally(llm_grades):
+    result = grade("Low blood sugar", "hypoglycemia")
+    assert llm_grades == ["hypoglycemia"]
+    assert result["verdict"] == "correct" and result["graded_by"] == "llm"
+
+
+def test_negation_flip_is_rejected_locally(llm_grades):
+    result = grade("Flu is contagious", "flu is not contagious")
+    assert result["verdict"] == "incorrect" and result["graded_by"] == "lexical"
+    assert llm_grades == []
+
+
+def test_fallback_when_llm_unavailable(monkeypatch):
+    async def down(*args):
+        raise RuntimeError("circuit open")
+
+    monkeypatch.setattr(grader, "evaluate_answer", down)
+    result = grade("Low blood sugar", "a drop in glucose")
+    assert (result["graded_by"], result["verdict"]) == ("fallback", "partial")
+    assert "grading is unavailable" in result["explanation"] and "Low blood sugar" in result["explanation"]
+    assert grade("Low blood sugar", "a broken bone")["verdict"] == "partial"
+
+
+@pytest.mark.parametrize("canonical, answer", [
+    ("High blood pressure", "Low blood pressure"),   # opposite, lexically close
+    ("Increases the risk of stroke", "Decreases the risk of stroke"),
+])
+def test_fallback_never_grades_an_answer_correct(monkeypatch, canonical, answer):
+    async def down(*args):
+        raise RuntimeError("circuit open")
+
+    monkeypatch.setattr(grader, "evaluate_answer", down)
+    assert grader.similarity(answer, canonical) >= 0.5
+    result = grade(canonical, answer)
+    assert result["graded_by"] == "fallback" and result["verdict"] == "partial"
+
+
+def test_llm_tier_with_fake_model():
+    pytest.importorskip("langchain_core")
+    result = grade("Shaking, sweating and confusion", "sweating")
+    assert result["graded_by"] == "llm"
+    assert 0.0 <= result["score"] <= 1.0 and result["verdict"] in ("correct", "partial", "incorrect")
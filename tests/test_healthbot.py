@@ -0,0 +1,129 @@
+# tests/test_healthbot.py
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")  # TestClient
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes import healthbot
+from app.services import topic_cache
+from app.services.popularity import PopularityCounter
+from app.services.suggest_cache import SuggestCache
+from app.services.suggest_index import SuggestIndex
+
+TOPICS = ["Asthma", "Diabetes", "Diabetes Insipidus", "Flu", "Hypertension"]
+
+
+@pytest.fixture
+def client():
+    # one event loop for all requests, so background quiz tasks can finish
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def suggest(monkeypatch):
+    index, cache = SuggestIndex(TOPICS), SuggestCache()
+    monkeypatch.setattr(healthbot, "get_suggest_index", lambda: index)
+    monkeypatch.setattr(healthbot, "get_suggest_cache", lambda: cache)
+    monkeypatch.setattr(healthbot, "get_popularity", lambda: PopularityCounter(flush_seconds=3600))
+    return index, cache
+
+
+def test_suggest_is_served_from_cache(client, suggest):
+    _, cache = suggest
+    first = client.get("/healthbot/suggest", params={"q": "diab"})
+    assert first.status_code == 200
+    assert first.json() == {"suggestions": ["Diabetes", "Diabetes Insipidus"]}
+    assert first.headers["cache-control"].startswith("public, max-age=")
+
+    again = client.get("/healthbot/suggest", params={"q": "  DIAB "})
+    assert again.json() == first.json()
+    assert again.headers["etag"] == first.headers["etag"]
+    assert cache.stats()["results"]["hits"] == 1
+
+
+def test_suggest_if_none_match_returns_304(client, suggest):
+    etag = client.get("/healthbot/suggest", params={"q": "flu"}).headers["etag"]
+    resp = client.get("/healthbot/suggest", params={"q": "flu"}, headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+    assert resp.headers["etag"] == etag
+
+    stale = client.get("/healthbot/suggest", params={"q": "flu"}, headers={"If-None-Match": 'W/"stale"'})
+    assert stale.status_code == 200 and stale.json() == {"suggestions": ["Flu"]}
+
+
+def test_suggest_etag_changes_after_index_refresh(client, suggest):
+    index, _ = suggest
+    before = client.get("/healthbot/suggest", params={"q": "diab"})
+    index.sync(TOPICS + ["Diabetic Retinopathy"])
+    after = client.get("/healthbot/suggest", params={"q": "diab"}, headers={"If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert "Diabetic Retinopathy" in after.json()["suggestions"]
+    assert after.headers["etag"] != before.headers["etag"]
+
+
+# ---------- /start/stream ----------
+def sse(resp):
+    events = []
+    for block in resp.text.strip().split("\n\n"):
+        name, data = (line.split(": ", 1)[1] for line in block.split("\n"))
+        events.append((name, json.loads(data)))
+    return events
+
+
+@pytest.fixture
+def fresh_topics(monkeypatch):
+    """An empty topic cache, so the summary is streamed rather than served whole."""
+    pytest.importorskip("langgraph")
+    monkeypatch.setattr(topic_cache, "_local", topic_cache.TTLCache(maxsize=16, ttl=60))
+
+
+def test_start_stream_sends_tokens_then_done(client, fresh_topics):
+    resp = client.post("/healthbot/start/stream", json={"topic": "Gout", "session_id": "sse-1"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = sse(resp)
+    names = [name for name, _ in events]
+    assert names[:2] == ["session", "search_done"] and names[-1] == "done"
+    tokens = [data["text"] for name, data in events if name == "token"]
+    assert len(tokens) > 1
+    done = events[-1][1]
+    assert done["session_id"] == "sse-1" and done["topic"] == "Gout"
+    assert done["summary"] == "".join(tokens).strip()
+    assert client.post("/healthbot/reset", params={"session_id": "sse-1"}).status_code == 200
+
+
+def test_start_stream_reports_failures_in_band(client, fresh_topics, monkeypatch):
+    from app.core import workflow
+
+    async def broken(text, topic=""):
+        raise RuntimeError("LLM summarization failed: 503")
+        yield
+
+    monkeypatch.setattr(workflow, "stream_summary_for_patient", broken)
+    events = sse(client.post("/healthbot/start/stream", json={"topic": "Psoriasis", "session_id": "sse-2"}))
+    assert events[-1] == ("error", {"detail": "LLM summarization failed: 503"})
+    assert "done" not in [name for name, _ in events]
+
+
+def test_stalled_summary_stream_times_out(client, fresh_topics, monkeypatch):
+    from app.core import workflow
+
+    async def stalls(text, topic=""):
+        yield "Tinnitus is "
+        await asyncio.sleep(5)
+        yield "never sent."
+
+    monkeypatch.setattr(workflow, "stream_summary_for_patient", stalls)
+    monkeypatch.setattr(workflow, "SUMMARY_STREAM_TIMEOUT_SECONDS", 0.2)
+    events = sse(client.post("/healthbot/start/stream", json={"topic": "Tinnitus", "session_id": "sse-3"}))
+    assert ("token", {"text": "Tinnitus is "}) in events
+    name, data = events[-1]
+    assert name == "error" and "summary stream took longer than 0.2s" in data["detail"]
@@ -0,0 +1,217 @@
+# tests/test_llm_cache.py
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import llm_cache
+from app.services.llm_cache import _normalized, cached_completion, llm_cache_key, minhash
+from app.utils import redis_client
+from app.utils.cache import TTLCache
+from app.utils.singleflight import SingleFlight
+
+MODEL = SimpleNamespace(model_name="gpt-test", temperature=0)
+INSTRUCTIONS = ("Summarize the search results below for a patient in plain language. "
+                "Use short sentences, explain medical terms, do not give a diagnosis and "
+                "suggest seeing a doctor for personal advice.")
+RESULTS = {
+    "Hypertension": "Hypertension means the force of blood against artery walls stays too high. "
+                    "It rarely causes symptoms but raises the risk of stroke, heart attack and "
+                    "kidney disease. Less salt, regular exercise and medicines such as ACE "
+                    "inhibitors lower it. Home monitoring helps track readings over time.",
+    "Hypotension": "Hypotension means blood pressure low enough to cause dizziness or fainting "
+                   "on standing. Dehydration, bleeding, some heart conditions and certain "
+                   "medicines can bring it on. Drinking more fluids, rising slowly and adjusting "
+                   "medication usually help; severe cases need urgent care.",
+}
+
+
+def msg(type_, content):
+    return SimpleNamespace(type=type_, content=content)
+
+
+def prompt(text):
+    return [msg("system", INSTRUCTIONS), msg("human", text)]
+
+
+class Compute:
+    def __init__(self, reply="reply"):
+        self.reply = reply
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return f"{self.reply} {self.calls}"
+
+
+@pytest.fixture(autouse=True)
+def fresh(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_local", TTLCache(maxsize=64, ttl=600))
+    monkeypatch.setattr(llm_cache, "_flights", SingleFlight())
+    monkeypatch.setattr(llm_cache, "_stats", Counter())
+    monkeypatch.setattr(llm_cache, "_near", {})
+    monkeypatch.setattr(llm_cache, "NEAR_KINDS", {"summary"})
+
+
+def ask(*calls):
+    """Run cached_completion calls one after another; (messages, kind, compute[, cache_if]) each."""
+    async def go():
+        return [await cached_completion(MODEL, *call) for call in calls]
+    return asyncio.run(go())
+
+
+# ---------- exact tier ----------
+def test_identical_prompt_is_served_from_cache():
+    compute = Compute()
+    spaced = prompt("  Asthma   narrows the\nairways. ")
+    assert ask((prompt("Asthma narrows the airways."), "grade", compute),
+               (prompt("Asthma narrows the airways."), "grade", compute),
+               (spaced, "grade", compute)) == ["reply 1"] * 3
+    assert compute.calls == 1
+    stats = llm_cache.llm_cache_stats()
+    assert stats["by_kind"]["grade"] == {"hits": 2, "misses": 1, "bypassed": 0}
+    assert stats["by_tier"]["local"] == 2
+
+
+def test_key_depends_on_model_and_role():
+    messages = prompt("Asthma narrows the airways.")
+    assert llm_cache_key(MODEL, messages) != llm_cache_key(SimpleNamespace(model_name="gpt-test", temperature=0.7),
+                                                           messages)
+    assert llm_cache_key(MODEL, messages) != llm_cache_key(MODEL, [msg("human", INSTRUCTIONS), messages[1]])
+
+
+def test_concurrent_identical_prompts_share_one_call():
+    compute = Compute()
+
+    async def go():
+        return await asyncio.gather(*(cached_completion(MODEL, prompt("Flu"), "grade", compute) for _ in range(4)))
+
+    assert asyncio.run(go()) == ["reply 1"] * 4
+    assert compute.calls == 1
+
+
+def test_redis_tier_is_shared_between_workers(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    r = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setitem(redis_client._clients, True, r)
+    compute = Compute()
+    messages = prompt("Gout is a form of arthritis.")
+
+    async def go():
+        first = await cached_completion(MODEL, messages, "grade", compute)
+        llm_cache._local.clear()  # another worker: nothing in its local tier
+        second = await cached_completion(MODEL, messages, "grade", compute)
+        return first, second, await r.ttl(llm_cache_key(MODEL, messages))
+
+    first, second, ttl = asyncio.run(go())
+    assert first == second == "reply 1" and compute.calls == 1
+    assert 0 < ttl <= llm_cache.cache_ttl("grade")
+    assert llm_cache.llm_cache_stats()["by_tier"]["redis"] == 1
+
+
+# ---------- cache_if ----------
+def test_reply_rejected_by_cache_if_is_returned_but_not_stored():
+    compute = Compute("not json")
+    messages = prompt("Grade this answer.")
+
+    def parseable(text):
+        return text != "not json 1"
+
+    assert ask((messages, "grade", compute, parseable),
+               (messages, "grade", compute, parseable),
+               (messages, "grade", compute, parseable)) == ["not json 1", "not json 2", "not json 2"]
+    assert compute.calls == 2
+
+
+def test_empty_reply_is_not_stored():
+    calls = []
+
+    async def empty():
+        calls.append(1)
+        return ""
+
+    assert ask((prompt("Flu"), "grade", empty), (prompt("Flu"), "grade", empty)) == ["", ""]
+    assert len(calls) == 2
+
+
+# ---------- TTL 0 ----------
+def test_kinds_with_ttl_zero_bypass_the_cache(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_TTL_GRADE", "0")
+    quiz, grade = Compute("quiz"), Compute("grade")
+    replies = ask((prompt("Asthma"), "quiz", quiz), (prompt("Asthma"), "quiz", quiz),
+                  (prompt("Asthma"), "grade", grade), (prompt("Asthma"), "grade", grade))
+    assert replies == ["quiz 1", "quiz 2", "grade 1", "grade 2"]
+    assert len(llm_cache._local) == 0
+    stats = llm_cache.llm_cache_stats()["by_kind"]
+    assert stats["quiz"]["bypassed"] == 2 and stats["grade"]["bypassed"] == 2
+
+
+# ---------- near-duplicate tier ----------
+def similarity(a, b):
+    sa, sb = minhash(_normalized(prompt(a))), minhash(_normalized(prompt(b)))
+    return sum(x == y for x, y in zip(sa, sb)) / len(sa)
+
+
+TYPO = RESULTS["Hypertension"].replace("over time.", "over the time.")
+
+
+def test_near_duplicate_prompt_reuses_the_reply():
+    compute = Compute()
+    replies = ask((prompt(RESULTS["Hypertension"]), "summary", compute), (prompt(TYPO), "summary", compute))
+    assert replies == ["reply 1", "reply 1"] and compute.calls == 1
+    assert llm_cache.llm_cache_stats()["by_tier"]["near"] == 1
+
+
+def test_near_duplicate_threshold_is_inclusive(monkeypatch):
+    sim = similarity(RESULTS["Hypertension"], TYPO)
+    assert 0.9 <= sim < 1
+
+    monkeypatch.setattr(llm_cache, "NEAR_THRESHOLD", sim + 1 / 32)
+    compute = Compute()
+    assert ask((prompt(RESULTS["Hypertension"]), "summary", compute),
+               (prompt(TYPO), "summary", compute)) == ["reply 1", "reply 2"]
+
+    monkeypatch.setattr(llm_cache, "_local", TTLCache(maxsize=64, ttl=600))
+    monkeypatch.setattr(llm_cache, "_near", {})
+    monkeypatch.setattr(llm_cache, "NEAR_THRESHOLD", sim)
+    compute = Compute()
+    assert ask((prompt(RESULTS["Hypertension"]), "summary", compute),
+               (prompt(TYPO), "summary", compute)) == ["reply 1", "reply 1"]
+
+
+def test_prompts_sharing_a_template_are_not_near_duplicates():
+    # the false positive that matters: another topic's answer served for this one
+    assert similarity(RESULTS["Hypertension"], RESULTS["Hypotension"]) < 0.5
+    compute = Compute()
+    replies = ask((prompt(RESULTS["Hypertension"]), "summary", compute),
+                  (prompt(RESULTS["Hypotension"]), "summary", compute))
+    assert replies == ["reply 1", "reply 2"]
+    assert llm_cache.llm_cache_stats()["by_tier"]["near"] == 0
+
+
+def test_one_changed_fact_in_a_short_prompt_is_not_a_near_duplicate():
+    high = "Question: what does hypertension mean? Answer: high blood pressure."
+    low = "Question: what does hypertension mean? Answer: low blood pressure."
+    assert similarity(high, low) < llm_cache.NEAR_THRESHOLD  # 0.875 vs the default 0.9: little margin
+    compute = Compute()
+    assert ask((prompt(high), "summary", compute), (prompt(low), "summary", compute)) == ["reply 1", "reply 2"]
+
+
+def test_near_tier_only_serves_the_configured_kinds():
+    compute = Compute()
+    replies = ask((prompt(RESULTS["Hypertension"]), "grade", compute), (prompt(TYPO), "grade", compute))
+    assert replies == ["reply 1", "reply 2"]
+    assert "grade" not in llm_cache._near
+
+
+def test_near_match_whose_reply_expired_is_a_miss():
+    compute = Compute()
+
+    async def go():
+        first = await cached_completion(MODEL, prompt(RESULTS["Hypertension"]), "summary", compute)
+        llm_cache._local.clear()  # the reply expired; its signature is still indexed
+        return first, await cached_completion(MODEL, prompt(TYPO), "summary", compute)
+
+    assert asyncio.run(go()) == ("reply 1", "reply 2")
@@ -0,0 +1,146 @@
+# tests/test_llm_dispatcher.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.llm_dispatcher import LLMDispatcher, TokenBucket
+from app.utils.resilience import CircuitBreaker, CircuitOpenError
+
+
+class Model:
+    """Echoes each prompt back; records the batches it was called with."""
+
+    def __init__(self, fail=None, drop=0):
+        self.batches = []
+        self.fail = fail
+        self.drop = drop
+
+    async def agenerate(self, prompts):
+        self.batches.append(prompts)
+        await asyncio.sleep(0)
+        if self.fail is not None:
+            raise self.fail
+        gens = [[SimpleNamespace(text=f"echo {p[0]}")] for p in prompts]
+        return SimpleNamespace(generations=gens[:len(gens) - self.drop])
+
+
+def generate_all(dispatcher, prompts):
+    async def go():
+        return await asyncio.gather(*(dispatcher.generate([p]) for p in prompts), return_exceptions=True)
+    return asyncio.run(go())
+
+
+def test_concurrent_prompts_share_one_batch():
+    model = Model()
+    dispatcher = LLMDispatcher(model, window_ms=5, max_batch=8)
+    assert generate_all(dispatcher, ["a", "b", "c"]) == ["echo a", "echo b", "echo c"]
+    assert len(model.batches) == 1
+    assert dispatcher.stats()["largest_batch"] == 3
+
+
+def test_full_batch_flushes_without_waiting():
+    model = Model()
+    dispatcher = LLMDispatcher(model, window_ms=10_000, max_batch=2)
+    assert generate_all(dispatcher, ["a", "b", "c", "d"]) == ["echo a", "echo b", "echo c", "echo d"]
+    assert [len(b) for b in model.batches] == [2, 2]
+
+
+def test_failed_batch_fails_every_caller():
+    dispatcher = LLMDispatcher(Model(fail=ValueError("503")), window_ms=5)
+    results = generate_all(dispatcher, ["a", "b"])
+    assert all(isinstance(r, ValueError) for r in results)
+    assert dispatcher.stats()["failed_batches"] == 1
+
+
+class Unavailable(Exception):
+    status_code = 503
+
+
+def test_breaker_counts_one_failure_per_batch():
+    breaker = CircuitBreaker("test", failures=2)
+    dispatcher = LLMDispatcher(Model(fail=Unavailable()), window_ms=5, breaker=breaker)
+    results = generate_all(dispatcher, list("abcdef"))
+    assert all(isinstance(r, Unavailable) for r in results)
+    assert breaker.stats()["failures"] == 1 and breaker.state == "closed"
+
+
+def test_breaker_counts_one_success_per_batch():
+    breaker = CircuitBreaker("test")
+    dispatcher = LLMDispatcher(Model(), window_ms=5, breaker=breaker)
+    generate_all(dispatcher, list("abc"))
+    assert breaker.stats()["successes"] == 1
+
+
+def test_open_breaker_fails_batch_without_calling_the_model():
+    breaker = CircuitBreaker("test", failures=1)
+    breaker.record_failure()
+    model = Model()
+    dispatcher = LLMDispatcher(model, window_ms=5, breaker=breaker)
+    assert all(isinstance(r, CircuitOpenError) for r in generate_all(dispatcher, ["a", "b"]))
+    assert model.batches == [] and dispatcher.stats()["failed_batches"] == 0
+
+
+def test_slow_provider_call_times_out_once():
+    class Slow(Model):
+        async def agenerate(self, prompts):
+            await asyncio.sleep(1)
+
+    breaker = CircuitBreaker("test")
+    dispatcher = LLMDispatcher(Slow(), window_ms=5, breaker=breaker, timeout=0.05)
+    assert all(isinstance(r, asyncio.TimeoutError) for r in generate_all(dispatcher, ["a", "b"]))
+    assert breaker.stats()["failures"] == 1
+
+
+def test_missing_generations_do_not_hang():
+    dispatcher = LLMDispatcher(Model(drop=1), window_ms=5)
+
+    async def go():
+        gathered = asyncio.gather(*(dispatcher.generate([p]) for p in "abc"), return_exceptions=True)
+        return await asyncio.wait_for(gathered, 1)
+
+    results = asyncio.run(go())
+    assert results[:2] == ["echo a", "echo b"]
+    assert isinstance(results[2], RuntimeError)
+
+
+def test_cancelled_caller_is_not_sent():
+    model = Model()
+    dispatcher = LLMDispatcher(model, window_ms=20)
+
+    async def go():
+        gone = asyncio.ensure_future(dispatcher.generate(["gone"]))
+        await asyncio.sleep(0)
+        gone.cancel()
+        return await dispatcher.generate(["kept"])
+
+    assert asyncio.run(go()) == "echo kept"
+    assert model.batches == [[["kept"]]]
+
+
+def test_token_bucket_waits_when_empty():
+    bucket = TokenBucket(per_minute=600, burst_seconds=0.1)  # 10/s, holds 1
+
+    async def go():
+        await bucket.acquire(1)
+        await bucket.acquire(1)
+
+    asyncio.run(go())
+    assert bucket.waited == pytest.approx(0.1, abs=0.05)
+
+
+def test_process_dispatcher_is_replaced_in_a_new_event_loop():
+    from app.services.llm import get_dispatcher
+
+    model = Model()
+
+    async def abandon():
+        # the loop ends while a prompt waits for its batch window
+        asyncio.ensure_future(get_dispatcher(model).generate(["left behind"]))
+        await asyncio.sleep(0)
+
+    async def ask():
+        return await asyncio.wait_for(get_dispatcher(model).generate(["next run"]), 1)
+
+    asyncio.run(abandon())
+    assert asyncio.run(ask()) == "echo next run"
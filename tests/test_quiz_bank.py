@@ -0,0 +1,125 @@
+# tests/test_quiz_bank.py
+import asyncio
+import json
+
+import pytest
+
+from app.services import quiz_bank, topic_cache
+from app.services.quiz_bank import QUIZ_BANK, load_bank, next_question, refill
+from app.services.topic_cache import topic_cache_key
+from app.utils import redis_client
+from app.utils.cache import TTLCache
+
+SUMMARY = "Asthma is a long-term condition that narrows the airways."
+
+
+class Generator:
+    """Stands in for generate_quiz_bank: `n` new questions per call (or the fixed `questions`)."""
+
+    def __init__(self, questions=None, delay=0.0):
+        self.questions = questions
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, summary, n=8):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.questions is not None:
+            return self.questions
+        return [{"question": f"Question {self.calls}.{i}?", "options": None, "answer": "yes", "hint": None}
+                for i in range(n)]
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    monkeypatch.setattr(topic_cache, "_local", TTLCache(maxsize=16, ttl=60))
+    monkeypatch.setattr(quiz_bank, "QUIZ_BANK_BATCH", 4)
+    monkeypatch.setattr(quiz_bank, "QUIZ_BANK_REFILL_AT", 1)
+    gen = Generator()
+    monkeypatch.setattr(quiz_bank, "generate_quiz_bank", gen)
+    return gen
+
+
+async def _settle():
+    if quiz_bank._background:
+        await asyncio.wait(set(quiz_bank._background))
+
+
+def test_a_session_never_sees_a_question_twice(generator):
+    async def go():
+        seen = []
+        for _ in range(10):
+            quiz = await next_question("Asthma", SUMMARY, seen)
+            await _settle()
+            seen.append(quiz["id"])
+        return seen
+
+    seen = asyncio.run(go())
+    assert len(set(seen)) == 10
+    assert generator.calls >= 3  # 10 questions from batches of 4
+
+
+def test_bank_refills_in_the_background_when_low(generator):
+    async def go():
+        bank = await refill("Asthma", SUMMARY)
+        seen = [q["id"] for q in bank[:2]]
+        # two unseen left: served without waiting, no refill yet
+        await next_question("Asthma", SUMMARY, seen)
+        await _settle()
+        assert generator.calls == 1
+        # one unseen left: served, and a batch is added in the background
+        await next_question("Asthma", SUMMARY, seen + [bank[2]["id"]])
+        await _settle()
+        assert generator.calls == 2
+        return await load_bank("Asthma")
+
+    assert len(asyncio.run(go())) == 8
+
+
+def test_refill_is_shared_across_spellings_of_a_topic(generator):
+    generator.delay = 0.05
+
+    async def go():
+        return await asyncio.gather(refill("Asthma", SUMMARY), refill("  asthma ", SUMMARY))
+
+    first, second = asyncio.run(go())
+    assert generator.calls == 1 and first == second
+
+
+def test_refills_on_two_workers_keep_both_batches(generator, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    r = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setitem(redis_client._clients, True, r)
+    local_a, local_b = TTLCache(maxsize=16, ttl=60), TTLCache(maxsize=16, ttl=60)
+    shared = {"question": "What does asthma narrow?", "options": None, "answer": "The airways", "hint": None}
+
+    async def on(worker_local, questions):
+        with monkeypatch.context() as m:
+            m.setattr(topic_cache, "_local", worker_local)
+            m.setattr(quiz_bank, "generate_quiz_bank", Generator(questions))
+            await refill("Asthma", SUMMARY)
+
+    async def go():
+        await on(local_a, [{"question": f"A{i}?", "answer": "yes"} for i in range(2)])
+        await on(local_b, [shared, {"question": "Is asthma contagious?", "answer": "No"}])
+        # worker A still holds its own bank in its local tier
+        await on(local_a, [shared, {"question": "A2?", "answer": "yes"}])
+        monkeypatch.setattr(topic_cache, "_local", TTLCache(maxsize=0))
+        return await load_bank("Asthma"), await r.llen(topic_cache_key(QUIZ_BANK, "asthma"))
+
+    bank, stored = asyncio.run(go())
+    assert [q["question"] for q in bank] == ["A0?", "A1?", "What does asthma narrow?", "Is asthma contagious?", "A2?"]
+    assert stored == 6  # the question both workers generated is stored twice, served once
+
+
+def test_bank_keeps_the_newest_questions(generator, monkeypatch):
+    monkeypatch.setattr(quiz_bank, "QUIZ_BANK_MAX", 6)
+
+    async def go():
+        for _ in range(3):
+            await refill("Asthma", SUMMARY)
+        return await load_bank("Asthma")
+
+    bank = asyncio.run(go())
+    assert [q["question"] for q in bank] == ["Question 2.2?", "Question 2.3?"] + [f"Question 3.{i}?" for i in range(4)]
+    assert all(json.dumps(q) for q in bank)
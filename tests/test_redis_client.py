@@ -0,0 +1,73 @@
+# tests/test_redis_client.py
+import asyncio
+
+import pytest
+
+from app.utils import redis_client
+from app.utils.redis_client import get_redis
+
+
+class Client:
+    """Stands in for redis.asyncio.Redis: a slow PING, and records being closed."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.closed = False
+
+    async def ping(self):
+        await asyncio.sleep(0.02)
+        if self.fail:
+            raise ConnectionError("refused")
+        return True
+
+    async def aclose(self):
+        self.closed = True
+
+
+class Factory:
+    """Stands in for redis.asyncio.from_url; keeps every client it made."""
+
+    def __init__(self):
+        self.fail = False
+        self.clients = []
+
+    def __call__(self, url, **kwargs):
+        self.clients.append(Client(fail=self.fail))
+        return self.clients[-1]
+
+
+@pytest.fixture
+def created(monkeypatch):
+    aioredis = pytest.importorskip("redis.asyncio")
+    factory = Factory()
+    monkeypatch.setattr(aioredis, "from_url", factory)
+    monkeypatch.setattr(redis_client, "REDIS_URL", "redis://cache:6379/0")
+    monkeypatch.setattr(redis_client, "_clients", {})
+    monkeypatch.setattr(redis_client, "_connecting", {})
+    monkeypatch.setattr(redis_client, "_failed_at", None)
+    return factory
+
+
+def test_concurrent_first_calls_share_one_client(created):
+    async def go():
+        return await asyncio.gather(*(get_redis() for _ in range(5)), get_redis(decode_responses=False))
+
+    clients = asyncio.run(go())
+    assert len(created.clients) == 2  # one str and one bytes client
+    assert all(c is clients[0] for c in clients[:5]) and clients[5] is not clients[0]
+    assert not any(c.closed for c in created.clients)
+
+
+def test_failed_connection_is_closed_and_not_retried_at_once(created):
+    created.fail = True
+
+    async def go():
+        results = await asyncio.gather(*(get_redis() for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert len(created.clients) == 1 and created.clients[0].closed
+        created.fail = False
+        with pytest.raises(RuntimeError, match="retrying later"):
+            await get_redis()
+
+    asyncio.run(go())
+    assert redis_client._clients == {}
@@ -0,0 +1,128 @@
+# tests/test_search_fanout.py
+import asyncio
+import time
+
+import pytest
+
+from app.services import search_service
+from app.services.search_service import fanout_search
+from app.utils.resilience import deadline
+
+VARIANTS = ("{topic} a", "{topic} b", "{topic} c")
+
+
+def _results(tag, n, score=0.9):
+    return {"results": [{"title": f"{tag} {i}", "url": f"https://example.org/{tag}/{i}",
+                         "content": f"{tag} content {i}", "score": score} for i in range(n)]}
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """Replace Tavily: query suffix -> (delay seconds, response or exception). Records cancellations."""
+    plan = {}
+    cancelled = []
+
+    async def search(query, max_results=4, timeout=None):
+        delay, response = plan[query.rsplit(" ", 1)[1]]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(query)
+            raise
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(search_service, "tavily_search", search)
+    monkeypatch.setattr(search_service, "SEARCH_ENOUGH_RESULTS", 4)
+    return plan, cancelled
+
+
+def run(**kwargs):
+    start = time.monotonic()
+    results = asyncio.run(fanout_search("asthma", variants=VARIANTS, **kwargs))
+    return results, time.monotonic() - start
+
+
+def test_returns_early_once_enough_good_results(searches):
+    plan, cancelled = searches
+    plan.update(a=(0, _results("a", 2)), b=(0.01, _results("b", 2)), c=(5, _results("c", 2)))
+    results, took = run(deadline=5)
+    assert took < 1
+    assert {r["title"] for r in results} == {"a 0", "a 1", "b 0", "b 1"}
+    assert cancelled == ["asthma c"]
+
+
+def test_early_exit_waits_for_the_primary_query(searches):
+    plan, _ = searches
+    plan.update(a=(0.05, _results("a", 1)), b=(0, _results("b", 4)), c=(5, _results("c", 1)))
+    results, took = run(deadline=5)
+    assert took < 1 and "a 0" in {r["title"] for r in results}
+
+
+def test_low_scores_do_not_count_towards_enough(searches):
+    plan, _ = searches
+    plan.update(a=(0, _results("a", 4, score=0.1)), b=(0.1, _results("b", 1)), c=(0.1, _results("c", 1)))
+    results, _ = run(deadline=5)
+    # waited for every variant; the good results rank first
+    assert len(results) == 6 and results[0]["score"] == 0.9
+
+
+def test_deadline_returns_what_is_in_hand(searches):
+    plan, cancelled = searches
+    plan.update(a=(0, _results("a", 1)), b=(5, _results("b", 4)), c=(5, _results("c", 4)))
+    results, took = run(deadline=0.1)
+    assert 0.1 <= took < 1
+    assert [r["title"] for r in results] == ["a 0"]
+    assert sorted(cancelled) == ["asthma b", "asthma c"]
+
+
+def test_past_deadline_waits_for_a_first_answer(searches):
+    plan, _ = searches
+    plan.update(a=(0.2, _results("a", 1)), b=(5, _results("b", 1)), c=(5, _results("c", 1)))
+    results, took = run(deadline=0.05)
+    assert 0.2 <= took < 1 and [r["title"] for r in results] == ["a 0"]
+
+
+def test_request_deadline_shortens_the_search_deadline(searches):
+    plan, _ = searches
+    plan.update(a=(0, _results("a", 1)), b=(5, _results("b", 1)), c=(5, _results("c", 1)))
+
+    async def go():
+        with deadline(0.1):
+            return await fanout_search("asthma", variants=VARIANTS, deadline=5)
+
+    start = time.monotonic()
+    assert len(asyncio.run(go())) == 1
+    assert time.monotonic() - start < 1
+
+
+def test_failed_variants_are_skipped_and_duplicates_merged(searches):
+    plan, _ = searches
+    plan.update(a=(0, _results("a", 2)), b=(0, _results("a", 2)), c=(0, RuntimeError("503")))
+    results, _ = run(deadline=5)
+    assert [r["title"] for r in results] == ["a 0", "a 1"]
+
+
+def test_raises_when_every_variant_fails(searches):
+    plan, _ = searches
+    error = RuntimeError("503")
+    plan.update(a=(0, error), b=(0, RuntimeError("b")), c=(0, RuntimeError("c")))
+    with pytest.raises(RuntimeError):
+        run(deadline=5)
+
+
+def test_mock_mode_end_to_end():
+    text = asyncio.run(search_service.search_medical_info("asthma"))
+    assert text.startswith("Mock result for medical explanation for asthma")
+    assert text.count("\n\n---\n\n") == len(search_service.QUERY_VARIANTS) - 1
+
+
+def test_no_results_give_an_uncacheable_placeholder(monkeypatch):
+    async def nothing(topic):
+        return []
+
+    monkeypatch.setattr(search_service, "fanout_search", nothing)
+    text = asyncio.run(search_service.search_medical_info("asthma"))
+    assert search_service.is_search_placeholder(text)
+    assert not search_service.is_search_placeholder("Asthma — https://example.org\nAsthma narrows the airways.")
@@ -0,0 +1,127 @@
+# tests/test_session_store.py
+import asyncio
+import time
+
+import pytest
+
+from app.utils import redis_client
+from app.utils.session_store import MemorySessionStore, RedisSessionStore, SQLiteSessionStore
+
+SEARCH = "Asthma — https://example.org/asthma\n" + "Asthma narrows the airways. " * 40
+SUMMARY = "Asthma is a long-term condition that narrows the airways. " * 5
+QUIZ = {"public": {"question": "What does asthma narrow?", "options": None, "hint": "Breathing."},
+        "_canonical": "The airways", "prefetched": False, "id": "a1b2c3"}
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path, monkeypatch):
+    if request.param == "memory":
+        s = MemorySessionStore(ttl=3600)
+    elif request.param == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")  # EVALSHA of the patch script
+        monkeypatch.setitem(redis_client._clients, False, fakeredis.aioredis.FakeRedis(decode_responses=False))
+        s = RedisSessionStore(ttl=3600)
+    else:
+        s = SQLiteSessionStore(ttl=3600, path=str(tmp_path / "sessions.db"))
+    yield s
+    asyncio.run(s.close())
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_round_trip(store):
+    # the calls /start, /quiz and /answer make, in order
+    run(store.create("s1", {"session_id": "s1", "topic": "Asthma", "search_results": SEARCH, "summary": SUMMARY}))
+    assert run(store.get("s1", ["summary", "quiz"])) == {"summary": SUMMARY}
+
+    assert run(store.update("s1", {"quiz": QUIZ, "quiz_seen": ["a1b2c3"]}, only_if_exists=True))
+    # a prefetch never overwrites a quiz that is already there
+    assert not run(store.update("s1", {"quiz": {"id": "other"}}, only_if_exists=True, unless_field="quiz"))
+    assert run(store.get("s1", ["quiz"]))["quiz"] == QUIZ
+
+    evaluation = {"score": 1.0, "verdict": "correct", "explanation": "ok", "citations": [], "graded_by": "exact"}
+    assert run(store.update("s1", {"last_eval": evaluation}))
+    state = run(store.get("s1"))
+    assert state["search_results"] == SEARCH
+    assert state["quiz_seen"] == ["a1b2c3"]
+    assert state["last_eval"] == evaluation
+
+    run(store.delete("s1"))
+    assert run(store.get("s1")) is None
+    assert not run(store.update("s1", {"quiz": QUIZ}, only_if_exists=True))
+
+
+def test_create_replaces_existing_session(store):
+    run(store.create("s1", {"topic": "Asthma", "quiz": QUIZ}))
+    run(store.create("s1", {"topic": "Flu"}))
+    assert run(store.get("s1")) == {"topic": "Flu"}
+
+
+def test_sqlite_expiry_and_lazy_touch(tmp_path):
+    store = SQLiteSessionStore(ttl=3600, path=str(tmp_path / "sessions.db"), touch_seconds=60)
+    try:
+        run(store.create("s1", {"topic": "Asthma"}))
+        db = store._conn()
+        expires = db.execute("SELECT expires_at FROM sessions WHERE id = 's1'").fetchone()[0]
+        # a fresh session is not rewritten on read
+        run(store.get("s1"))
+        assert db.execute("SELECT expires_at FROM sessions WHERE id = 's1'").fetchone()[0] == expires
+
+        # a stale one is extended
+        db.execute("UPDATE sessions SET expires_at = expires_at - 600 WHERE id = 's1'")
+        run(store.get("s1"))
+        assert db.execute("SELECT expires_at FROM sessions WHERE id = 's1'").fetchone()[0] > expires - 600
+
+        db.execute("UPDATE sessions SET expires_at = 0 WHERE id = 's1'")
+        assert run(store.get("s1")) is None
+    finally:
+        run(store.close())
+
+
+def test_missing_blob_is_logged_with_session_and_field(tmp_path, caplog):
+    store = SQLiteSessionStore(ttl=3600, path=str(tmp_path / "sessions.db"))
+    try:
+        run(store.create("s1", {"topic": "Asthma", "summary": SUMMARY}))
+        store._conn().execute("DELETE FROM blobs")
+        store.codec = type(store.codec)()  # a worker that has not seen the blob
+        with caplog.at_level("WARNING", logger="healthbot.session_codec"):
+            assert run(store.get("s1")) == {"topic": "Asthma"}
+        assert "s1" in caplog.text and "'summary'" in caplog.text
+    finally:
+        run(store.close())
+
+
+def test_sqlite_touch_extends_blob_expiry(tmp_path):
+    store = SQLiteSessionStore(ttl=3600, path=str(tmp_path / "sessions.db"), touch_seconds=60)
+    try:
+        run(store.create("s1", {"topic": "Asthma", "summary": SUMMARY}))
+        db = store._conn()
+        # the session is stale and its blob about to expire
+        db.execute("UPDATE sessions SET expires_at = expires_at - 600")
+        db.execute("UPDATE blobs SET expires_at = ?", (time.time() + 30,))
+        run(store.get("s1"))
+        assert db.execute("SELECT expires_at FROM blobs").fetchone()[0] > time.time() + 3600
+    finally:
+        run(store.close())
+
+
+def test_redis_read_extends_blob_ttl(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    r = fakeredis.aioredis.FakeRedis(decode_responses=False)
+    monkeypatch.setitem(redis_client._clients, False, r)
+    writer, reader = RedisSessionStore(ttl=3600), RedisSessionStore(ttl=3600)
+
+    async def go():
+        await writer.create("s1", {"topic": "Asthma", "summary": SUMMARY})
+        (key,) = await r.keys("healthbot:blob:*")
+        await r.expire(key, 30)
+        state = await reader.get("s1", ["summary"])
+        return state, await r.ttl(key)
+
+    state, ttl = run(go())
+    assert state == {"summary": SUMMARY}
+    assert ttl > 3600
@@ -0,0 +1,92 @@
+# tests/test_structured_output.py
+import json
+
+import pytest
+
+from app.services.structured_output import (
+    JsonExtractor, Schema, StructuredOutputError, TruncatedOutputError, accepts, parse_structured,
+    parse_structured_list, repair, repair_json,
+)
+
+QUIZ = Schema({"question": str, "options": list, "answer": str, "hint": str},
+              required=("question",), defaults={"answer": "", "hint": ""}, complete=("question", "answer"))
+GRADE = Schema({"score": float, "verdict": str}, required=("score",), complete=("score",))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("```json\n{\"a\": 1}\n```", {"a": 1}),
+    ("{'a': 'it\\'s', 'b': True, 'c': None}", {"a": "it's", "b": True, "c": None}),
+    ('{"a": [1, 2,], "b": 2,}', {"a": [1, 2], "b": 2}),
+    ('{a: 1, // note\n "b": "x"}', {"a": 1, "b": "x"}),
+    ('{"a": "line\nbreak"}', {"a": "line\nbreak"}),
+])
+def test_repair_json(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+
+@pytest.mark.parametrize("text, repaired, value_cut", [
+    ('{"a": "cut off', {"a": "cut off"}, True),
+    ('{"a": 1, "b": [1, 2', {"a": 1, "b": [1, 2]}, True),
+    ('{"a": 1, "b":', {"a": 1, "b": None}, True),
+    ('{"a": "done", "b', {"a": "done"}, False),
+    ('{"a": "done", ', {"a": "done"}, False),
+])
+def test_repair_flags_truncation(text, repaired, value_cut):
+    result = repair(text)
+    assert json.loads(result.text) == repaired
+    assert result.truncated and result.value_cut == value_cut
+
+
+def test_complete_json_is_not_flagged():
+    assert repair('{"a": "x"}') == ('{"a": "x"}', False, False)
+
+
+def test_extractor_skips_prose_and_handles_chunks():
+    extractor = JsonExtractor()
+    found = []
+    for chunk in ['Sure! {"a": "}', '"} and [1', ', 2] done']:
+        found.extend(extractor.feed(chunk))
+    assert found == ['{"a": "}"}', "[1, 2]"]
+
+
+def test_parse_structured_coerces_and_defaults():
+    out = parse_structured('Here: {"question": "Q?", "options": "A", "answer": 4}', QUIZ)
+    assert out == {"question": "Q?", "options": ["A"], "answer": "4", "hint": ""}
+    assert parse_structured('{"score": "0.8"}', GRADE)["score"] == 0.8
+    with pytest.raises(StructuredOutputError):
+        parse_structured("no json here", QUIZ)
+    with pytest.raises(StructuredOutputError):
+        parse_structured('{"answer": "x"}', QUIZ)
+
+
+def test_truncated_required_text_is_rejected():
+    with pytest.raises(TruncatedOutputError):
+        parse_structured('{"question": "What does asthma narrow?", "answer": "The airw', QUIZ)
+    # cut before the answer was written at all
+    with pytest.raises(TruncatedOutputError):
+        parse_structured('{"question": "What does asthma narrow?", "hint": "Brea', QUIZ)
+    with pytest.raises(TruncatedOutputError):
+        parse_structured('{"score": 0.', GRADE)
+
+
+def test_truncated_optional_field_falls_back_to_default():
+    out = parse_structured('{"question": "Q?", "answer": "The airways", "hint": "Brea', QUIZ)
+    assert out == {"question": "Q?", "options": None, "answer": "The airways", "hint": ""}
+
+
+def test_truncated_list_drops_only_a_cut_last_item():
+    text = '[{"question": "A?", "answer": "a"}, {"question": "B?", "answer": "b'
+    assert [q["question"] for q in parse_structured_list(text, QUIZ)] == ["A?"]
+    text = '[{"question": "A?", "answer": "a"}, {"question": "B?", "answer": "b"}'
+    assert [q["question"] for q in parse_structured_list(text, QUIZ)] == ["A?", "B?"]
+
+
+def test_accepts_never_caches_truncated_output():
+    check = accepts(QUIZ)
+    assert check('{"question": "Q?", "answer": "a"}')
+    assert not check('{"question": "Q?", "answer": "a", "hint": "Brea')
+    assert not check("prose only")
+    many = accepts(QUIZ, many=True)
+    assert many('[{"question": "Q?", "answer": "a"}]')
+    assert not many('[{"question": "Q?", "answer": "a"}')
+    assert not many("[]")
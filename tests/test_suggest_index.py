@@ -0,0 +1,134 @@
+# tests/test_suggest_index.py
+import random
+
+import pytest
+
+from app.services.suggest_index import SuggestIndex, score_topic
+from app.services.topic_store import load_medical_topics
+
+
+def linear_scan(topics, q, limit, boost=None):
+    """The original /suggest: score every topic, best tier, then boost, then name."""
+    q_l = q.strip().lower()
+    if not q_l:
+        return []
+    scored = [(score_topic(t.lower(), q_l), t) for t in topics]
+    scored = [(s, t) for s, t in scored if s]
+    scored.sort(key=lambda st: (-st[0], -(boost(st[1].lower()) if boost else 0), st[1]))
+    return [t for _, t in scored[:limit]]
+
+
+@pytest.fixture(scope="module")
+def topics():
+    return sorted(set(load_medical_topics()))
+
+
+@pytest.fixture(scope="module")
+def index(topics):
+    return SuggestIndex(topics)
+
+
+def _queries(topics, n=300, seed=0):
+    rng = random.Random(seed)
+    out = ["a", "he", "care", "Diabetes", "  asthma ", "type 2", "ZZZ"]
+    for term in rng.sample(topics, n):
+        words = term.split()
+        word = rng.choice(words)
+        i = rng.randrange(len(term))
+        out += [
+            term[:rng.randint(1, len(term))],                     # prefix
+            word[:rng.randint(1, len(word))],                     # word prefix
+            term[i:i + rng.randint(2, 6)],                        # substring
+            term.upper(),                                         # exact, any case
+        ]
+    return out
+
+
+@pytest.mark.parametrize("limit", [1, 10])
+def test_ranks_like_the_linear_scan(topics, index, limit):
+    for q in _queries(topics):
+        expected = linear_scan(topics, q, limit)
+        # fuzzy hits may only follow the exact tiers
+        assert index.search(q, limit)[:len(expected)] == expected, q
+
+
+def test_boost_orders_within_a_tier(topics, index):
+    popularity = {t.lower(): len(t) % 7 for t in topics}
+    boost = popularity.get
+    for q in _queries(topics, n=100, seed=1):
+        expected = linear_scan(topics, q, 10, boost)
+        assert index.search(q, 10, boost=boost)[:len(expected)] == expected, q
+
+
+def test_cached_candidates_rank_like_the_tiers(topics, index):
+    ids = index.candidates("dia")
+    for q in ("dia", "diab", "diabetes", "diabetes m"):
+        ids = index.narrow(q, ids)
+        assert index.search(q, 10, candidates=ids) == index.search(q, 10)
+
+
+def test_sync_matches_a_full_rebuild(topics):
+    rng = random.Random(2)
+    old = rng.sample(topics, len(topics) * 2 // 3)
+    new = [t for t in old if rng.random() > 0.2] + rng.sample(topics, 50) + ["Made Up Condition"]
+    index = SuggestIndex(old)
+    generation = index.generation
+    added, removed = index.sync(new)
+    rebuilt = SuggestIndex(new)
+
+    assert (added, removed) == (len(set(new) - set(old)), len(set(old) - set(new)))
+    assert index.tombstones == removed and index.generation == generation + 1
+    assert len(index) == len(rebuilt) and sorted(index.terms()) == sorted(rebuilt.terms())
+    for q in _queries(topics, n=100, seed=3) + ["made up", "madeup condtion"]:
+        assert index.search(q, 10) == rebuilt.search(q, 10), q
+        assert index.fuzzy_terms(q) == rebuilt.fuzzy_terms(q), q
+    # removed terms leave nothing behind
+    gone = next(iter(set(old) - set(new)))
+    assert gone not in index and not index.is_topic(gone)
+
+
+def test_sync_without_changes_keeps_the_generation(topics):
+    index = SuggestIndex(topics[:100])
+    assert index.sync(topics[:100] + ["  "]) == (0, 0)
+    assert index.generation == 0 and index.tombstones == 0
+
+
+FUZZY_TOPICS = ["Asthma", "Diabetes", "Diabetes Insipidus", "Flu", "Hypertension", "Astma Support Group",
+                "Alzheimer's Disease"]
+
+
+@pytest.fixture(scope="module")
+def small():
+    return SuggestIndex(FUZZY_TOPICS)
+
+
+@pytest.mark.parametrize("q, expected", [
+    ("diabtes", ["Diabetes", "Diabetes Insipidus"]),         # deletion
+    ("diabetse", ["Diabetes", "Diabetes Insipidus"]),        # transposition
+    ("hypertenshun", ["Hypertension"]),                      # two edits in a long word
+    ("alzhiemers", ["Alzheimer's Disease"]),
+    ("diabtes insipdus", ["Diabetes Insipidus"]),            # every word within budget
+])
+def test_fuzzy_matches(small, q, expected):
+    assert small.search(q, 5) == expected
+
+
+@pytest.mark.parametrize("q", [
+    "fle",         # words under FUZZY_MIN_LEN must match exactly
+    "asthmaa xx",  # every query word has to match
+    "hypxrtxnsxon",  # beyond the edit budget
+])
+def test_no_fuzzy_match(small, q):
+    assert small.search(q, 5) == []
+
+
+def test_fuzzy_only_fills_slots_left_by_the_exact_tiers(small):
+    # "Astma Support Group" is a prefix hit; "Asthma" is one edit away
+    assert small.search("astma", 1) == ["Astma Support Group"]
+    assert small.search("astma", 5) == ["Astma Support Group", "Asthma"]
+    assert small.fuzzy_terms("astma") == {"Asthma": 1, "Astma Support Group": 0}
+
+
+def test_fuzzy_on_the_real_dictionary(index):
+    assert index.search("astma", 10)[0] == "Asthma"
+    assert all(t.startswith("Diabetes") for t in index.search("diabtes", 5))
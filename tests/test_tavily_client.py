@@ -0,0 +1,134 @@
+# tests/test_tavily_client.py
+# TavilySearchClient against the local stub (app/services/tavily_stub.py) over real HTTP
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+httpx = pytest.importorskip("httpx")
+uvicorn = pytest.importorskip("uvicorn")
+
+from app.services import tavily_stub  # noqa: E402
+from app.services.search_service import TavilySearchClient  # noqa: E402
+
+
+class Recorder:
+    """Wraps the stub app; records each request's client port and the peak concurrency."""
+
+    def __init__(self, app):
+        self.app = app
+        self.ports = []
+        self.inflight = 0
+        self.peak = 0
+
+    def reset(self):
+        self.ports.clear()
+        self.peak = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        self.ports.append(scope["client"][1])
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.inflight -= 1
+
+
+@pytest.fixture(scope="module")
+def stub():
+    recorder = Recorder(tavily_stub.app)
+    server = uvicorn.Server(uvicorn.Config(recorder, host="127.0.0.1", port=0, lifespan="off", log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    stop_at = time.monotonic() + 10
+    while not server.started:
+        assert time.monotonic() < stop_at, "stub server did not start"
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    yield recorder, f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(5)
+
+
+@pytest.fixture
+def recorder(stub, monkeypatch):
+    recorder, _ = stub
+    recorder.reset()
+    monkeypatch.setattr(tavily_stub, "LATENCY_MS", 0)
+    return recorder
+
+
+def client(stub, **kwargs) -> TavilySearchClient:
+    return TavilySearchClient(base_url=stub[1], api_key="test", **kwargs)
+
+
+def test_searches_reuse_one_pooled_connection(stub, recorder):
+    tavily = client(stub)
+
+    async def go():
+        try:
+            return [await tavily.search(f"asthma {i}", max_results=3) for i in range(5)]
+        finally:
+            await tavily.aclose()
+
+    responses = asyncio.run(go())
+    assert [len(r["results"]) for r in responses] == [3] * 5
+    assert responses[0]["results"][0]["title"] == "asthma 0 — overview 1"
+    assert len(recorder.ports) == 5 and len(set(recorder.ports)) == 1
+
+
+def test_semaphore_caps_in_flight_searches(stub, recorder, monkeypatch):
+    monkeypatch.setattr(tavily_stub, "LATENCY_MS", 50)
+    tavily = client(stub, max_concurrency=2)
+
+    async def go():
+        try:
+            return await asyncio.gather(*(tavily.search(f"flu {i}") for i in range(6)))
+        finally:
+            await tavily.aclose()
+
+    start = time.monotonic()
+    assert len(asyncio.run(go())) == 6
+    assert recorder.peak == 2
+    assert len(set(recorder.ports)) <= 2  # queued searches wait for a pooled connection
+    assert time.monotonic() - start >= 0.15  # three rounds of two
+
+
+def test_per_call_timeout(stub, recorder, monkeypatch):
+    monkeypatch.setattr(tavily_stub, "LATENCY_MS", 500)
+    tavily = client(stub, timeout=10)
+
+    async def go():
+        try:
+            await tavily.search("gout", timeout=0.05)
+        finally:
+            await tavily.aclose()
+
+    start = time.monotonic()
+    with pytest.raises(httpx.TimeoutException):
+        asyncio.run(go())
+    assert time.monotonic() - start < 0.4
+
+
+def test_aclose_closes_the_pool_and_a_later_search_reopens_it(stub, recorder):
+    tavily = client(stub)
+
+    async def go():
+        await tavily.search("measles")
+        pool = tavily._client
+        await tavily.aclose()
+        assert pool.is_closed and tavily._client is None
+        await tavily.search("measles")
+        reopened = tavily._client
+        await tavily.aclose()
+        await tavily.aclose()  # closing twice is harmless
+        return pool, reopened
+
+    pool, reopened = asyncio.run(go())
+    assert reopened is not pool and reopened.is_closed
+    assert len(set(recorder.ports)) == 2
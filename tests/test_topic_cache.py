@@ -0,0 +1,91 @@
+# tests/test_topic_cache.py
+import asyncio
+
+import pytest
+
+from app.services import topic_cache
+from app.services.topic_cache import SUMMARY, get_or_compute, topic_cache_key
+from app.utils import redis_client
+from app.utils.cache import TTLCache
+from app.utils.singleflight import SingleFlight
+
+LOCK = topic_cache_key(SUMMARY, "asthma") + ":lock"
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # EVAL of the lock release script
+    r = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setitem(redis_client._clients, True, r)
+    monkeypatch.setattr(topic_cache, "_local", TTLCache(maxsize=16, ttl=60))
+    monkeypatch.setattr(topic_cache, "_flights", SingleFlight())
+    monkeypatch.setattr(topic_cache, "LOCK_POLL_SECONDS", 0.01)
+    return r
+
+
+class Compute:
+    def __init__(self, value="summary", delay=0.05, during=None):
+        self.value, self.delay, self.during = value, delay, during
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.during is not None:
+            await self.during()
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+def test_concurrent_misses_compute_once(redis):
+    compute = Compute()
+
+    async def go():
+        values = await asyncio.gather(*(get_or_compute(SUMMARY, "Asthma ", compute) for _ in range(5)))
+        return values, await redis.get(topic_cache_key(SUMMARY, "asthma")), await redis.exists(LOCK)
+
+    values, stored, locked = asyncio.run(go())
+    assert values == ["summary"] * 5 and compute.calls == 1
+    assert stored == "summary" and not locked
+
+
+def test_lock_loser_takes_the_winners_value(redis, monkeypatch):
+    # two workers: no shared SingleFlight or local tier, only Redis between them
+    monkeypatch.setattr(topic_cache, "_local", TTLCache(maxsize=0))
+    winner, loser = Compute("from winner", delay=0.1), Compute("from loser")
+
+    async def go():
+        first = asyncio.create_task(topic_cache._compute_once(SUMMARY, "asthma", winner))
+        await asyncio.sleep(0.01)
+        second = await topic_cache._compute_once(SUMMARY, "asthma", loser)
+        return await first, second
+
+    assert asyncio.run(go()) == ("from winner", "from winner")
+    assert winner.calls == 1 and loser.calls == 0
+
+
+def test_lock_loser_computes_locally_after_waiting(redis, monkeypatch):
+    monkeypatch.setattr(topic_cache, "LOCK_WAIT_SECONDS", 0.1)
+    compute = Compute("local", delay=0)
+
+    async def go():
+        # a worker that took the lock and never finished
+        await redis.set(LOCK, "stuck-worker", px=60_000)
+        value = await get_or_compute(SUMMARY, "asthma", compute)
+        return value, await redis.get(LOCK)
+
+    assert asyncio.run(go()) == ("local", "stuck-worker")
+    assert compute.calls == 1
+
+
+def test_release_keeps_a_lock_taken_over_by_another_worker(redis):
+    async def lock_expires_and_is_retaken():
+        await redis.set(LOCK, "next-worker", px=60_000)
+
+    compute = Compute(during=lock_expires_and_is_retaken)
+
+    async def go():
+        await get_or_compute(SUMMARY, "asthma", compute)
+        return await redis.get(LOCK)
+
+    assert asyncio.run(go()) == "next-worker"
@@ -0,0 +1,74 @@
+# tests/test_topic_rules.py
+import pytest
+
+from app.services.suggest_index import SuggestIndex
+from app.services.topic_rules import LocalTopicValidator, keyboard_walk
+from app.services.topic_store import get_suggest_index
+
+TOPICS = ["Rabies", "Asthma", "Dental Caries Prevention", "Gestational Diabetes", "Diabetes Sick Day Rules",
+          "Influenza (Flu)"]
+
+
+@pytest.fixture(scope="module")
+def validator():
+    return LocalTopicValidator(SuggestIndex(TOPICS))
+
+
+@pytest.mark.parametrize("topic, tier, cleaned", [
+    ("rabies", "dictionary", "Rabies"),
+    ("flu", "dictionary", "Influenza (Flu)"),
+    ("dental caries", "partial", "Dental Caries Prevention"),
+    ("gestational diabtes", "fuzzy", "Gestational Diabetes"),
+    ("asthma in children", "contains", "asthma in children"),
+])
+def test_accepted_locally(validator, topic, tier, cleaned):
+    result = validator.check(topic)
+    assert (result["valid"], result["validated_by"], result["cleaned_topic"]) == (True, tier, cleaned)
+
+
+def test_only_empty_input_is_rejected_locally(validator):
+    assert validator.check("??? !!")["validated_by"] == "empty"
+
+
+@pytest.mark.parametrize("topic", [
+    "scabies", "rental", "diabtes",       # one word within an edit or two of a topic
+    "xanax", "wegovy", "yaws", "pizza",   # no dictionary resemblance either way
+    "dentl caris prevention",             # more than one word differs
+])
+def test_uncertain_input_goes_to_llm(validator, topic):
+    assert validator.check(topic) is None
+
+
+# ---------- keyboard mashing ----------
+@pytest.fixture(scope="module")
+def shipped():
+    """The validator over the shipped topic dictionary."""
+    return LocalTopicValidator(get_suggest_index())
+
+
+def test_keyboard_walk():
+    assert keyboard_walk("asdfgh") and keyboard_walk("lkjhgf") and keyboard_walk("jkjkjk")
+    assert not keyboard_walk("wegovy") and not keyboard_walk("xanax") and not keyboard_walk("hba1c")
+    assert not keyboard_walk("qazwsx")  # z and w are two rows apart
+
+
+@pytest.mark.parametrize("topic", ["asdfgh", "zxcvbnm", "qwertyuiop", "lkjhgf", " SDFSDF "])
+def test_keyboard_mashing_is_rejected(validator, shipped, topic):
+    for v in (validator, shipped):
+        result = v.check(topic)
+        assert (result["valid"], result["validated_by"]) == (False, "gibberish")
+
+
+@pytest.mark.parametrize("topic", [
+    "xanax", "wegovy", "yaws", "xyzal", "mpox",   # score like mashing, typed unlike it
+    "refer", "assert", "lookup", "offset",       # typed like mashing, score like words
+    "asdasd", "asdf",                             # mashing that scores too well, or too short
+    "asdfgh jkl",                                 # more than one word
+])
+def test_gibberish_tier_leaves_the_rest_to_the_llm(shipped, topic):
+    assert shipped.check(topic) is None
+
+
+def test_a_fuzzy_match_is_never_gibberish(validator):
+    assert validator.check("qwerty")["validated_by"] == "gibberish"
+    assert LocalTopicValidator(SuggestIndex(TOPICS + ["Qwertz Syndrome"])).check("qwerty") is None
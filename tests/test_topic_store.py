@@ -0,0 +1,99 @@
+# tests/test_topic_store.py
+import os
+
+import pytest
+
+from app.services import topic_store
+from app.services.topic_store import TopicSnapshot, TopicStore, build_topic_blob, read_blob_version
+
+
+def write_topics(path, topics):
+    path.write_text("\n".join(topics) + "\n", encoding="utf-8")
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    src, dst = tmp_path / "topics.txt", tmp_path / "topics.bin"
+    monkeypatch.setattr(topic_store, "DATA_PATH", str(src))
+    monkeypatch.setattr(topic_store, "BLOB_PATH", str(dst))
+    return src, dst
+
+
+def test_blob_round_trip(paths):
+    src, dst = paths
+    write_topics(src, ["flu", "Asthma", "Diabetes", "asthma", "Flu", "Asthma"])
+    assert build_topic_blob(str(src), str(dst)) == 1
+    snapshot = TopicSnapshot.from_blob(str(dst))
+    assert list(snapshot) == ["Asthma", "asthma", "Diabetes", "Flu", "flu"]
+    assert snapshot[-1] == "flu" and snapshot[1:3] == ["asthma", "Diabetes"]
+    with pytest.raises(IndexError):
+        snapshot[5]
+
+
+def test_blob_version_increments(paths):
+    src, dst = paths
+    write_topics(src, ["Asthma"])
+    assert read_blob_version(str(dst)) is None
+    build_topic_blob(str(src), str(dst))
+    assert build_topic_blob(str(src), str(dst)) == 2
+    assert read_blob_version(str(dst)) == 2 == TopicSnapshot.from_blob(str(dst)).version
+
+
+def test_bad_magic_is_rejected(paths):
+    _, dst = paths
+    dst.write_bytes(b"NOTATOPICBLOB" + bytes(16))
+    assert read_blob_version(str(dst)) is None
+    with pytest.raises(ValueError):
+        TopicSnapshot.from_blob(str(dst))
+
+
+def test_overlong_record_is_cut_on_a_character_boundary(paths):
+    src, dst = paths
+    long_topic = "é" * 40_000  # 80,000 bytes; 0xFFFF would split a character
+    write_topics(src, [long_topic, "Zika"])
+    build_topic_blob(str(src), str(dst))
+    zika, cut = TopicSnapshot.from_blob(str(dst))
+    assert zika == "Zika"
+    assert cut == "é" * 32_767 and len(cut.encode("utf-8")) <= 0xFFFF
+
+
+def touch_later(path, than):
+    st = os.stat(than)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_store_hot_reloads_the_blob(paths):
+    src, dst = paths
+    write_topics(src, ["Asthma", "Flu"])
+    build_topic_blob(str(src), str(dst))
+    touch_later(dst, src)
+    store = TopicStore(reload_seconds=0)
+    index = store.index
+    assert store.snapshot.version == 1 and "Flu" in index and "Zika" not in index
+    generation = index.generation
+
+    write_topics(src, ["Asthma", "Zika"])
+    build_topic_blob(str(src), str(dst))
+    touch_later(dst, src)
+    assert store.snapshot.version == 2
+    assert store.index is index  # synced in place, not rebuilt
+    assert "Zika" in index and "Flu" not in index
+    assert index.generation != generation
+    assert store.index.search("zik") == ["Zika"]
+
+
+def test_failed_load_keeps_previous_snapshot(paths):
+    src, dst = paths
+    write_topics(src, ["Asthma", "Flu"])
+    build_topic_blob(str(src), str(dst))
+    touch_later(dst, src)
+    store = TopicStore(reload_seconds=0)
+    snapshot, index = store.snapshot, store.index
+
+    # replaced atomically, as build_topic_blob does; the old mmap stays valid
+    tmp = dst.with_suffix(".tmp")
+    tmp.write_bytes(b"garbage" * 10)
+    os.replace(tmp, dst)
+    touch_later(dst, src)
+    assert store.snapshot is snapshot and store.index is index
+    assert list(store.snapshot) == ["Asthma", "Flu"]
@@ -0,0 +1,197 @@
+# tests/test_workflow.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+from app.core import workflow  # noqa: E402
+
+
+async def _settle():
+    # let background quiz pre-generation finish inside this event loop
+    tasks = list(workflow._quiz_tasks.values())
+    if tasks:
+        await asyncio.wait(tasks)
+
+
+async def _thread_values(session_id):
+    return (await workflow.START_GRAPH.aget_state({"configurable": {"thread_id": session_id}})).values
+
+
+def test_start_quiz_answer_round_trip():
+    async def go():
+        start = await workflow.start_topic_flow("Asthma", "wf-1")
+        assert start["summary"] and start["topic"] == "Asthma"
+        await _settle()
+        quiz = await workflow.request_quiz("wf-1")
+        assert quiz["quiz"]["question"] and "_canonical" not in quiz["quiz"]
+        result = await workflow.submit_answer("wf-1", "the airways")
+        assert result["evaluation"]["verdict"] in ("correct", "partial", "incorrect")
+        assert await _thread_values("wf-1") == {}
+        await workflow.reset_session("wf-1")
+
+    asyncio.run(go())
+
+
+def test_rejected_topic_does_not_reuse_previous_summary(monkeypatch):
+    async def fail(*args, **kwargs):
+        raise RuntimeError("store down")
+
+    async def go():
+        # a run that failed after its summary was checkpointed
+        monkeypatch.setattr(workflow, "create_session", fail)
+        with pytest.raises(RuntimeError):
+            await workflow.start_topic_flow("Influenza", "wf-2")
+        monkeypatch.undo()
+        with pytest.raises(workflow.InvalidTopic):
+            await workflow.start_topic_flow("zzkrt", "wf-2")
+        with pytest.raises(workflow.InvalidTopic):
+            async for _ in workflow.start_topic_flow_stream("zzkrt", "wf-2"):
+                pass
+        assert await _thread_values("wf-2") == {}
+
+    asyncio.run(go())
+
+
+def test_failed_run_is_resumed_then_cleaned_up(monkeypatch):
+    searches = []
+    real_search = workflow.search_medical_info
+
+    async def search(topic):
+        searches.append(topic)
+        return await real_search(topic)
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("LLM down")
+
+    monkeypatch.setattr(workflow, "search_medical_info", search)
+    monkeypatch.setattr(workflow, "summarize_text_for_patient", fail)
+
+    async def go():
+        with pytest.raises(RuntimeError):
+            await workflow.start_topic_flow("Measles", "wf-3")
+        assert "wf-3" in workflow._resumable
+        monkeypatch.undo()
+        monkeypatch.setattr(workflow, "search_medical_info", search)
+        start = await workflow.start_topic_flow("Measles", "wf-3")
+        await _settle()
+        assert start["summary"] and searches == ["Measles"]  # resumed after the search
+        assert "wf-3" not in workflow._resumable
+        assert await _thread_values("wf-3") == {}
+
+    asyncio.run(go())
+
+
+def test_resumable_runs_are_bounded(monkeypatch):
+    async def fail(*args, **kwargs):
+        raise RuntimeError("LLM down")
+
+    monkeypatch.setattr(workflow, "summarize_text_for_patient", fail)
+    monkeypatch.setattr(workflow, "START_RESUME_MAX", 2)
+
+    async def go():
+        for i in range(4):
+            with pytest.raises(RuntimeError):
+                await workflow.start_topic_flow("Mumps", f"wf-4-{i}")
+        assert list(workflow._resumable) == ["wf-4-2", "wf-4-3"]
+        assert await _thread_values("wf-4-0") == {}
+
+    asyncio.run(go())
+    workflow._resumable.clear()
+
+
+def test_search_placeholder_and_its_summary_are_not_cached(monkeypatch):
+    from app.services.search_service import NO_RESULTS
+    from app.services.topic_cache import SEARCH, SUMMARY, get_cached
+
+    async def nothing(topic):
+        return NO_RESULTS.format(topic=topic)
+
+    monkeypatch.setattr(workflow, "search_medical_info", nothing)
+
+    async def go():
+        start = await workflow.start_topic_flow("Rosacea", "wf-5")
+        await _settle()
+        assert start["summary"]
+        assert await get_cached(SEARCH, "Rosacea") is None
+        assert await get_cached(SUMMARY, "Rosacea") is None
+
+        # the next session searches again and caches real results
+        monkeypatch.undo()
+        await workflow.start_topic_flow("Rosacea", "wf-5")
+        await _settle()
+        assert await get_cached(SEARCH, "Rosacea") is not None
+        assert await get_cached(SUMMARY, "Rosacea") is not None
+        await workflow.reset_session("wf-5")
+
+    asyncio.run(go())
+
+
+# ---------- quiz pre-generation ----------
+class SlowBank:
+    """Stands in for quiz_bank.next_question: one fixed question, after `delay` seconds."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, topic, summary, seen):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {"id": f"q{self.calls}", "question": f"Question {self.calls} about {topic}?",
+                "options": None, "answer": "The answer", "hint": None}
+
+
+def test_quiz_serves_the_prefetched_question(monkeypatch):
+    bank = SlowBank()
+    monkeypatch.setattr(workflow, "next_question", bank)
+
+    async def go():
+        await workflow.start_topic_flow("Asthma", "wf-6")
+        await _settle()
+        stored = (await workflow.get_session_fields("wf-6", ["quiz"]))["quiz"]
+        assert stored["prefetched"] and bank.calls == 1
+        quiz = await workflow.request_quiz("wf-6")
+        assert quiz["quiz"] == stored["public"] and bank.calls == 1
+        # served once; the next /quiz asks for a new question
+        assert not (await workflow.get_session_fields("wf-6", ["quiz"]))["quiz"]["prefetched"]
+        assert (await workflow.request_quiz("wf-6"))["quiz"]["question"] == "Question 2 about Asthma?"
+        await workflow.reset_session("wf-6")
+
+    asyncio.run(go())
+
+
+def test_quiz_waits_for_a_running_prefetch(monkeypatch):
+    bank = SlowBank(delay=0.2)
+    monkeypatch.setattr(workflow, "next_question", bank)
+
+    async def go():
+        await workflow.start_topic_flow("Asthma", "wf-7")
+        assert "wf-7" in workflow._quiz_tasks
+        quiz = await workflow.request_quiz("wf-7")
+        assert quiz["quiz"]["question"] == "Question 1 about Asthma?" and bank.calls == 1
+        assert "wf-7" not in workflow._quiz_tasks
+        await workflow.reset_session("wf-7")
+
+    asyncio.run(go())
+
+
+def test_reset_cancels_the_prefetch_and_leaves_no_session(monkeypatch):
+    bank = SlowBank(delay=0.2)
+    monkeypatch.setattr(workflow, "next_question", bank)
+
+    async def go():
+        await workflow.start_topic_flow("Asthma", "wf-8")
+        task = workflow._quiz_tasks["wf-8"]
+        await workflow.reset_session("wf-8")
+        await asyncio.wait({task})
+        assert task.cancelled() and "wf-8" not in workflow._quiz_tasks
+        assert await workflow.get_session_fields("wf-8", ["quiz"]) is None
+
+        # a prefetch that is not cancelled (e.g. started by another worker)
+        # finishes without recreating the deleted session
+        await workflow._pregenerate_quiz("wf-8", {"topic": "Asthma", "summary": "Asthma narrows the airways."})
+        assert await workflow.get_session_fields("wf-8", ["quiz"]) is None
+
+    asyncio.run(go())